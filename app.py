@@ -3,59 +3,21 @@
 """
 AI用 Jyotish データ作成ツール（キャッシュ最適化版）
 - Streamlit + Swiss Ephemeris + 分割図（D1/D9/D20/D60）
-- 計算負荷を @st.cache_data / @st.cache_resource で軽減
+- 計算負荷を共有結果キャッシュ（calc.cache：サイズ上限 + LRU + TTL）、出力等価キー（calc.quantize）と @st.cache_resource で軽減
 """
 
-import json
 from datetime import date
+import os
 import streamlit as st
-import swisseph as swe
 
 # ---- calc modules ----
-from calc.ephemeris import (
-    setup_sidereal,
-    jd_ut_from_local,
-    ayanamsa_deg,
-    asc_sidereal,
-    planet_sidereal_longitudes,
-)
-from calc.d1 import build_d1
-from calc.d9 import build_d9
-from calc.d20 import build_d20
-from calc.d60 import build_d60
-from calc.validators import prune_and_validate
-
-
-# ----------------------
-# Helpers
-# ----------------------
-def format_tz(offset: float) -> str:
-    """UTC ±h を文字列化（例：UTC+9 / UTC-5.5）"""
-    sign = "+" if offset >= 0 else "-"
-    val = abs(offset)
-    if abs(val - int(val)) < 1e-9:
-        return f"UTC{sign}{int(val)}"
-    return f"UTC{sign}{val:.1f}"
-
-
-def deg_to_dms_str(deg: float, always_sign_minus=False) -> str:
-    """
-    23.565 -> "-23:33:54" 風に整形。
-    always_sign_minus=True の時は “-" で出す（アヤナーンシャ表記向け）。
-    """
-    d = abs(deg)
-    D = int(d)
-    m_f = (d - D) * 60
-    M = int(m_f)
-    S = int(round((m_f - M) * 60))
-    if S == 60:
-        S = 0
-        M += 1
-    if M == 60:
-        M = 0
-        D += 1
-    prefix = "-" if always_sign_minus else ""
-    return f"{prefix}{D:02d}:{M:02d}:{S:02d}"
+from calc import metrics, pipeline
+from calc.cache import ResultCache
+from calc.quantize import EquivalenceCache
+from calc.rectify import sweep_record
+from calc.serialize import dumps_pair
+from calc.variants import AYANAMSA_MODES, generate_variants
+from calc.varga import VARGA_NAMES
 
 
 # =======================================================
@@ -76,12 +38,23 @@ def init_ephemeris(ephe_path: str, ayan_mode: str = "Lahiri_ICRC") -> bool:
     - ayan_mode: 'Lahiri_ICRC' or 'Lahiri'（calc/ephemeris.setup_sidereal 内でフォールバック）
     返り値はダミー（True）。初期化は一度だけ。
     """
-    try:
-        swe.set_ephe_path(ephe_path if ephe_path.strip() else None)
-    except Exception:
-        swe.set_ephe_path(None)
-    setup_sidereal(ayan_mode)
-    return True
+    return pipeline.init_ephemeris(ephe_path, ayan_mode)
+
+
+# =======================================================
+# 0') 共有結果キャッシュ（全セッション共通、サイズ上限 + LRU + TTL）
+#     JYOTISH_CACHE_MB   : メモリ上限（MB、既定 64）
+#     JYOTISH_CACHE_TTL  : TTL（秒、既定 0 = 無制限）
+#     JYOTISH_CACHE_PATH : SQLite ファイル（指定時は別プロセスとも共有・再起動後も有効）
+#     いずれも全セッション共通の設定なので起動時に決める（セッションの UI からは変えない）
+# =======================================================
+@st.cache_resource(show_spinner=False)
+def get_result_cache() -> ResultCache:
+    return ResultCache(
+        max_bytes=int(os.environ.get("JYOTISH_CACHE_MB", "64")) << 20,
+        ttl_sec=float(os.environ.get("JYOTISH_CACHE_TTL", "0")),
+        path=os.environ.get("JYOTISH_CACHE_PATH") or None,
+    )
 
 
 # =======================================================
@@ -132,75 +105,47 @@ with st.expander("クリックで展開", expanded=True):
         node_type_label = st.radio("ノードの計算", ["True Node（真）", "Mean Node（平均）"], index=0)
         ck_mode_label = st.radio("Chara Karaka", ["7（Rahu除外）", "8（Rahu含む）"], index=0)
         include_lordship = st.checkbox("支配関係を出力に含む", value=True)
+        include_ashtakavarga = st.checkbox("Ashtakavarga（BAV/SAV）を D1 に含む", value=False)
+        include_aspects = st.checkbox("アスペクト（ドリシュティ）を D1 に含む", value=False)
+        compare_ayanamsas = st.multiselect(
+            "アヤナーンシャ比較（選ぶと比較ドキュメントを出力）",
+            list(AYANAMSA_MODES),
+            default=[],
+        )
+        compare_both_nodes = st.checkbox("比較に True / Mean 両方のノードを含む", value=True)
     with col2:
         include_d1 = st.checkbox("D1 Rashi（基本）", value=True)
         include_d9 = st.checkbox("D9 Navamsa（本質層）", value=True)
         include_d20 = st.checkbox("D20 Vimsamsa（精神性、宗教）", value=False)
         include_d60 = st.checkbox("D60 Shashtyamsa（深層カルマ）", value=False)
+        extra_vargas = st.multiselect(
+            "その他の分割図",
+            [v for v in VARGA_NAMES if v not in ("D1", "D9", "D20", "D60")],
+            default=[],
+        )
     with col3:
         minimize = st.checkbox("出力するJSONを最小化（スペース・改行なし）", value=True)
         ephe_path = st.text_input("Swiss Ephemeris ファイルパス（空で内蔵）", value="")
-        # キャッシュ・ポリシー（必要に応じて調整）
-        ttl_sec = st.number_input("キャッシュTTL（秒）※0は無制限", value=0, min_value=0)
-
+        # 計測の有効化はプロセス全体の設定なので起動時に JYOTISH_METRICS=1 で行い、ここでは表示だけ切り替える
+        show_timing = st.checkbox(
+            "ステージ別タイミングを表示",
+            value=metrics.ENABLED,
+            disabled=not metrics.ENABLED,
+            help="計測は JYOTISH_METRICS=1 で起動したときだけ有効（全セッション共通の累計）",
+        )
 
-# =======================================================
-# 3) キャッシュ：コア計算（Asc/惑星/アヤナーンシャ）
-#    入力パラメータが同じなら再計算しない
-# =======================================================
-@st.cache_data(show_spinner=True)
-def compute_core(
-    y: int,
-    mo: int,
-    d: int,
-    h_float: float,
-    tz: float,
-    lat_deg: float,
-    lon_deg: float,
-    node_flag: str,  # "True" | "Mean"
-    ephe_inited_key: bool,  # init_ephemeris の結果（True）
-) -> dict:
-    """
-    重いコア計算部分（Asc/惑星/アヤナーンシャ）
-    ※ ephe_inited_key はキャッシュキー用ダミー（True）：
-       先に init_ephemeris(...) が評価済み（= パス/サイデリアル設定済み）であることを保証
-    """
-    jd_ut = jd_ut_from_local(y, mo, d, h_float, tz)
-    asc = asc_sidereal(jd_ut, lat_deg, lon_deg)
-    planets = planet_sidereal_longitudes(jd_ut, node_flag)
-    aya = ayanamsa_deg(jd_ut)
-    return {"jd_ut": jd_ut, "asc": asc, "planets": planets, "ayanamsa": aya}
+result_cache = get_result_cache()
 
 
 # =======================================================
-# 4) キャッシュ：Varga生成（D1/D9/D20/D60）
+# 3) キャッシュ：出力等価キー（calc.quantize）
+#    出力 JSON が変わらない入力の範囲（数秒・数メートル違いなど）はまとめて 1 件として扱う
 # =======================================================
-@st.cache_data(show_spinner=False)
-def build_vargas(
-    asc: float,
-    planets: dict,
-    ck_mode: str,               # "7" | "8"
-    include_lordship: bool,
-    need_d1: bool,
-    need_d9: bool,
-    need_d20: bool,
-    need_d60: bool,
-) -> dict:
-    """
-    各分割図の JSON 断片を生成（必要なものだけ）
-    """
-    out = {}
-    opts = {"ck_mode": ck_mode, "include_lordship": include_lordship}
-
-    if need_d1:
-        out["D1"] = build_d1(asc, planets, opts)
-    if need_d9:
-        out["D9"] = build_d9(asc, planets)
-    if need_d20:
-        out["D20"] = build_d20(asc, planets)
-    if need_d60:
-        out["D60"] = build_d60(asc, planets)
-    return out
+@st.cache_resource(show_spinner=False)
+def get_equivalence_cache(ephe_path: str) -> EquivalenceCache:
+    """result_cache を保存先に使う。ephe_path ごとに別キー空間。"""
+    return EquivalenceCache(get_result_cache(), namespace=("ephe", ephe_path))
+
 
 # =======================================================
 # 5) ボタン押下 → 生成（プレビュー後にダウンロード）
@@ -217,159 +162,55 @@ def _sanitize_filename(text: str) -> str:
 def _yyyymmdd(d: date) -> str:
     return f"{d.year:04d}{d.month:02d}{d.day:02d}"
 
-# === JSON プレビュー専用：配列を 1 行化＆小辞書を 1 行化する整形 ===
-import json
-
-def pretty_json_inline_lists(
-    obj,
-    indent: int = 2,
-    inline_small_dict_max_items: int = 2,
-    inline_list_max_len: int = 20
-) -> str:
-    """
-    JSON を「読みやすさ + インライン最適化」方針で整形して文字列で返す。
-    - リスト: 可能な限り 1 行 "[a, b]" にする
-    - 小さな辞書: キー数 <= inline_small_dict_max_items かつ
-      値がスカラー or 小さなリストのみの場合に 1 行 "{k: v, k2: v2}" にする
-    """
-    def is_scalar(x):
-        return x is None or isinstance(x, (str, int, float, bool))
-
-    def list_to_inline(a_list):
-        parts = []
-        for v in a_list:
-            if is_scalar(v):
-                parts.append(json.dumps(v, ensure_ascii=False))
-            elif isinstance(v, list):
-                parts.append(list_to_inline(v))
-            elif isinstance(v, dict):
-                parts.append(dict_to_maybe_inline(v, 0, force_inline=True))
-            else:
-                parts.append(json.dumps(v, ensure_ascii=False))
-        return "[" + ", ".join(parts) + "]"
-
-    def dict_to_maybe_inline(d: dict, level: int, force_inline: bool = False) -> str:
-        kv_items = list(d.items())
-        if force_inline or (
-            len(kv_items) <= inline_small_dict_max_items and all(
-                is_scalar(v) or (
-                    isinstance(v, list) and len(v) <= inline_list_max_len and all(is_scalar(x) for x in v)
-                )
-                for _, v in kv_items
-            )
-        ):
-            inner = ", ".join(
-                json.dumps(k, ensure_ascii=False) + ": " +
-                (
-                    list_to_inline(v) if isinstance(v, list)
-                    else json.dumps(v, ensure_ascii=False)
-                )
-                for k, v in kv_items
-            )
-            return "{" + inner + "}"
-
-        pad = " " * (indent * level)
-        pad_in = " " * (indent * (level + 1))
-        lines = ["{"]
-        for i, (k, v) in enumerate(kv_items):
-            key_part = json.dumps(k, ensure_ascii=False) + ": "
-            if is_scalar(v):
-                val_part = json.dumps(v, ensure_ascii=False)
-                lines.append(pad_in + key_part + val_part + ("," if i < len(kv_items) - 1 else ""))
-            elif isinstance(v, list):
-                val_part = list_to_inline(v)
-                lines.append(pad_in + key_part + val_part + ("," if i < len(kv_items) - 1 else ""))
-            elif isinstance(v, dict):
-                val_part = dict_to_maybe_inline(v, level + 1)
-                lines.append(pad_in + key_part + val_part + ("," if i < len(kv_items) - 1 else ""))
-            else:
-                val_part = json.dumps(v, ensure_ascii=False)
-                lines.append(pad_in + key_part + val_part + ("," if i < len(kv_items) - 1 else ""))
-        lines.append(pad + "}")
-        return "\n".join(lines)
-
-    if is_scalar(obj):
-        return json.dumps(obj, ensure_ascii=False)
-    if isinstance(obj, list):
-        return list_to_inline(obj)
-    if isinstance(obj, dict):
-        return dict_to_maybe_inline(obj, level=0)
-    return json.dumps(obj, ensure_ascii=False, indent=indent, separators=(", ", ": "))
-
 if go:
     # 5-1) Ephemeris 初期化（キャッシュ済み）
     inited = init_ephemeris(ephe_path, "Lahiri_ICRC")
 
     # 5-2) パラメータ整備
-    h_float = int(h) + int(m) / 60.0 + int(s) / 3600.0
     node_flag = "True" if node_type_label.startswith("True") else "Mean"
     ck_mode = "8" if ck_mode_label.startswith("8") else "7"
+    vargas = [v for v, on in (("D1", include_d1), ("D9", include_d9), ("D20", include_d20), ("D60", include_d60)) if on]
+    vargas.extend(extra_vargas)
 
-    # 5-3) コア計算（Asc/惑星/アヤナーンシャ）— キャッシュ
-    core = compute_core(
-        birth_date.year,
-        birth_date.month,
-        birth_date.day,
-        h_float,
-        tz_offset,
-        lat,
-        lon,
-        node_flag,
-        inited,  # True
-    )
-    asc = core["asc"]; planets = core["planets"]; aya_val = core["ayanamsa"]
-    aya_str = deg_to_dms_str(aya_val, always_sign_minus=True)
-
-    # 5-4) Varga 生成 — キャッシュ
-    vargas = build_vargas(
-        asc,
-        planets,
-        ck_mode,
-        include_lordship,
-        include_d1,
-        include_d9,
-        include_d20,
-        include_d60,
-    )
-
-    # 5-5) D9 がある場合、karakamsa_sign を D1 へ注入
-    if include_d1 and include_d9 and ("D1" in vargas) and ("D9" in vargas):
-        try:
-            ak_planet = vargas["D1"].get("jaimini", {}).get("AK")
-            if ak_planet:
-                karaka_sign = vargas["D9"]["planets"][ak_planet]["sign"]
-                vargas["D1"].setdefault("jaimini", {})["karakamsa_sign"] = karaka_sign
-        except Exception:
-            pass
-
-    # 5-6) meta 構築
-    meta = {
+    # 5-3) 生成（コア計算 → Varga → karakamsa 注入 → meta → まとめ・バリデーション）
+    #      — 出力等価キャッシュ（範囲内ならフル計算を省く）
+    #      比較モードはトロピカル位置 1 回からアヤナーンシャ × ノードの全バリアントを導出（calc.variants）
+    rec = {
         "name": user_name,
-        "birth": f"{birth_date.isoformat()} {int(h):02d}:{int(m):02d}",
-        "timezone": format_tz(tz_offset),
-        "latitude": f"{lat:.2f}",
-        "longitude": f"{lon:.2f}",
+        "date": birth_date.isoformat(),
+        "time": f"{int(h):02d}:{int(m):02d}:{int(s):02d}",
+        "tz": tz_offset,
+        "lat": lat,
+        "lon": lon,
         "location": location_label,
-        "ayanamsa": f"Lahiri ICRC {aya_str}",
-        "calculation_model": "Drik Siddhanta",
+    }
+    gen_opts = {
         "node_type": node_flag,
-        "house_system": "Whole Sign",
+        "ck_mode": ck_mode,
+        "include_lordship": include_lordship,
+        "include_ashtakavarga": include_ashtakavarga,
+        "include_aspects": include_aspects,
+        "vargas": tuple(vargas),
+        "validate": True,
     }
+    if compare_ayanamsas:
+        node_types = ("True", "Mean") if compare_both_nodes else (node_flag,)
+        out = result_cache.get_or_compute(
+            ("variants", sorted(rec.items()), sorted(gen_opts.items()), tuple(compare_ayanamsas), node_types, ephe_path),
+            generate_variants, rec, gen_opts, tuple(compare_ayanamsas), node_types,
+        )
+    else:
+        out = get_equivalence_cache(ephe_path).generate(rec, gen_opts)
 
-    # 5-7) トップレベル JSON まとめ → バリデーション
-    out = {"meta": meta}
-    out.update(vargas)
-    out = prune_and_validate(out)
-
-    # 5-8) プレビュー用（整形あり：配列は 1 行／小さな辞書は 1 行）とダウンロード用（最小化）を生成
-    txt_pretty = pretty_json_inline_lists(out, indent=2, inline_small_dict_max_items=3)
-    txt_min = json.dumps(out, ensure_ascii=False, separators=(",", ":"))
+    # 5-4) プレビュー用（整形あり：配列は 1 行／小さな辞書は 1 行）とダウンロード用（最小化）を生成
+    with metrics.span("serialize"):
+        txt_pretty, txt_min = dumps_pair(out, indent=2, inline_small_dict_max_items=3)
 
-    # 5-9) 可読プレビュー表示（スクロール可）
+    # 5-5) 可読プレビュー表示（スクロール可）
     st.subheader("プレビュー（整形済みJSON）")
     st.code(txt_pretty, language="json")  # st.json は内部整形が入るため st.code を使用
 
-    # 5-10) ダウンロードボタン（最小化JSONを保存）
+    # 5-6) ダウンロードボタン（最小化JSONを保存）
     fname_base = _sanitize_filename(user_name) + "_" + _yyyymmdd(birth_date)
     file_name = f"{fname_base}.json"
 
@@ -381,8 +222,71 @@ if go:
         use_container_width=True
     )
 
-    # 5-11) 参考メモ
+    # 5-7) 参考メモ
     with st.expander("計算仕様メモ（参考）", expanded=False):
         st.markdown(
             "- 画面表示は **整形済みJSON**、ダウンロードは **スペース・改行なし**の最小化JSON。"
         )
+
+    # 5-8) キャッシュ統計
+    with st.expander("キャッシュ統計", expanded=False):
+        st.json({"result": result_cache.info(), "equivalence": get_equivalence_cache(ephe_path).info()})
+
+    # 5-9) ステージ別タイミング（calc.metrics、起動後の全セッション累計）
+    if show_timing and metrics.ENABLED:
+        with st.expander("ステージ別タイミング（全セッション累計）", expanded=False):
+            st.table(metrics.summary())
+            st.table([
+                {"counter": c["name"], "labels": ", ".join(f"{k}={v}" for k, v in c["labels"].items()), "value": c["value"]}
+                for c in metrics.snapshot()["counters"]
+            ])
+
+
+# =======================================================
+# 6) 出生時刻スイープ（レクティフィケーション）
+#    入力時刻 ±N 分を、D1/D9/D20/D60 の区分（サイン・ナクシャトラ/パダ・分割図・tithi・Chara Karaka）が
+#    変わらない区間に分割して一覧表示（区切りの通過時刻を直接解く、calc.rectify）
+# =======================================================
+st.header("3. 出生時刻スイープ（レクティフィケーション）")
+with st.container(border=True):
+    sw1, sw2 = st.columns([1, 3])
+    with sw1:
+        sweep_minutes = st.number_input("スイープ幅（±分）", value=120, min_value=1, max_value=720, step=10)
+        go_sweep = st.button("出生時刻スイープを実行")
+    with sw2:
+        st.caption("出生時刻の幅の中で、出力の区分が同じになる時刻の区間を列挙します。"
+                   "区間中点の時刻を入力し直すと、その区間のチャートを生成できます。")
+
+if go_sweep:
+    init_ephemeris(ephe_path, "Lahiri_ICRC")
+    sweep_vargas = [v for v, on in (("D1", include_d1), ("D9", include_d9), ("D20", include_d20), ("D60", include_d60)) if on]
+    sweep_vargas.extend(extra_vargas)
+    sweep_rec = {
+        "date": birth_date.isoformat(),
+        "time": f"{int(h):02d}:{int(m):02d}:{int(s):02d}",
+        "tz": tz_offset,
+        "lat": lat,
+        "lon": lon,
+    }
+    sweep_opts = {
+        "node_type": "True" if node_type_label.startswith("True") else "Mean",
+        "ck_mode": "8" if ck_mode_label.startswith("8") else "7",
+        "vargas": tuple(sweep_vargas),
+    }
+    rows = result_cache.get_or_compute(
+        ("sweep", sorted(sweep_rec.items()), sorted(sweep_opts.items()), float(sweep_minutes), ephe_path),
+        sweep_record, sweep_rec, float(sweep_minutes), sweep_opts,
+    )
+    st.write(f"{len(rows)} 区間")
+    st.dataframe(
+        [
+            dict(
+                {"開始": r["start"], "終了": r["end"], "秒": r["seconds"], "入力時刻": "●" if r["contains_input"] else "",
+                 "中点": r["record"]["time"], "変化": ", ".join(r["changed"])},
+                **{f"Asc {k}": v for k, v in r["Asc"].items()},
+            )
+            for r in rows
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
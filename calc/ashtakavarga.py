@@ -0,0 +1,167 @@
+# calc/ashtakavarga.py
+"""
+Ashtakavarga（Bhinnashtakavarga / Sarvashtakavarga）を 12 ビットのマスクで計算する。
+
+各惑星（Su..Sa）の BAV は 8 つの寄与者（Su..Sa と Asc）それぞれの「吉となるハウス」の集合の和。
+寄与者ごとの集合を 12 ビットのマスク（ビット h-1 = 寄与者から数えて h 番目）にしておき、
+寄与者のサインぶん回転させる（ビット k = サイン k）と、その寄与者が点を与えるサインの集合になる。
+回転済みマスクは [惑星, 寄与者, サイン] の表として import 時に作っておく。
+
+サインごとの個数は、マスクの各ビットをサインごとの欄（1 チャートでは 8 ビット、バッチでは
+4 ビット）へ広げた整数を足すだけで求まる（SWAR）。BAV は最大 8 なので桁上がりが欄をまたがない。
+1 チャートは 7 × 8 回の加算と to_bytes、NumPy のバッチ（(N, 8) のサイン番号）は寄与者 8 回の
+gather と加算で済む。
+
+結果はサイン順（Ar..Pi）の 12 要素。BAV の合計は Su 48 / Mo 49 / Ma 39 / Me 54 / Ju 56 / Ve 52 / Sa 39、
+SAV の合計は常に 337。
+
+  av = ashtakavarga({"Su": 9, "Mo": 1, ...}, asc_si)      # {"BAV": {"Su": [..12], ...}, "SAV": [..12]}
+  bav, sav = ashtakavarga_batch(signs)                    # signs (N, 8)：CONTRIBUTORS 順のサイン番号
+"""
+from typing import Any, Dict, List, Mapping, Tuple
+
+import numpy as np
+
+TARGETS: Tuple[str, ...] = ("Su", "Mo", "Ma", "Me", "Ju", "Ve", "Sa")
+CONTRIBUTORS: Tuple[str, ...] = TARGETS + ("Asc",)
+
+# BAV の吉ハウス（Parashara）：惑星 -> 寄与者 -> 寄与者から数えたハウス
+BAV_HOUSES: Dict[str, Dict[str, Tuple[int, ...]]] = {
+    "Su": {
+        "Su": (1, 2, 4, 7, 8, 9, 10, 11), "Mo": (3, 6, 10, 11), "Ma": (1, 2, 4, 7, 8, 9, 10, 11),
+        "Me": (3, 5, 6, 9, 10, 11, 12), "Ju": (5, 6, 9, 11), "Ve": (6, 7, 12),
+        "Sa": (1, 2, 4, 7, 8, 9, 10, 11), "Asc": (3, 4, 6, 10, 11, 12),
+    },
+    "Mo": {
+        "Su": (3, 6, 7, 8, 10, 11), "Mo": (1, 3, 6, 7, 10, 11), "Ma": (2, 3, 5, 6, 9, 10, 11),
+        "Me": (1, 3, 4, 5, 7, 8, 10, 11), "Ju": (1, 4, 7, 8, 10, 11, 12), "Ve": (3, 4, 5, 7, 9, 10, 11),
+        "Sa": (3, 5, 6, 11), "Asc": (3, 6, 10, 11),
+    },
+    "Ma": {
+        "Su": (3, 5, 6, 10, 11), "Mo": (3, 6, 11), "Ma": (1, 2, 4, 7, 8, 10, 11),
+        "Me": (3, 5, 6, 11), "Ju": (6, 10, 11, 12), "Ve": (6, 8, 11, 12),
+        "Sa": (1, 4, 7, 8, 9, 10, 11), "Asc": (1, 3, 6, 10, 11),
+    },
+    "Me": {
+        "Su": (5, 6, 9, 11, 12), "Mo": (2, 4, 6, 8, 10, 11), "Ma": (1, 2, 4, 7, 8, 9, 10, 11),
+        "Me": (1, 3, 5, 6, 9, 10, 11, 12), "Ju": (6, 8, 11, 12), "Ve": (1, 2, 3, 4, 5, 8, 9, 11),
+        "Sa": (1, 2, 4, 7, 8, 9, 10, 11), "Asc": (1, 2, 4, 6, 8, 10, 11),
+    },
+    "Ju": {
+        "Su": (1, 2, 3, 4, 7, 8, 9, 10, 11), "Mo": (2, 5, 7, 9, 11), "Ma": (1, 2, 4, 7, 8, 10, 11),
+        "Me": (1, 2, 4, 5, 6, 9, 10, 11), "Ju": (1, 2, 3, 4, 7, 8, 10, 11), "Ve": (2, 5, 6, 9, 10, 11),
+        "Sa": (3, 5, 6, 12), "Asc": (1, 2, 4, 5, 6, 7, 9, 10, 11),
+    },
+    "Ve": {
+        "Su": (8, 11, 12), "Mo": (1, 2, 3, 4, 5, 8, 9, 11, 12), "Ma": (3, 5, 6, 9, 11, 12),
+        "Me": (3, 5, 6, 9, 11), "Ju": (5, 8, 9, 10, 11), "Ve": (1, 2, 3, 4, 5, 8, 9, 10, 11),
+        "Sa": (3, 4, 5, 8, 9, 10, 11), "Asc": (1, 2, 3, 4, 5, 8, 9, 11),
+    },
+    "Sa": {
+        "Su": (1, 2, 4, 7, 8, 10, 11), "Mo": (3, 6, 11), "Ma": (3, 5, 6, 10, 11, 12),
+        "Me": (6, 8, 9, 10, 11, 12), "Ju": (5, 6, 11, 12), "Ve": (6, 11, 12),
+        "Sa": (3, 5, 6, 11), "Asc": (1, 3, 4, 6, 10, 11),
+    },
+}
+BAV_TOTALS: Dict[str, int] = {"Su": 48, "Mo": 49, "Ma": 39, "Me": 54, "Ju": 56, "Ve": 52, "Sa": 39}
+
+_FULL = (1 << 12) - 1
+
+
+def _rotl12(mask: int, s: int) -> int:
+    return ((mask << s) | (mask >> (12 - s))) & _FULL if s else mask
+
+
+def _spread(mask: int, width: int) -> int:
+    """12 ビットのマスク → ビット k を width ビットの欄 k の 1 にした整数"""
+    return sum(1 << (width * k) for k in range(12) if mask >> k & 1)
+
+
+def _compile() -> Tuple[Tuple[Tuple[int, ...], ...], ...]:
+    out = []
+    for t in TARGETS:
+        rules = BAV_HOUSES[t]
+        if sum(len(h) for h in rules.values()) != BAV_TOTALS[t]:
+            raise AssertionError(f"BAV_HOUSES[{t}] does not add up to {BAV_TOTALS[t]}")
+        row = []
+        for c in CONTRIBUTORS:
+            m = 0
+            for h in rules[c]:
+                m |= 1 << (h - 1)
+            row.append(tuple(_rotl12(m, s) for s in range(12)))
+        out.append(tuple(row))
+    return tuple(out)
+
+
+# [惑星, 寄与者, 寄与者のサイン] -> 点を与えるサインのマスク（ビット k = サイン k）
+ROT_MASK = _compile()
+# 同じ表を欄に広げたもの：1 チャート用（8 ビット欄、SAV も欄をまたがない）とバッチ用（4 ビット欄、uint64）
+_LANES8 = tuple(tuple(tuple(_spread(m, 8) for m in by_sign) for by_sign in row) for row in ROT_MASK)
+# バッチ用は [寄与者, サイン, 惑星] の順（寄与者ごとにサイン番号で行を引く）
+_LANES4_NP: np.ndarray = np.ascontiguousarray(np.array(
+    [[[_spread(m, 4) for m in by_sign] for by_sign in row] for row in ROT_MASK], dtype=np.uint64
+).transpose(1, 2, 0))
+_EVEN = np.uint64(0x0F0F0F0F0F0F)
+
+
+# =======================================================
+# 1 チャート
+# =======================================================
+def ashtakavarga(signs: Mapping[str, int], asc_si: int) -> Dict[str, Any]:
+    """
+    signs : {"Su": サイン番号 0..11, ..., "Sa": ...}（Ra/Ke は使わない）、asc_si : Asc のサイン番号
+    returns {"BAV": {"Su": [Ar..Pi の 12 個], ...}, "SAV": [12 個]}
+    """
+    pos = [signs[p] for p in TARGETS] + [asc_si]
+    bav: Dict[str, List[int]] = {}
+    sav = 0
+    for t, lanes in zip(TARGETS, _LANES8):
+        acc = 0
+        for by_sign, s in zip(lanes, pos):
+            acc += by_sign[s]
+        bav[t] = list(acc.to_bytes(12, "little"))
+        sav += acc
+    return {"BAV": bav, "SAV": list(sav.to_bytes(12, "little"))}
+
+
+# =======================================================
+# バッチ（NumPy）
+# =======================================================
+def ashtakavarga_batch(signs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    signs (N, 8)：CONTRIBUTORS 順（Su..Sa, Asc）のサイン番号
+    returns (bav (N, 7, 12) uint8：TARGETS 順, sav (N, 12) uint8)
+    """
+    s = np.asarray(signs, dtype=np.intp)
+    if s.ndim != 2 or s.shape[1] != len(CONTRIBUTORS):
+        raise ValueError(f"signs must have shape (N, {len(CONTRIBUTORS)})")
+    acc = _LANES4_NP[0].take(s[:, 0], axis=0)
+    for c in range(1, len(CONTRIBUTORS)):
+        acc += _LANES4_NP[c].take(s[:, c], axis=0)
+    # 偶数・奇数番目の欄を 8 ビット欄に分ける（バイト j = 欄 2j / 2j+1）。SAV（最大 56）も欄のまま足せる
+    even = acc & _EVEN
+    odd = (acc >> np.uint64(4)) & _EVEN
+    n = acc.shape[0]
+    bav = np.empty((n, len(TARGETS), 12), dtype=np.uint8)
+    bav[:, :, 0::2] = _lane_bytes(even)
+    bav[:, :, 1::2] = _lane_bytes(odd)
+    sav = np.empty((n, 12), dtype=np.uint8)
+    sav[:, 0::2] = _lane_bytes(even.sum(axis=1))
+    sav[:, 1::2] = _lane_bytes(odd.sum(axis=1))
+    return bav, sav
+
+
+def _lane_bytes(x: np.ndarray) -> np.ndarray:
+    """uint64 の下位 6 バイト（リトルエンディアン）→ (..., 6) uint8"""
+    return x.astype("<u8").view(np.uint8).reshape(x.shape + (8,))[..., :6]
+
+
+def ashtakavarga_from_batch(batch: Mapping[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """compute_core_batch の結果から直接（D1 のサインで）計算する。"""
+    cols = [list(batch["bodies"]).index(p) for p in TARGETS]
+    lon = np.asarray(batch["lon"], dtype=np.float64)[:, cols]
+    asc = np.asarray(batch["asc"], dtype=np.float64)
+    signs = np.empty((lon.shape[0], len(CONTRIBUTORS)), dtype=np.intp)
+    signs[:, :-1] = np.floor_divide(np.mod(lon, 360.0), 30.0)
+    signs[:, -1] = np.floor_divide(np.mod(asc, 360.0), 30.0)
+    return ashtakavarga_batch(signs)
@@ -1,13 +1,187 @@
 # calc/aspects.py
-from typing import Dict, List
-from .base import SIGN_INDEX
+"""
+アスペクト（drishti）：グラハ・ドリシュティ（Parashara）とラーシ・ドリシュティ（Jaimini）。
+
+どちらも「サイン s にいる天体（サイン）がどのサインを見るか」だけで決まるので、12 ビットのマスク
+（ビット k = サイン k）として import 時に表にしておく：
+  GRAHA_MASK[p][s] : サイン s の惑星 p が見るサイン（全惑星 7 番目、Ma 4/8、Ju 5/9、Sa 3/10、
+                     Ra/Ke は Ju と同じ 5/7/9 とする流儀を採用）
+  RASHI_MASK[s]    : サイン s が見るサイン（動は隣を除く不動、不動は隣を除く動、柔は他の柔）
+チャートの「誰がどのハウス・どの惑星を見るか」は、マスクの回転（Asc 基準のハウスへ）と
+ビット検査だけで求まる。NumPy のバッチ版（トランジットの重ね合わせなど大量評価用）も同じ表を使う。
+
+  chart_aspects({"Su": 9, ...}, asc_si)      # build_d1 の "aspects" セクション
+  aspect_matrix(src_signs, dst_signs)        # (N, P, Q) bool：src の天体が dst の天体を見るか
+  aspect_bits(src_signs, dst_signs)          # 同じ内容を (N, P) uint16 のビット列で
+"""
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .base import PLANETS
+from .varga import SIGN_QUALITY
+
+# 天体から数えたハウス（1 = 自身のサイン）
+GRAHA_DRISHTI: Dict[str, Tuple[int, ...]] = {
+    "Su": (7,), "Mo": (7,), "Me": (7,), "Ve": (7,),
+    "Ma": (4, 7, 8),
+    "Ju": (5, 7, 9),
+    "Sa": (3, 7, 10),
+    "Ra": (5, 7, 9), "Ke": (5, 7, 9),
+}
+KINDS: Tuple[str, ...] = ("graha", "rashi")
+
+_FULL = (1 << 12) - 1
+
+
+def _rotl12(mask: int, s: int) -> int:
+    return ((mask << s) | (mask >> (12 - s))) & _FULL if s else mask
+
+
+def _house_mask(houses: Sequence[int]) -> int:
+    m = 0
+    for h in houses:
+        m |= 1 << (h - 1)
+    return m
+
+
+def _rashi_mask(s: int) -> int:
+    q = SIGN_QUALITY[s]
+    if q == 2:  # 柔：他の柔サイン
+        targets = [t for t in range(12) if SIGN_QUALITY[t] == 2 and t != s]
+    elif q == 0:  # 動：不動サイン（次のサインを除く）
+        targets = [t for t in range(12) if SIGN_QUALITY[t] == 1 and t != (s + 1) % 12]
+    else:  # 不動：動サイン（前のサインを除く）
+        targets = [t for t in range(12) if SIGN_QUALITY[t] == 0 and t != (s - 1) % 12]
+    return sum(1 << t for t in targets)
+
+
+# [惑星][サイン] / [サイン] -> 見るサインのマスク
+GRAHA_MASK: Dict[str, Tuple[int, ...]] = {
+    p: tuple(_rotl12(_house_mask(h), s) for s in range(12)) for p, h in GRAHA_DRISHTI.items()
+}
+RASHI_MASK: Tuple[int, ...] = tuple(_rashi_mask(s) for s in range(12))
+
+# マスク（12 ビット）→ 立っているビットの位置
+_POSITIONS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(k for k in range(12) if m >> k & 1) for m in range(1 << 12)
+)
+
+# バッチ用：(2, 9, 12) uint16 = [KINDS, PLANETS, サイン]
+MASK_NP: np.ndarray = np.array(
+    [[GRAHA_MASK[p] for p in PLANETS], [RASHI_MASK] * len(PLANETS)], dtype=np.uint16
+)
+MASK_NP.setflags(write=False)
+
 
 def parashara_aspects(sign_idx_from: int) -> Dict[str, List[int]]:
-    # return house offsets for general and special aspects (1-based house numbers)
-    # Special aspects by planet; generic 7th for others.
-    special = {
-        "Ma": [4,7,8],
-        "Ju": [5,7,9],
-        "Sa": [3,7,10],
-    }
-    return special
+    """サイン sign_idx_from にいる各惑星がグラハ・ドリシュティで見るサイン番号（昇順）。"""
+    return {p: mask_to_list(m[sign_idx_from]) for p, m in GRAHA_MASK.items()}
+
+
+def rashi_aspects(sign_idx_from: int) -> List[int]:
+    """サイン sign_idx_from がラーシ・ドリシュティで見るサイン番号（昇順）。"""
+    return mask_to_list(RASHI_MASK[sign_idx_from])
+
+
+def mask_to_list(mask: int, base: int = 0) -> List[int]:
+    """ビットが立っている位置（+ base）の昇順リスト。"""
+    return [k + base for k in _POSITIONS[mask]]
+
+
+def to_house_mask(sign_mask: int, asc_si: int) -> int:
+    """サインのマスク → Asc 基準のハウスのマスク（ビット h-1 = ハウス h）。"""
+    return _rotl12(sign_mask, (12 - asc_si) % 12)
+
+
+# =======================================================
+# 1 チャート
+# =======================================================
+def chart_aspects(signs: Mapping[str, int], asc_si: int) -> Dict[str, Any]:
+    """
+    signs : {"Su": サイン番号, ...}（Ra/Ke を含んでよい）、asc_si : Asc のサイン番号
+    returns {"graha": {p: {"houses": [...], "planets": [...]}}, "rashi": {...}}
+      houses  : 見るハウス（1..12、Whole Sign）
+      planets : 見る惑星（signs の順。いなければキーごと出さない）
+    """
+    names = [p for p in signs if p in GRAHA_MASK]
+    occupied = 0  # 在住惑星のいるサイン
+    for p in names:
+        occupied |= 1 << signs[p]
+    rot = (12 - asc_si) % 12
+
+    out: Dict[str, Any] = {}
+    for kind in KINDS:
+        sec: Dict[str, Any] = {}
+        for p in names:
+            s = signs[p]
+            m = GRAHA_MASK[p][s] if kind == "graha" else RASHI_MASK[s]
+            one: Dict[str, Any] = {"houses": [k + 1 for k in _POSITIONS[_rotl12(m, rot)]]}
+            if m & occupied:
+                one["planets"] = [q for q in names if m >> signs[q] & 1]
+            sec[p] = one
+        out[kind] = sec
+    return out
+
+
+# =======================================================
+# バッチ（NumPy）
+# =======================================================
+def _kind_index(kind: str) -> int:
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+    return KINDS.index(kind)
+
+
+def aspect_masks(signs: np.ndarray, kind: str = "graha") -> np.ndarray:
+    """signs (N, 9)：PLANETS 順のサイン番号 → (N, 9) uint16：各惑星が見るサインのマスク"""
+    s = np.asarray(signs, dtype=np.intp)
+    if s.ndim != 2 or s.shape[1] != len(PLANETS):
+        raise ValueError(f"signs must have shape (N, {len(PLANETS)})")
+    return MASK_NP[_kind_index(kind), np.arange(len(PLANETS)), s]
+
+
+def house_masks(masks: np.ndarray, asc_si: np.ndarray) -> np.ndarray:
+    """サインのマスク (N, P) → Asc（(N,)）基準のハウスのマスク（ビット h-1 = ハウス h）"""
+    m = np.asarray(masks, dtype=np.uint16)
+    r = (np.asarray(asc_si, dtype=np.uint16) % 12)[:, None]
+    return ((m >> r) | (m << ((12 - r) % 12))) & np.uint16(_FULL)
+
+
+def aspect_bits(src_signs: np.ndarray, dst_signs: np.ndarray, kind: str = "graha") -> np.ndarray:
+    """
+    (N, 9) uint16：src の惑星 p（PLANETS 順）が見る dst の天体の集合（ビット q = dst の q 列目、Q <= 16）。
+    aspect_matrix と同じ内容を 1 惑星 1 語に詰めたもの（大量評価向け）。
+    """
+    m = aspect_masks(src_signs, kind)
+    d = np.asarray(dst_signs, dtype=np.uint16)
+    if d.ndim != 2 or d.shape[1] > 16:
+        raise ValueError("dst_signs must have shape (N, Q) with Q <= 16")
+    out = np.zeros(m.shape, dtype=np.uint16)
+    for q in range(d.shape[1]):
+        out |= ((m >> d[:, q:q + 1]) & np.uint16(1)) << np.uint16(q)
+    return out
+
+
+def aspect_matrix(
+    src_signs: np.ndarray, dst_signs: Optional[np.ndarray] = None, kind: str = "graha"
+) -> np.ndarray:
+    """
+    (N, P, Q) bool：src の惑星 p（PLANETS 順、(N, 9)）が dst の天体 q のサインを見るか。
+    dst_signs（(N, Q) のサイン番号）を省くと src 自身（チャート内の相互アスペクト）。
+    トランジットの重ね合わせなら src = トランジット、dst = ネイタル。
+    """
+    m = aspect_masks(src_signs, kind)
+    d = np.asarray(src_signs if dst_signs is None else dst_signs, dtype=np.uint16)
+    return (m[:, :, None] & (np.uint16(1) << d)[:, None, :]) != 0
+
+
+def aspects_from_batch(batch: Mapping[str, Any], kind: str = "graha") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    compute_core_batch の結果から (サインのマスク (N, 9), ハウスのマスク (N, 9))。列は PLANETS 順。
+    """
+    cols = [list(batch["bodies"]).index(p) for p in PLANETS]
+    signs = np.floor_divide(np.mod(np.asarray(batch["lon"], dtype=np.float64)[:, cols], 360.0), 30.0)
+    asc = np.floor_divide(np.mod(np.asarray(batch["asc"], dtype=np.float64), 360.0), 30.0)
+    m = aspect_masks(signs.astype(np.intp), kind)
+    return m, house_masks(m, asc.astype(np.intp))
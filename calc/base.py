@@ -18,6 +18,7 @@ PADA_SIZE = 3 + 20/60
 EXALTATION_SIGN: Dict[str,str] = {
     "Su":"Ar","Mo":"Ta","Ma":"Cp","Me":"Vi","Ju":"Cn","Ve":"Pi","Sa":"Li"
 }
+EXALTATION_INDEX: Dict[str,int] = {p: SIGN_INDEX[s] for p, s in EXALTATION_SIGN.items()}
 PLANETS = ["Su","Mo","Ma","Me","Ju","Ve","Sa","Ra","Ke"]
 
 def norm360(x: float) -> float:
@@ -28,10 +29,19 @@ def deg_in_sign(lon: float) -> Tuple[str, float]:
     si = int(lon // 30)
     return SIGNS[si], lon - si * 30
 
+def deg_in_sign_index(lon: float) -> Tuple[int, float]:
+    """Integer variant of deg_in_sign: (sign index 0..11, degree in sign)."""
+    lon = norm360(lon)
+    si = int(lon // 30)
+    return si, lon - si * 30
+
 def house_from_signs(asc_sign: str, obj_sign: str) -> int:
     a = SIGN_INDEX[asc_sign]; b = SIGN_INDEX[obj_sign]
     return ((b - a) % 12) + 1
 
+def house_from_index(asc_si: int, obj_si: int) -> int:
+    return ((obj_si - asc_si) % 12) + 1
+
 def nakshatra_pada(lon: float, labels=None) -> Tuple[str, int]:
     """Return (nak_label, pada[1..4]) from sidereal ecliptic longitude."""
     labels = labels or NAK_LABELS_JH
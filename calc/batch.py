@@ -0,0 +1,164 @@
+# calc/batch.py
+"""
+複数の出生データをまとめて計算するバッチ API。
+
+compute_core（app.py）は 1 件ずつ jd_ut_from_local / asc_sidereal /
+planet_sidereal_longitudes / ayanamsa_deg を呼び、結果を入れ子 dict で返す。
+大量処理（夜間バックフィル等）ではこの dict 構築が支配的になるため、
+ここでは結果を NumPy 配列（天体は BODY_KEYS 順の列）にまとめて返す。
+
+前提：init_ephemeris / setup_sidereal による初期化は呼び出し側で済ませておくこと。
+"""
+from datetime import date
+from typing import TYPE_CHECKING, Any, Dict, Literal, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import swisseph as swe
+
+from .ephemeris import (
+    BODY_IDS,
+    BODY_KEYS,
+    SIDEREAL_SPEED_FLAG,
+    asc_sidereal_array,
+    ayanamsa_deg_array,
+)
+
+if TYPE_CHECKING:
+    from .ephe_table import EpheTable
+
+DateLike = Union[date, Tuple[int, int, int]]
+
+# 列番号（lon/speed 配列の 2 次元目）
+BODY_COLUMN: Dict[str, int] = {k: i for i, k in enumerate(BODY_KEYS)}
+
+
+def _split_dates(dates: Sequence[DateLike]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """date / (y, m, d) の列を年・月・日の整数配列へ分解。"""
+    n = len(dates)
+    y = np.empty(n, dtype=np.int64)
+    m = np.empty(n, dtype=np.int64)
+    d = np.empty(n, dtype=np.int64)
+    for i, dt in enumerate(dates):
+        if isinstance(dt, date):
+            y[i], m[i], d[i] = dt.year, dt.month, dt.day
+        else:
+            y[i], m[i], d[i] = dt
+    return y, m, d
+
+
+def julday_array(y: np.ndarray, m: np.ndarray, d: np.ndarray, h_float: np.ndarray) -> np.ndarray:
+    """
+    swe.julday(y, m, d, h, GREG_CAL) のベクトル版（グレゴリオ暦）。
+    整数演算（Fliegel–Van Flandern）で日番号を求め、時刻を加える。
+    """
+    a = (14 - m) // 12
+    yy = y + 4800 - a
+    mm = m + 12 * a - 3
+    jdn = d + (153 * mm + 2) // 5 + 365 * yy + yy // 4 - yy // 100 + yy // 400 - 32045
+    return jdn.astype(np.float64) - 0.5 + np.asarray(h_float, dtype=np.float64) / 24.0
+
+
+def jd_ut_batch(
+    dates: Sequence[DateLike],
+    h_float: Sequence[float],
+    tz_hours: Sequence[float],
+) -> np.ndarray:
+    """jd_ut_from_local のバッチ版。"""
+    y, m, d = _split_dates(dates)
+    jd_local = julday_array(y, m, d, np.asarray(h_float, dtype=np.float64))
+    return jd_local - np.asarray(tz_hours, dtype=np.float64) / 24.0
+
+
+def compute_core_batch(
+    dates: Sequence[DateLike],
+    h_float: Sequence[float],
+    tz_hours: Sequence[float],
+    lat_deg: Sequence[float],
+    lon_deg: Sequence[float],
+    node_type: Literal["True", "Mean"] = "True",
+    table: Optional["EpheTable"] = None,
+) -> Dict[str, Any]:
+    """
+    compute_core のバッチ版。入力はすべて同じ長さ N の配列（またはシーケンス）。
+    table（calc.ephe_table.EpheTable）を渡すと惑星位置は swisseph を呼ばずテーブルから評価する。
+
+    Returns:
+      {
+        "jd_ut":    (N,)   float64,
+        "asc":      (N,)   float64  サイデリアル Asc（deg）,
+        "lon":      (N, 9) float64  サイデリアル黄経（列は BODY_KEYS 順）,
+        "speed":    (N, 9) float64  黄経速度（deg/day）,
+        "ayanamsa": (N,)   float64,
+        "bodies":   BODY_KEYS,
+      }
+    """
+    jd = jd_ut_batch(dates, h_float, tz_hours)
+    lat = np.asarray(lat_deg, dtype=np.float64)
+    lon = np.asarray(lon_deg, dtype=np.float64)
+    n = jd.shape[0]
+    if not (lat.shape[0] == lon.shape[0] == n):
+        raise ValueError("all input arrays must have the same length")
+
+    lons = np.empty((n, len(BODY_KEYS)), dtype=np.float64)
+    spds = np.empty((n, len(BODY_KEYS)), dtype=np.float64)
+
+    flag = SIDEREAL_SPEED_FLAG
+    calc_ut = swe.calc_ut
+    jd_list = jd.tolist()
+    ra, ke = BODY_COLUMN["Ra"], BODY_COLUMN["Ke"]
+
+    if table is not None:
+        for col, (key, _body) in enumerate(BODY_IDS):
+            lons[:, col], spds[:, col] = table.lon_speed_array(key, jd)
+        lons[:, ra], spds[:, ra] = table.lon_speed_array("Ra" if node_type == "True" else "Rm", jd)
+    else:
+        # 天体ごとに列をまとめて埋める（dict は作らない）
+        for col, (_key, body) in enumerate(BODY_IDS):
+            for i, t in enumerate(jd_list):
+                xx = calc_ut(t, body, flag)[0]
+                lons[i, col] = xx[0]
+                spds[i, col] = xx[3]
+
+        # ノードは 1 回だけ計算
+        node_body = swe.TRUE_NODE if node_type == "True" else swe.MEAN_NODE
+        for i, t in enumerate(jd_list):
+            xx = calc_ut(t, node_body, flag)[0]
+            lons[i, ra] = xx[0]
+            spds[i, ra] = xx[3]
+
+    # Ketu は Rahu の 180°加算・速度反転
+    lons[:, ke] = lons[:, ra] + 180.0
+    spds[:, ke] = -spds[:, ra]
+    np.mod(lons, 360.0, out=lons)
+
+    asc = asc_sidereal_array(jd, lat, lon)
+    aya = ayanamsa_deg_array(jd)
+
+    return {
+        "jd_ut": jd,
+        "asc": asc,
+        "lon": lons,
+        "speed": spds,
+        "ayanamsa": aya,
+        "bodies": BODY_KEYS,
+    }
+
+
+def planets_dict(batch: Dict[str, Any], i: int) -> Dict[str, Dict[str, float]]:
+    """
+    バッチ結果の i 行目を planet_sidereal_longitudes と同じ形の dict に戻す
+    （build_d1 / build_d9 等へ渡すための互換アダプタ）。
+    """
+    lon_row = batch["lon"][i].tolist()
+    spd_row = batch["speed"][i].tolist()
+    return {k: {"lon": lon_row[c], "speed": spd_row[c]} for c, k in enumerate(batch["bodies"])}
+
+
+def core_dict(batch: Dict[str, Any], i: int) -> Dict[str, Any]:
+    """バッチ結果の i 行目を compute_core と同じ形の dict に戻す。"""
+    return {
+        "jd_ut": float(batch["jd_ut"][i]),
+        "asc": float(batch["asc"][i]),
+        "planets": planets_dict(batch, i),
+        "ayanamsa": float(batch["ayanamsa"][i]),
+    }
@@ -0,0 +1,280 @@
+# calc/bench.py
+"""
+ベンチマーク（オフライン・再現可能）と回帰判定。
+
+  python -m calc.bench run -o bench.json                       # 計測して結果を JSON で保存
+  python -m calc.bench run --save-baseline bench_baseline.json  # 基準値として保存
+  python -m calc.bench run --baseline bench_baseline.json --threshold 0.25
+      → いずれかのケースが基準より 25% を超えて遅ければ終了コード 1
+  python -m calc.bench compare bench.json bench_baseline.json   # 保存済み結果どうしを比較
+
+ケース（1 回あたりの秒数を計測、corpus は固定シードで 1–2999 CE に分散）：
+  ephemeris   : planet_sidereal_longitudes / asc_sidereal / ayanamsa_deg（+ *_array 版）
+  vargas      : build_d1 / build_d9 / build_d20 / build_d60 / build_shodasavarga（全 16 分割図）
+  karaka      : compute_chara_karaka
+  validate    : prune_and_validate / validate_output
+  serialize   : pretty_json_inline_lists / dumps_pair / json.dumps（最小化）
+  pipeline    : generate_chart（corpus 全件、D1/D9/D20/D60）
+
+各ケースは repeat 回計測して最小値（ノイズに強い）と中央値を記録し、比較には最小値を使う。
+Swiss Ephemeris はファイル無し（Moshier）で動くので --ephe-path 省略時もオフラインで完結する。
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .chara_karaka import compute_chara_karaka
+from .d1 import build_d1
+from .d9 import build_d9
+from .d20 import build_d20
+from .d60 import build_d60
+from .ephemeris import (
+    asc_sidereal,
+    asc_sidereal_array,
+    ayanamsa_deg,
+    ayanamsa_deg_array,
+    compat_report,
+    jd_ut_from_local,
+    planet_sidereal_longitudes,
+)
+from .pipeline import DEFAULT_OPTS, compute_core, generate_chart, init_ephemeris
+from .serialize import dumps_pair, pretty_json_inline_lists
+from .shodasavarga import build_shodasavarga
+from .validators import prune_and_validate, validate_output
+from .varga import VARGA_NAMES
+
+FORMAT_VERSION = 1
+DEFAULT_THRESHOLD = 0.25
+ALL_VARGAS = ("D1", "D9", "D20", "D60")
+
+
+# =======================================================
+# corpus
+# =======================================================
+def make_corpus(n: int = 200, seed: int = 20240101) -> List[Dict[str, Any]]:
+    """固定シードの出生レコード（parse_record 形式）。年は 1–2999 CE に一様。"""
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        y = rnd.randint(1, 2999)
+        mo = rnd.randint(1, 12)
+        d = rnd.randint(1, 28)
+        out.append({
+            "name": f"bench{i:04d}",
+            "date": date(y, mo, d).isoformat(),
+            "time": f"{rnd.randrange(24):02d}:{rnd.randrange(60):02d}:{rnd.randrange(60):02d}",
+            "tz": rnd.choice((-8.0, -5.0, 0.0, 1.0, 5.5, 9.0)),
+            "lat": round(rnd.uniform(-60.0, 60.0), 4),
+            "lon": round(rnd.uniform(-180.0, 180.0), 4),
+            "location": "Bench",
+        })
+    return out
+
+
+def _ymdh(r: Dict[str, Any]) -> Tuple[int, int, int, float]:
+    y, mo, d = (int(x) for x in r["date"].split("-"))
+    h, m, s = (int(x) for x in r["time"].split(":"))
+    return y, mo, d, h + m / 60.0 + s / 3600.0
+
+
+def _corpus_jds(corpus: List[Dict[str, Any]]) -> List[Tuple[float, float, float]]:
+    """(jd_ut, lat, lon) の列。"""
+    return [(jd_ut_from_local(*_ymdh(r), r["tz"]), r["lat"], r["lon"]) for r in corpus]
+
+
+# =======================================================
+# 計測
+# =======================================================
+def _time(fn: Callable[[], Any], repeat: int) -> Tuple[float, float]:
+    """fn を repeat 回実行し、(最小, 中央値) 秒を返す。"""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return min(samples), statistics.median(samples)
+
+
+def build_cases(corpus: List[Dict[str, Any]]) -> List[Tuple[str, int, Callable[[], Any]]]:
+    """(ケース名, 1 回あたりの処理件数, 実行関数) の列。入力の準備はここで済ませる。"""
+    jds = _corpus_jds(corpus)
+    jd_arr, lat_arr, lon_arr = (np.array(col, dtype=np.float64) for col in zip(*jds))
+    cores = [compute_core(*_ymdh(r), r["tz"], r["lat"], r["lon"], "True") for r in corpus]
+    parts = [(c.asc, c.planets) for c in cores]
+    lons = [c.lons() for c in cores]
+    d1_opts = {"ck_mode": "7", "include_lordship": True}
+    full_opts = dict(DEFAULT_OPTS, vargas=ALL_VARGAS)
+    charts = [generate_chart(r, full_opts) for r in corpus]
+    n = len(corpus)
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def each(fn: Callable[..., Any], args: List[Any]) -> Callable[[], None]:
+        def run() -> None:
+            for a in args:
+                fn(*a)
+        return run
+
+    return [
+        ("ephemeris.planet_sidereal_longitudes", n, each(planet_sidereal_longitudes, [(jd, "True") for jd, _, _ in jds])),
+        ("ephemeris.asc_sidereal", n, each(asc_sidereal, jds)),
+        ("ephemeris.ayanamsa_deg", n, each(ayanamsa_deg, [(jd,) for jd, _, _ in jds])),
+        ("ephemeris.asc_sidereal_array", n, lambda: asc_sidereal_array(jd_arr, lat_arr, lon_arr)),
+        ("ephemeris.ayanamsa_deg_array", n, lambda: ayanamsa_deg_array(jd_arr)),
+        ("vargas.build_d1", n, each(build_d1, [(a, pl, d1_opts) for a, pl in parts])),
+        ("vargas.build_d9", n, each(build_d9, parts)),
+        ("vargas.build_d20", n, each(build_d20, parts)),
+        ("vargas.build_d60", n, each(build_d60, parts)),
+        ("vargas.build_shodasavarga", n, each(build_shodasavarga, [(a, pl, VARGA_NAMES) for a, pl in parts])),
+        ("karaka.compute_chara_karaka", n, each(compute_chara_karaka, [(x, False) for x in lons])),
+        ("validate.prune_and_validate", n, each(prune_and_validate, [(c,) for c in charts])),
+        ("validate.validate_output", n, each(validate_output, [(c,) for c in charts])),
+        ("serialize.pretty_json_inline_lists", n, each(pretty_json_inline_lists, [(c,) for c in charts])),
+        ("serialize.dumps_pair", n, each(dumps_pair, [(c,) for c in charts])),
+        ("serialize.json_minified", n, each(dumps, [(c,) for c in charts])),
+        ("pipeline.generate_chart", n, each(generate_chart, [(r, full_opts) for r in corpus])),
+    ]
+
+
+def run(
+    n: int = 200,
+    repeat: int = 5,
+    seed: int = 20240101,
+    ephe_path: str = "",
+    only: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """全ケースを計測し、機械可読な結果（dict）を返す。"""
+    init_ephemeris(ephe_path, DEFAULT_OPTS["ayan_mode"])
+    corpus = make_corpus(n, seed)
+    results: Dict[str, Dict[str, float]] = {}
+    for name, count, fn in build_cases(corpus):
+        if only and not any(name.startswith(p) for p in only):
+            continue
+        fn()  # warm-up
+        best, med = _time(fn, repeat)
+        results[name] = {
+            "n": count,
+            "best_s": best,
+            "median_s": med,
+            "per_item_us": best / count * 1e6,
+        }
+    return {
+        "format": FORMAT_VERSION,
+        "env": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "swisseph": compat_report(),
+        },
+        "params": {"n": n, "repeat": repeat, "seed": seed, "ephe_path": ephe_path},
+        "results": results,
+    }
+
+
+# =======================================================
+# 比較
+# =======================================================
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    ケースごとに per_item_us の比（current / baseline）を求める。
+    比が 1 + threshold を超えたものは regressed=True。基準に無いケースは比較しない。
+    """
+    rows = []
+    base = baseline.get("results", {})
+    for name, cur in current.get("results", {}).items():
+        ref = base.get(name)
+        if ref is None or ref["per_item_us"] <= 0:
+            continue
+        ratio = cur["per_item_us"] / ref["per_item_us"]
+        rows.append({
+            "case": name,
+            "baseline_us": ref["per_item_us"],
+            "current_us": cur["per_item_us"],
+            "ratio": ratio,
+            "regressed": ratio > 1.0 + threshold,
+        })
+    return rows
+
+
+def _print_table(data: Dict[str, Any], rows: Optional[List[Dict[str, Any]]], out=sys.stderr) -> None:
+    ratios = {r["case"]: r for r in rows or []}
+    for name, res in data["results"].items():
+        line = f"{name:<40} {res['per_item_us']:>12.2f} us/item"
+        r = ratios.get(name)
+        if r is not None:
+            line += f"  x{r['ratio']:.2f}" + ("  REGRESSED" if r["regressed"] else "")
+        print(line, file=out)
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as fp:
+        return json.load(fp)
+
+
+def _save(data: Dict[str, Any], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as fp:
+        json.dump(data, fp, ensure_ascii=False, indent=2)
+        fp.write("\n")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m calc.bench", description="ベンチマークと回帰判定")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("run", help="計測する")
+    p.add_argument("-n", type=int, default=200, help="corpus の件数")
+    p.add_argument("--repeat", type=int, default=5, help="ケースごとの計測回数（最小値を採用）")
+    p.add_argument("--seed", type=int, default=20240101, help="corpus の乱数シード")
+    p.add_argument("--ephe-path", default="", help="Swiss Ephemeris ファイルパス（空で内蔵）")
+    p.add_argument("--only", default="", help="ケース名の接頭辞（カンマ区切り、例：vargas,serialize）")
+    p.add_argument("-o", "--output", default="-", help="結果 JSON（省略または - で stdout）")
+    p.add_argument("--baseline", default=None, help="比較する基準結果 JSON")
+    p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                   help="許容する遅化率（0.25 = 基準より 25%% 遅いまで許容）")
+    p.add_argument("--save-baseline", default=None, help="結果を基準として保存するパス")
+
+    c = sub.add_parser("compare", help="保存済みの結果を基準と比較する")
+    c.add_argument("current")
+    c.add_argument("baseline")
+    c.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.cmd == "compare":
+        data = _load(args.current)
+        rows = compare(data, _load(args.baseline), args.threshold)
+        _print_table(data, rows)
+        json.dump({"comparison": rows}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return 1 if any(r["regressed"] for r in rows) else 0
+
+    only = [x.strip() for x in args.only.split(",") if x.strip()]
+    data = run(args.n, args.repeat, args.seed, args.ephe_path, only)
+    rows = None
+    if args.baseline:
+        rows = compare(data, _load(args.baseline), args.threshold)
+        data["comparison"] = {"baseline": args.baseline, "threshold": args.threshold, "cases": rows}
+    if args.output == "-":
+        json.dump(data, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        _save(data, args.output)
+    if args.save_baseline:
+        _save(data, args.save_baseline)
+    _print_table(data, rows)
+    return 1 if rows and any(r["regressed"] for r in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+# calc/cache.py
+"""
+計算結果キャッシュ（サイズ上限つき LRU + TTL、任意で SQLite 永続化）。
+
+- 値は pickle した bytes で保持する。サイズ計上が正確になり、取り出すたびに新しいオブジェクトが
+  返るので、呼び出し側が結果を書き換えても（inject_karakamsa など）キャッシュは汚れない
+  （st.cache_data と同じ振る舞い）。
+- メモリ層：OrderedDict による LRU。合計 bytes が max_bytes を超えたら古いものから追い出す。
+- TTL：保存時刻を記録し、読み出し時に ttl_sec と比べる（0 は無制限）。ttl_sec は後から変更可。
+- 永続層（path 指定時）：SQLite（WAL）。同じファイルを指せば別プロセス・別セッションと共有できる。
+  メモリでミスしたらディスクを見て、当たればメモリへ昇格する。ディスクも max_disk_bytes で LRU 削除。
+- 統計：hits / misses / disk_hits / sets / evictions / expirations / entries / bytes。
+
+  cache = ResultCache(max_bytes=64 << 20, ttl_sec=3600, path="cache.sqlite")
+  core = cache.get_or_compute(("core", y, mo, d, ...), compute_core, y, mo, d, ...)
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from . import metrics
+
+_MISS = object()
+_PROTO = pickle.HIGHEST_PROTOCOL
+
+
+def make_key(parts: Any) -> str:
+    """キー部品（タプル等、repr が安定なもの）→ 固定長の文字列キー。"""
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """スレッドセーフな結果キャッシュ。"""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 << 20,
+        ttl_sec: float = 0,
+        path: Optional[str] = None,
+        max_disk_bytes: int = 1 << 30,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_sec = ttl_sec
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self._mem: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()  # key -> (保存時刻, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid = 0
+        self._disk_sets = 0
+        self.stats: Dict[str, int] = {
+            "hits": 0, "misses": 0, "disk_hits": 0, "sets": 0, "evictions": 0, "expirations": 0,
+        }
+
+    # ---- SQLite ----
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        # fork 後の子プロセスでは親の接続を使わない
+        if self._db is None or self._db_pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+                " created REAL NOT NULL, atime REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS cache_atime ON cache(atime)")
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def _disk_get(self, key: str, now: float) -> Any:
+        db = self._conn()
+        if db is None:
+            return _MISS
+        row = db.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return _MISS
+        blob, created = row
+        if self._expired(created, now):
+            db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.stats["expirations"] += 1
+            return _MISS
+        db.execute("UPDATE cache SET atime = ? WHERE key = ?", (now, key))
+        return created, blob
+
+    def _disk_set(self, key: str, created: float, blob: bytes) -> None:
+        db = self._conn()
+        if db is None:
+            return
+        db.execute(
+            "INSERT OR REPLACE INTO cache (key, value, created, atime, size) VALUES (?, ?, ?, ?, ?)",
+            (key, blob, created, created, len(blob)),
+        )
+        self._disk_sets += 1
+        if self._disk_sets % 256 == 0:
+            self._disk_trim(created)
+
+    def _disk_trim(self, now: float) -> None:
+        """期限切れを消し、max_disk_bytes を超えていれば atime の古い順に消す。"""
+        db = self._conn()
+        if self.ttl_sec:
+            n = db.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl_sec,)).rowcount
+            self.stats["expirations"] += max(n, 0)
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        excess = total - self.max_disk_bytes
+        freed = 0
+        victims = []
+        for key, size in db.execute("SELECT key, size FROM cache ORDER BY atime"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        db.executemany("DELETE FROM cache WHERE key = ?", victims)
+        self.stats["evictions"] += len(victims)
+
+    # ---- core ----
+    def _expired(self, created: float, now: float) -> bool:
+        return bool(self.ttl_sec) and now - created > self.ttl_sec
+
+    def _mem_put(self, key: str, created: float, blob: bytes) -> None:
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old[1])
+        if len(blob) > self.max_bytes:
+            return
+        self._mem[key] = (created, blob)
+        self._bytes += len(blob)
+        while self._bytes > self.max_bytes:
+            _, (_, victim) = self._mem.popitem(last=False)
+            self._bytes -= len(victim)
+            self.stats["evictions"] += 1
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """キー（文字列、またはキー部品）で取り出す。無ければ default。"""
+        k = key if isinstance(key, str) else make_key(key)
+        now = time.time()
+        with self._lock:
+            ent = self._mem.get(k)
+            if ent is not None:
+                if self._expired(ent[0], now):
+                    del self._mem[k]
+                    self._bytes -= len(ent[1])
+                    self.stats["expirations"] += 1
+                else:
+                    self._mem.move_to_end(k)
+                    self.stats["hits"] += 1
+                    metrics.incr("cache_lookups_total", cache="result", result="hit")
+                    return pickle.loads(ent[1])
+            got = self._disk_get(k, now)
+            if got is _MISS:
+                self.stats["misses"] += 1
+                metrics.incr("cache_lookups_total", cache="result", result="miss")
+                return default
+            created, blob = got
+            self._mem_put(k, created, blob)
+            self.stats["hits"] += 1
+            self.stats["disk_hits"] += 1
+            metrics.incr("cache_lookups_total", cache="result", result="disk_hit")
+        return pickle.loads(blob)
+
+    def set(self, key: Any, value: Any) -> None:
+        k = key if isinstance(key, str) else make_key(key)
+        blob = pickle.dumps(value, _PROTO)
+        now = time.time()
+        with self._lock:
+            self._mem_put(k, now, blob)
+            self._disk_set(k, now, blob)
+            self.stats["sets"] += 1
+
+    def get_or_compute(self, key: Any, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """キャッシュにあればそれを、無ければ fn(*args, **kwargs) を計算して保存して返す。"""
+        k = key if isinstance(key, str) else make_key(key)
+        val = self.get(k, _MISS)
+        if val is _MISS:
+            val = fn(*args, **kwargs)
+            self.set(k, val)
+        return val
+
+    def memoize(self, namespace: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """引数（位置・キーワード）をキーにする関数デコレータ。引数は repr が安定であること。"""
+        def deco(fn: Callable[..., Any]) -> Callable[..., Any]:
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                return self.get_or_compute((namespace, args, sorted(kwargs.items())), fn, *args, **kwargs)
+            wrapper.__name__ = fn.__name__
+            wrapper.__doc__ = fn.__doc__
+            wrapper.__wrapped__ = fn
+            return wrapper
+        return deco
+
+    # ---- maintenance ----
+    def purge_expired(self) -> int:
+        """期限切れを一括削除（メモリ + ディスク）。削除件数（メモリ分）を返す。"""
+        now = time.time()
+        with self._lock:
+            dead = [k for k, (created, _) in self._mem.items() if self._expired(created, now)]
+            for k in dead:
+                self._bytes -= len(self._mem.pop(k)[1])
+            self.stats["expirations"] += len(dead)
+            if self._conn() is not None:
+                self._disk_trim(now)
+        return len(dead)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._bytes = 0
+            db = self._conn()
+            if db is not None:
+                db.execute("DELETE FROM cache")
+
+    def info(self) -> Dict[str, Any]:
+        """統計のスナップショット（entries / bytes はメモリ層）。"""
+        with self._lock:
+            out: Dict[str, Any] = dict(self.stats)
+            out["entries"] = len(self._mem)
+            out["bytes"] = self._bytes
+            out["max_bytes"] = self.max_bytes
+            out["ttl_sec"] = self.ttl_sec
+            lookups = out["hits"] + out["misses"]
+            out["hit_rate"] = out["hits"] / lookups if lookups else 0.0
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None and self._db_pid == os.getpid():
+                self._db.close()
+            self._db = None
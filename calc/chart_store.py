@@ -0,0 +1,635 @@
+# calc/chart_store.py
+"""
+大量チャートの永続ストアと、ビットセット索引による属性検索。
+
+build_d1 / build_d9 の JSON を 1 件ずつ作って走査する代わりに、チャートごとの
+区分を整数コードの列（1 列 = 1 属性、int8/uint8）として持つ：
+
+  {V}.Asc.sign / {V}.{p}.sign / {V}.{p}.house   分割図 V（既定 D1, D9）のサイン・ハウス（Whole Sign）
+  {p}.nakshatra / {p}.pada / Asc.nakshatra ...  D1 のナクシャトラ（0..26）・パダ
+  AK / AmK / ... / DK（/ PiK）                  Chara Karaka の惑星
+  {p}.flags                                      retrograde / exalted / station / fast / ... のビット列
+                                                  （照会は {p}.retrograde: True のようにフラグ名で）
+
+検索時には、列ごとに「値 → 行のビットセット（uint64 の配列、1 ビット = 1 チャート）」を
+初回だけ作って保持し、条件ごとに該当値のビットセットを OR、条件どうしを AND する。
+100 万件でビットセット 1 本は 125 KB なので、索引ができていれば 1 問い合わせは数ミリ秒以下。
+
+永続化は SQLite（追加 1 回 = 1 セグメント、列ごとに 1 BLOB）。開くときに列を連結して読み込む。
+列はすべて build_d1 / build_d9 と同じ規則で NumPy 上で計算する（encode_batch）。
+
+  store = ChartStore("charts.sqlite")
+  store.add_batch(compute_core_batch(...), lat, lon, names)
+  ids = store.query({"Mo.nakshatra": "Rohini", "D9.Ju.house": "kendra"})
+  n = store.count({"AK": "Sa", "Ve.exalted": True})
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .base import EXALTATION_INDEX, NAK_LABELS_JH, NAK_SIZE, PADA_SIZE, PLANETS, SIGN_INDEX, SIGNS
+from .chara_karaka import KARAKA_7, KARAKA_8
+from .ephemeris import BODY_KEYS
+from .speed import TH
+from .varga import VARGA_RULES, sign_deg_array, varga_index_array
+
+DEFAULT_VARGAS: Tuple[str, ...] = ("D1", "D9")
+
+# {p}.flags のビット位置
+FLAG_BITS: Tuple[str, ...] = ("retrograde", "exalted", "station", "fast", "very_fast", "slow", "very_slow")
+_FLAG = {f: 1 << i for i, f in enumerate(FLAG_BITS)}
+
+# ハウス条件の別名
+HOUSE_GROUPS: Dict[str, Tuple[int, ...]] = {
+    "kendra": (1, 4, 7, 10),
+    "trikona": (1, 5, 9),
+    "dusthana": (6, 8, 12),
+    "upachaya": (3, 6, 10, 11),
+}
+
+# 速度フラグ（speed.planet_flags と同じ閾値）：(station 以下, (フラグ名, 以上))
+_SPEED_RULES: Dict[str, Tuple[float, Tuple[str, float]]] = {
+    "Me": (TH["MERCURY_STATION"], ("very_fast", TH["MERCURY_VERY_FAST"])),
+    "Ve": (TH["VENUS_STATION"], ("fast", TH["VENUS_FAST"])),
+    "Ma": (TH["MARS_STATION"], ("fast", TH["MARS_FAST"])),
+    "Ju": (TH["JUPITER_STATION"], ("fast", TH["JUPITER_FAST"])),
+    "Sa": (TH["SATURN_STATION"], ("fast", TH["SATURN_FAST"])),
+    "Ra": (TH["RAHU_STATION"], ("fast", TH["RAHU_FAST"])),
+    "Ke": (TH["RAHU_STATION"], ("fast", TH["RAHU_FAST"])),
+}
+_CK_CAND = ("Su", "Mo", "Ma", "Me", "Ju", "Ve", "Sa")
+# compute_core_batch の lon/speed の列番号
+_COL = {p: i for i, p in enumerate(BODY_KEYS)}
+
+# 列の種類 -> 値の数（flags はビット数）
+_CARD = {"sign": 12, "house": 12, "nakshatra": 27, "pada": 4, "karaka": len(PLANETS), "flags": len(FLAG_BITS)}
+
+_POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+# =======================================================
+# エンコード（NumPy、build_d1 / build_d9 と同じ規則）
+# =======================================================
+def column_kinds(vargas: Sequence[str], ck_mode: str) -> Dict[str, str]:
+    """列名 -> 種類（sign / house / nakshatra / pada / karaka / flags）。列の並びはこの dict の順。"""
+    cols: Dict[str, str] = {}
+    for v in vargas:
+        cols[f"{v}.Asc.sign"] = "sign"
+        for p in PLANETS:
+            cols[f"{v}.{p}.sign"] = "sign"
+            cols[f"{v}.{p}.house"] = "house"
+    for p in ("Asc",) + tuple(PLANETS):
+        cols[f"{p}.nakshatra"] = "nakshatra"
+        cols[f"{p}.pada"] = "pada"
+    for role in (KARAKA_8 if ck_mode == "8" else KARAKA_7):
+        cols[role] = "karaka"
+    for p in PLANETS:
+        cols[f"{p}.flags"] = "flags"
+    return cols
+
+
+def _nakshatra_codes(lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """nakshatra_pada の配列版：(ナクシャトラ 0..26, パダ 0..3)"""
+    pos = np.mod(lon, 360.0)
+    nak = np.floor_divide(pos, NAK_SIZE) % 27
+    pada = np.floor_divide(pos - nak * NAK_SIZE, PADA_SIZE)
+    return nak.astype(np.int8), np.minimum(pada, 3).astype(np.int8)
+
+
+def _flag_codes(p: str, speed: np.ndarray, si: np.ndarray) -> np.ndarray:
+    """speed.flags と exalted（D1）の配列版 → FLAG_BITS のビット列（uint8）"""
+    out = np.where(speed < 0, _FLAG["retrograde"], 0).astype(np.uint8)
+    if p in EXALTATION_INDEX:
+        out |= np.where(si == EXALTATION_INDEX[p], _FLAG["exalted"], 0).astype(np.uint8)
+    s = np.abs(speed)
+    if p == "Mo":
+        band = np.select(
+            [s <= TH["MOON_VERY_SLOW"], s <= TH["MOON_SLOW"], s >= TH["MOON_VERY_FAST"], s >= TH["MOON_FAST"]],
+            [_FLAG["very_slow"], _FLAG["slow"], _FLAG["very_fast"], _FLAG["fast"]],
+            0,
+        )
+        out |= band.astype(np.uint8)
+    elif p in _SPEED_RULES:
+        station, (fast, th) = _SPEED_RULES[p]
+        out |= np.where(s <= station, _FLAG["station"], 0).astype(np.uint8)
+        out |= np.where(s >= th, _FLAG[fast], 0).astype(np.uint8)
+    return out
+
+
+def encode_batch(
+    asc: np.ndarray, lon: np.ndarray, speed: np.ndarray, vargas: Sequence[str] = DEFAULT_VARGAS, ck_mode: str = "7"
+) -> Dict[str, np.ndarray]:
+    """
+    asc (N,) / lon, speed (N, 9)（列は BODY_KEYS 順、compute_core_batch と同じ）→ {列名: (N,) 整数コード}。
+    """
+    asc = np.asarray(asc, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    speed = np.asarray(speed, dtype=np.float64)
+    kinds = column_kinds(vargas, ck_mode)
+    out: Dict[str, np.ndarray] = {}
+
+    asi, adeg = sign_deg_array(asc)
+    psi, pdeg = sign_deg_array(lon)
+    for v in vargas:
+        a = varga_index_array(v, asi, adeg).astype(np.int8)
+        s = varga_index_array(v, psi, pdeg).astype(np.int8)
+        out[f"{v}.Asc.sign"] = a
+        for p, c in _COL.items():
+            out[f"{v}.{p}.sign"] = s[:, c]
+            out[f"{v}.{p}.house"] = (s[:, c] - a) % 12
+
+    out["Asc.nakshatra"], out["Asc.pada"] = _nakshatra_codes(asc)
+    nak, pada = _nakshatra_codes(lon)
+    for p, c in _COL.items():
+        out[f"{p}.nakshatra"] = nak[:, c]
+        out[f"{p}.pada"] = pada[:, c]
+
+    # Chara Karaka：サイン内度数の降順（Ra は 30 - deg）。同値は候補順（compute_chara_karaka と同じ安定ソート）
+    cand = _CK_CAND + (("Ra",) if ck_mode == "8" else ())
+    deg = pdeg[:, [_COL[p] for p in cand]]
+    if ck_mode == "8":
+        deg[:, -1] = 30.0 - deg[:, -1]
+    code = np.array([PLANETS.index(p) for p in cand], dtype=np.int8)
+    order = np.argsort(-deg, axis=1, kind="stable")
+    for r, role in enumerate(KARAKA_8 if ck_mode == "8" else KARAKA_7):
+        out[role] = code[order[:, r]]
+
+    for p, c in _COL.items():
+        out[f"{p}.flags"] = _flag_codes(p, speed[:, c], psi[:, c])
+    return {k: out[k] for k in kinds}
+
+
+# =======================================================
+# ビットセット
+# =======================================================
+def _pack(mask: np.ndarray) -> np.ndarray:
+    """bool (N,) → uint64 のビットセット（ビット i = 行 i）"""
+    b = np.packbits(mask, bitorder="little")
+    pad = -len(b) % 8
+    if pad:
+        b = np.concatenate([b, np.zeros(pad, dtype=np.uint8)])
+    return b.view(np.uint64)
+
+
+def popcount(bits: np.ndarray) -> int:
+    return int(_POP8[bits.view(np.uint8)].sum(dtype=np.int64))
+
+
+def bits_to_ids(bits: np.ndarray) -> np.ndarray:
+    """ビットセット → 立っている行番号（昇順、int64）。0 の語は展開しない。"""
+    words = np.flatnonzero(bits)
+    if not len(words):
+        return words
+    sub = np.unpackbits(bits[words].view(np.uint8), bitorder="little").reshape(-1, 64)
+    r, c = np.nonzero(sub)
+    return words[r] * 64 + c
+
+
+def _codes_for(kind: str, value: Any) -> List[int]:
+    """条件の値（ラベル / 数値 / その列 / 別名）→ コードの列。"""
+    if kind == "house" and isinstance(value, str):
+        if value not in HOUSE_GROUPS:
+            raise ValueError(f"unknown house group: {value!r}")
+        value = HOUSE_GROUPS[value]
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [c for v in value for c in _codes_for(kind, v)]
+    try:
+        if kind == "sign":
+            return [SIGN_INDEX[value]]
+        if kind == "nakshatra":
+            return [NAK_LABELS_JH.index(value)]
+        if kind == "karaka":
+            return [PLANETS.index(value)]
+    except (KeyError, ValueError):
+        raise ValueError(f"invalid {kind} value: {value!r}") from None
+    if kind == "house" and isinstance(value, int) and 1 <= value <= 12:
+        return [value - 1]
+    if kind == "pada" and isinstance(value, int) and 1 <= value <= 4:
+        return [value - 1]
+    raise ValueError(f"invalid {kind} value: {value!r}")
+
+
+def _decode(kind: str, code: int) -> Any:
+    if kind == "sign":
+        return SIGNS[code]
+    if kind == "nakshatra":
+        return NAK_LABELS_JH[code]
+    if kind == "karaka":
+        return PLANETS[code]
+    if kind == "flags":
+        return [f for f in FLAG_BITS if code & _FLAG[f]]
+    return code + 1
+
+
+# =======================================================
+# ストア
+# =======================================================
+class ChartStore:
+    """
+    整数コード列のチャートストア（path 指定で SQLite に永続化、None でメモリのみ）。
+    vargas / ck_mode は新規作成時のスキーマ。既存ファイルを開くときは省略すればファイルの値を使う。
+    追加と検索はロックで直列化する（検索結果は呼び出し時点の全行に対するもの）。
+    """
+
+    def __init__(self, path: Optional[str] = None, vargas: Optional[Sequence[str]] = None, ck_mode: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        schema = self._open_schema()
+        if schema is not None:
+            if vargas is not None and tuple(vargas) != tuple(schema["vargas"]):
+                raise ValueError(f"store was created with vargas {schema['vargas']}")
+            if ck_mode is not None and ck_mode != schema["ck_mode"]:
+                raise ValueError(f"store was created with ck_mode {schema['ck_mode']}")
+            vargas, ck_mode = schema["vargas"], schema["ck_mode"]
+        vargas = tuple(vargas or DEFAULT_VARGAS)
+        unknown = set(vargas).difference(VARGA_RULES)
+        if unknown:
+            raise ValueError(f"unknown varga: {', '.join(sorted(unknown))}")
+        if ck_mode not in (None, "7", "8"):
+            raise ValueError(f"ck_mode must be '7' or '8', got {ck_mode!r}")
+        self.vargas: Tuple[str, ...] = vargas
+        self.ck_mode: str = ck_mode or "7"
+        self.kinds = column_kinds(self.vargas, self.ck_mode)
+        if schema is None and self._db is not None:
+            self._db.execute(
+                "INSERT INTO meta (key, value) VALUES ('schema', ?)",
+                (json.dumps({"vargas": list(self.vargas), "ck_mode": self.ck_mode}),),
+            )
+
+        # 列（セグメントごとの配列。検索時に連結）
+        self._chunks: Dict[str, List[np.ndarray]] = {k: [] for k in (*self.kinds, "jd_ut", "lat", "lon")}
+        self._names: List[str] = []
+        self._cols: Optional[Dict[str, np.ndarray]] = None
+        self._index: Dict[str, np.ndarray] = {}
+        self._all: Optional[np.ndarray] = None
+        self.n = 0
+        if self._db is not None:
+            self._load()
+
+    # ---- SQLite ----
+    def _open_schema(self) -> Optional[Dict[str, Any]]:
+        if self.path is None:
+            return None
+        db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS columns ("
+            " seg INTEGER NOT NULL, name TEXT NOT NULL, data BLOB NOT NULL, PRIMARY KEY (seg, name))"
+        )
+        self._db = db
+        row = db.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _dtype(self, name: str) -> np.dtype:
+        if name == "jd_ut":
+            return np.dtype(np.float64)
+        if name in ("lat", "lon"):
+            return np.dtype(np.float32)
+        return np.dtype(np.uint8 if self.kinds[name] == "flags" else np.int8)
+
+    def _load(self) -> None:
+        segs: Dict[int, Dict[str, bytes]] = {}
+        for seg, name, data in self._db.execute("SELECT seg, name, data FROM columns ORDER BY seg"):
+            segs.setdefault(seg, {})[name] = data
+        for cols in segs.values():
+            for name in self._chunks:
+                self._chunks[name].append(np.frombuffer(cols[name], dtype=self._dtype(name)))
+            names = json.loads(cols["name"].decode("utf-8"))
+            self._names.extend(names)
+            self.n += len(names)
+
+    def _write_segment(self, cols: Mapping[str, np.ndarray], names: Sequence[str], replace: bool = False) -> None:
+        """1 セグメントを 1 トランザクションで書く。replace=True なら既存の全セグメントを消してから（compact 用）。"""
+        if self._db is None:
+            return
+        db = self._db
+        # 書き込みロックを先に取り、seg 番号の採番から INSERT までを他プロセスの追加と直列化する
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if replace:
+                db.execute("DELETE FROM columns")
+            seg = db.execute("SELECT COALESCE(MAX(seg), -1) + 1 FROM columns").fetchone()[0]
+            rows = [(seg, k, np.ascontiguousarray(v, dtype=self._dtype(k)).tobytes()) for k, v in cols.items()]
+            rows.append((seg, "name", json.dumps(list(names), ensure_ascii=False).encode("utf-8")))
+            db.executemany("INSERT INTO columns (seg, name, data) VALUES (?, ?, ?)", rows)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    # ---- 追加 ----
+    def add_batch(
+        self,
+        batch: Mapping[str, Any],
+        lat: Sequence[float],
+        lon: Sequence[float],
+        names: Optional[Sequence[str]] = None,
+    ) -> range:
+        """
+        compute_core_batch の結果（と、その入力の緯度経度・名前）を追加し、追加した行番号を返す。
+        1 回の呼び出しが 1 セグメントになるので、まとめて（数万件単位で）渡すのが望ましい。
+        """
+        n = len(batch["jd_ut"])
+        if tuple(batch.get("bodies", BODY_KEYS)) != BODY_KEYS:
+            raise ValueError("batch columns must be in BODY_KEYS order")
+        names = [str(x) for x in names] if names is not None else [""] * n
+        if not (len(lat) == len(lon) == len(names) == n):
+            raise ValueError("all input arrays must have the same length")
+        cols = encode_batch(batch["asc"], batch["lon"], batch["speed"], self.vargas, self.ck_mode)
+        cols["jd_ut"] = np.asarray(batch["jd_ut"], dtype=np.float64)
+        cols["lat"] = np.asarray(lat, dtype=np.float32)
+        cols["lon"] = np.asarray(lon, dtype=np.float32)
+        with self._lock:
+            self._write_segment(cols, names)
+            for k, v in cols.items():
+                self._chunks[k].append(np.ascontiguousarray(v, dtype=self._dtype(k)))
+            self._names.extend(names)
+            start = self.n
+            self.n += n
+            self._cols = None
+            self._index.clear()
+            self._all = None
+        return range(start, start + n)
+
+    def compact(self) -> None:
+        """全セグメントを 1 つにまとめる（追加を細かく繰り返したファイルの読み込みを速くする）。"""
+        with self._lock:
+            cols = self._columns()
+            self._write_segment(cols, self._names, replace=True)
+            for k, v in cols.items():
+                self._chunks[k] = [v]
+
+    # ---- 索引 ----
+    def _columns(self) -> Dict[str, np.ndarray]:
+        if self._cols is None:
+            self._cols = {
+                k: (np.concatenate(v) if v else np.empty(0, dtype=self._dtype(k))) for k, v in self._chunks.items()
+            }
+        return self._cols
+
+    def _column_index(self, name: str) -> np.ndarray:
+        """列 name のビットセット索引 (値の数, 語数)。flags 列はビットごと。"""
+        idx = self._index.get(name)
+        if idx is None:
+            col = self._columns()[name]
+            kind = self.kinds[name]
+            if kind == "flags":
+                idx = np.stack([_pack((col & _FLAG[f]) != 0) for f in FLAG_BITS])
+            else:
+                idx = np.stack([_pack(col == c) for c in range(_CARD[kind])])
+            self._index[name] = idx
+        return idx
+
+    def _term(self, field: str, value: Any) -> np.ndarray:
+        if field in self.kinds:
+            kind = self.kinds[field]
+            if kind == "flags":
+                raise ValueError(f"query flags by name, e.g. {field.split('.')[0]}.retrograde")
+            codes = sorted(set(_codes_for(kind, value)))
+            idx = self._column_index(field)
+            return np.bitwise_or.reduce(idx[codes], axis=0) if codes else np.zeros_like(self._all)
+        p, _, flag = field.rpartition(".")
+        if flag in _FLAG and f"{p}.flags" in self.kinds:
+            bits = self._column_index(f"{p}.flags")[FLAG_BITS.index(flag)]
+            return bits if value else ~bits & self._all
+        raise ValueError(f"unknown field: {field!r}")
+
+    def mask(self, where: Mapping[str, Any], exclude: Optional[Mapping[str, Any]] = None) -> np.ndarray:
+        """
+        条件に合う行のビットセット。where の各項目は AND、値に列（リスト等）を渡せばその中の OR。
+        exclude の各項目に当たる行は除く。値の書き方：
+          サイン "Ta" / ハウス 1..12 または HOUSE_GROUPS の名前 / ナクシャトラ "Rohini" / パダ 1..4 /
+          Chara Karaka（"AK" など）は惑星 "Sa" / フラグ（"Ve.exalted" など）は True/False
+        """
+        with self._lock:
+            if self._all is None:
+                self._all = _pack(np.ones(self.n, dtype=bool))
+            out = self._all.copy()
+            for field, value in where.items():
+                np.bitwise_and(out, self._term(field, value), out=out)
+            for field, value in (exclude or {}).items():
+                np.bitwise_and(out, ~self._term(field, value), out=out)
+        return out
+
+    def query(self, where: Mapping[str, Any], exclude: Optional[Mapping[str, Any]] = None, limit: Optional[int] = None) -> np.ndarray:
+        """条件に合う行番号（昇順、int64）。"""
+        ids = bits_to_ids(self.mask(where, exclude))
+        return ids[:limit] if limit is not None else ids
+
+    def count(self, where: Mapping[str, Any], exclude: Optional[Mapping[str, Any]] = None) -> int:
+        return popcount(self.mask(where, exclude))
+
+    # ---- 取り出し ----
+    def column(self, name: str) -> np.ndarray:
+        """列 name（整数コード、または jd_ut / lat / lon）の全行の配列（読み取り専用）。"""
+        with self._lock:
+            col = self._columns().get(name)
+        if col is None:
+            raise ValueError(f"unknown column: {name!r}")
+        view = col.view()
+        view.setflags(write=False)
+        return view
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._names)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """行 i を {"name", "jd_ut", "lat", "lon", 列名: ラベル} へ戻す。"""
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        with self._lock:
+            cols = self._columns()
+        out: Dict[str, Any] = {
+            "name": self._names[i],
+            "jd_ut": float(cols["jd_ut"][i]),
+            "lat": round(float(cols["lat"][i]), 4),
+            "lon": round(float(cols["lon"][i]), 4),
+        }
+        for k, kind in self.kinds.items():
+            out[k] = _decode(kind, int(cols[k][i]))
+        return out
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "charts": self.n,
+                "columns": len(self.kinds),
+                "segments": len(self._chunks["jd_ut"]),
+                "indexed_columns": len(self._index),
+                "index_bytes": sum(v.nbytes for v in self._index.values()),
+                "vargas": list(self.vargas),
+                "ck_mode": self.ck_mode,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+            self._db = None
+
+
+# =======================================================
+# レコードからの追加
+# =======================================================
+def add_records(
+    store: ChartStore,
+    records: Iterable[Mapping[str, Any]],
+    node_type: str = "True",
+    table: Any = None,
+    chunk: int = 50000,
+) -> int:
+    """
+    出生レコード（calc.pipeline.parse_record の形式）を chunk 件ずつ compute_core_batch して追加する。
+    追加した件数を返す。先に init_ephemeris(...) を済ませておくこと。
+    """
+    from .batch import compute_core_batch
+    from .pipeline import parse_record
+
+    total = 0
+    buf: List[Dict[str, Any]] = []
+
+    def flush() -> None:
+        nonlocal total
+        if not buf:
+            return
+        batch = compute_core_batch(
+            [r["date"] for r in buf],
+            [r["h"] + r["m"] / 60.0 + r["s"] / 3600.0 for r in buf],
+            [r["tz"] for r in buf],
+            [r["lat"] for r in buf],
+            [r["lon"] for r in buf],
+            node_type,
+            table,
+        )
+        store.add_batch(batch, [r["lat"] for r in buf], [r["lon"] for r in buf], [r["name"] for r in buf])
+        total += len(buf)
+        buf.clear()
+
+    for rec in records:
+        buf.append(parse_record(rec))
+        if len(buf) >= chunk:
+            flush()
+    flush()
+    return total
+
+
+# =======================================================
+# CLI
+# =======================================================
+def _parse_where(items: Sequence[str]) -> Dict[str, Any]:
+    """["Mo.nakshatra=Rohini", "D9.Ju.house=1,4,7,10", "Ve.exalted=true"] → query の where"""
+    out: Dict[str, Any] = {}
+    for item in items:
+        field, sep, raw = item.partition("=")
+        if not sep:
+            raise ValueError(f"expected FIELD=VALUE, got {item!r}")
+        vals: List[Any] = []
+        for v in raw.split(","):
+            v = v.strip()
+            if v.lower() in ("true", "false"):
+                vals.append(v.lower() == "true")
+            elif v.isdigit():
+                vals.append(int(v))
+            else:
+                vals.append(v)
+        out[field.strip()] = vals[0] if len(vals) == 1 else vals
+    return out
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m calc.chart_store", description="チャートストア（追加・検索）")
+    ap.add_argument("db", help="ストアの SQLite ファイル")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    add = sub.add_parser("add", help="出生レコード（JSONL）を追加")
+    add.add_argument("input", nargs="?", default="-", help="入力 JSONL（省略または - で標準入力）")
+    add.add_argument("--vargas", default=",".join(DEFAULT_VARGAS), help="新規作成時の分割図（カンマ区切り）")
+    add.add_argument("--ck", choices=["7", "8"], default="7", help="新規作成時の Chara Karaka（7/8）")
+    add.add_argument("--node", choices=["True", "Mean"], default="True", help="ノードの計算")
+    add.add_argument("--ayanamsa", default="Lahiri_ICRC", help="アヤナーンシャ（既定 Lahiri_ICRC）")
+    add.add_argument("--ephe-path", default="", help="Swiss Ephemeris ファイルパス（空で内蔵）")
+    add.add_argument("--table", default="", help="calc.ephe_table のテーブルファイル（省略時は swisseph）")
+    add.add_argument("--compact", action="store_true", help="追加後にセグメントをまとめる")
+
+    q = sub.add_parser("query", help="条件に合うチャートを出力（JSONL）")
+    q.add_argument("--where", action="append", default=[], help="FIELD=VALUE[,VALUE...]（複数指定で AND）")
+    q.add_argument("--exclude", action="append", default=[], help="除外条件（--where と同じ書式）")
+    q.add_argument("--limit", type=int, default=20, help="出力件数（既定 20、0 で件数のみ）")
+
+    sub.add_parser("info", help="ストアの概要")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.cmd != "add" and not os.path.exists(args.db):
+        print(f"error: no such store: {args.db}", file=sys.stderr)
+        return 2
+    try:
+        if args.cmd == "add":
+            vargas = tuple(v.strip() for v in args.vargas.split(",") if v.strip())
+            store = ChartStore(args.db, vargas, args.ck) if not os.path.exists(args.db) else ChartStore(args.db)
+        else:
+            store = ChartStore(args.db)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        if args.cmd == "add":
+            from .pipeline import init_ephemeris
+            table = None
+            if args.table:
+                from .ephe_table import EpheTable
+                table = EpheTable(args.table)
+                args.ayanamsa = table.ayan_mode
+            init_ephemeris(args.ephe_path, args.ayanamsa)
+            fp = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+            try:
+                records = (json.loads(line) for line in fp if line.strip())
+                n = add_records(store, records, args.node, table)
+            except ValueError as e:
+                print(f"error: {e}", file=sys.stderr)
+                return 2
+            finally:
+                if fp is not sys.stdin:
+                    fp.close()
+                if table is not None:
+                    table.close()
+            if args.compact:
+                store.compact()
+            print(json.dumps({"added": n, **store.info()}, ensure_ascii=False))
+        elif args.cmd == "query":
+            try:
+                where = _parse_where(args.where)
+                exclude = _parse_where(args.exclude)
+                ids = store.query(where, exclude)
+            except ValueError as e:
+                print(f"error: {e}", file=sys.stderr)
+                return 2
+            print(json.dumps({"count": int(len(ids))}), file=sys.stderr)
+            for i in ids[: max(args.limit, 0)].tolist():
+                r = store.row(i)
+                sys.stdout.write(json.dumps(
+                    {"id": i, "name": r["name"], "jd_ut": r["jd_ut"], "lat": r["lat"], "lon": r["lon"]},
+                    ensure_ascii=False, separators=(",", ":"),
+                ))
+                sys.stdout.write("\n")
+        else:
+            print(json.dumps(store.info(), ensure_ascii=False))
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
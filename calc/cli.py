@@ -0,0 +1,201 @@
+# calc/cli.py
+"""
+ヘッドレス JSONL パイプライン。
+
+  python -m calc.cli births.jsonl -o charts.jsonl --vargas D1,D9,D20
+  cat births.jsonl | python -m calc.cli > charts.jsonl
+
+入力 1 行 = 出生レコード 1 件（calc.pipeline.parse_record 参照）、
+出力 1 行 = 最小化 JSON 1 件（app.py のダウンロードと同じ内容）。
+読み込み → 計算 → 書き出しをジェネレータで繋いでいるため、
+入力件数に関わらずメモリ使用量は一定。
+不正な行は {"error": ..., "line": n} を同じ位置に出力して処理を続ける。
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from . import metrics
+from .pipeline import DEFAULT_OPTS, VARGA_NAMES, generate_chart, init_ephemeris
+from .variants import AYANAMSA_MODES, DEFAULT_NODE_TYPES, generate_variants
+
+
+def iter_records(fp: TextIO) -> Iterator[Tuple[int, Any]]:
+    """(行番号, レコード or 例外) を 1 行ずつ返す。空行は読み飛ばす。"""
+    for lineno, line in enumerate(fp, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield lineno, json.loads(line)
+        except ValueError as e:
+            yield lineno, e
+
+
+def iter_results(records: Iterable[Tuple[int, Any]], opts: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """レコードを 1 件ずつ生成結果（または error オブジェクト）へ変換する。"""
+    for lineno, rec in records:
+        if isinstance(rec, Exception):
+            yield {"error": f"invalid JSON: {rec}", "line": lineno}
+            continue
+        try:
+            cmp = opts.get("compare")
+            if cmp:
+                yield generate_variants(rec, opts, cmp["ayanamsas"], cmp["node_types"])
+            else:
+                yield generate_chart(rec, opts)
+        except (ValueError, TypeError) as e:
+            yield {"error": str(e), "line": lineno}
+        except Exception as e:
+            # 想定外の失敗もそのレコードだけのエラーにする（ワーカーから例外を漏らさない）
+            yield {"error": f"{type(e).__name__}: {e}", "line": lineno}
+
+
+def write_jsonl(results: Iterable[Dict[str, Any]], out: TextIO) -> Tuple[int, int]:
+    """最小化 JSON を 1 行ずつ書き出し、(件数, エラー件数) を返す。"""
+    n = n_err = 0
+    for obj in results:
+        with metrics.span("serialize"):
+            line = json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+        out.write(line)
+        out.write("\n")
+        n += 1
+        if "error" in obj:
+            n_err += 1
+    return n, n_err
+
+
+def parse_vargas(text: str) -> Tuple[str, ...]:
+    names = tuple(v.strip().upper() for v in text.split(",") if v.strip())
+    bad = [v for v in names if v not in VARGA_NAMES]
+    if bad:
+        raise argparse.ArgumentTypeError(f"unknown varga: {', '.join(bad)}")
+    return names
+
+
+def parse_ayanamsas(text: str) -> Tuple[str, ...]:
+    names = tuple(v.strip() for v in text.split(",") if v.strip())
+    bad = [v for v in names if v not in AYANAMSA_MODES]
+    if bad or not names:
+        raise argparse.ArgumentTypeError(
+            f"unknown ayanamsa: {', '.join(bad) or '(none)'}（{', '.join(AYANAMSA_MODES)}）"
+        )
+    return names
+
+
+def parse_node_types(text: str) -> Tuple[str, ...]:
+    names = tuple(v.strip() for v in text.split(",") if v.strip())
+    if not names or any(v not in ("True", "Mean") for v in names):
+        raise argparse.ArgumentTypeError("node types must be True and/or Mean")
+    return names
+
+
+def parse_workers(text: str) -> int:
+    try:
+        n = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid worker count: {text}") from None
+    if n < 0:
+        raise argparse.ArgumentTypeError("worker count must be >= 0 (0 = CPU count)")
+    return n
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m calc.cli", description="出生レコード(JSONL) → AI向け JSON(JSONL)")
+    ap.add_argument("input", nargs="?", default="-", help="入力 JSONL（省略または - で stdin）")
+    ap.add_argument("-o", "--output", default="-", help="出力 JSONL（省略または - で stdout）")
+    ap.add_argument("--vargas", type=parse_vargas, default=DEFAULT_OPTS["vargas"],
+                    help="出力する分割図（例：D1,D9,D20,D60）")
+    ap.add_argument("--node", choices=["True", "Mean"], default=DEFAULT_OPTS["node_type"], help="ノードの計算")
+    ap.add_argument("--ck", choices=["7", "8"], default=DEFAULT_OPTS["ck_mode"], help="Chara Karaka")
+    ap.add_argument("--no-lordship", action="store_true", help="支配関係を出力しない")
+    ap.add_argument("--ashtakavarga", action="store_true", help="D1 に Ashtakavarga（BAV/SAV）を含む")
+    ap.add_argument("--aspects", action="store_true", help="D1 にアスペクト（グラハ／ラーシ・ドリシュティ）を含む")
+    ap.add_argument("--validate", action="store_true", help="出力ごとにスキーマ検査を行う（不正はエラー行）")
+    ap.add_argument("--ephe-path", default="", help="Swiss Ephemeris ファイルパス（空で内蔵）")
+    ap.add_argument("--compare-ayanamsas", type=parse_ayanamsas, default=None,
+                    help="比較モード：アヤナーンシャ（例：Lahiri,Lahiri_ICRC,Raman,KP）ごとのバリアントを 1 件にまとめて出力")
+    ap.add_argument("--compare-nodes", type=parse_node_types, default=None,
+                    help="比較モードのノード種別（既定 True,Mean）。指定のみでもアヤナーンシャは既定モードで比較")
+    ap.add_argument("-j", "--workers", type=parse_workers, default=1,
+                    help="ワーカープロセス数（0 で CPU コア数、1 で単一プロセス）")
+    ap.add_argument("--chunk-size", type=int, default=64, help="ワーカーへ渡す 1 チャンクあたりの件数")
+    ap.add_argument("-q", "--quiet", action="store_true", help="スループット報告を出さない")
+    ap.add_argument("--metrics", default=None, metavar="FILE",
+                    help="ステージ別の計測を有効にし、終了時に書き出す（.json なら JSON、それ以外は Prometheus 形式）")
+    return ap
+
+
+def opts_from_args(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "node_type": args.node,
+        "ck_mode": args.ck,
+        "include_lordship": not args.no_lordship,
+        "include_ashtakavarga": args.ashtakavarga,
+        "include_aspects": args.aspects,
+        "vargas": args.vargas,
+        "validate": args.validate,
+        "compare": (
+            {
+                "ayanamsas": args.compare_ayanamsas or (DEFAULT_OPTS["ayan_mode"],),
+                "node_types": args.compare_nodes or DEFAULT_NODE_TYPES,
+            }
+            if args.compare_ayanamsas or args.compare_nodes
+            else None
+        ),
+    }
+
+
+def write_metrics(path: str) -> None:
+    """calc.metrics の内容を書き出す（.json なら snapshot、それ以外は Prometheus text）。"""
+    with open(path, "w", encoding="utf-8") as fp:
+        if path.endswith(".json"):
+            json.dump(metrics.snapshot(), fp, ensure_ascii=False)
+        else:
+            fp.write(metrics.prometheus_text())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    opts = opts_from_args(args)
+    if args.metrics:
+        metrics.enable()
+
+    fin = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    fout = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    t0 = time.perf_counter()
+    try:
+        if args.workers == 1:
+            init_ephemeris(args.ephe_path, DEFAULT_OPTS["ayan_mode"])
+            results = iter_results(iter_records(fin), opts)
+        else:
+            from .parallel import parallel_results
+            results = parallel_results(
+                iter_records(fin),
+                opts,
+                workers=args.workers or None,
+                chunk_size=args.chunk_size,
+                ephe_path=args.ephe_path,
+            )
+        n, n_err = write_jsonl(results, fout)
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+        else:
+            fout.flush()
+    dt = time.perf_counter() - t0
+
+    if args.metrics:
+        write_metrics(args.metrics)
+    if not args.quiet:
+        rate = n / dt if dt > 0 else 0.0
+        print(f"{n} records ({n_err} errors) in {dt:.2f}s, {rate:.1f} rec/s", file=sys.stderr)
+    return 1 if n_err else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# calc/core.py
+"""
+ChartCore：1 チャート分のコア計算結果（Asc/惑星/アヤナーンシャ）を
+固定レイアウトの倍精度バイト列 1 本に詰めた不変オブジェクト。
+
+  [jd_ut, asc, ayanamsa, lon(Su..Ke) × 9, speed(Su..Ke) × 9]   # 21 doubles (<d)
+  + node_type 1 byte（1 = True, 0 = Mean）
+
+従来の {"Su": {"lon":..., "speed":...}, ...} 入れ子 dict に比べて 1 件あたりの
+メモリが 1 桁小さく、ハッシュ・比較・pickle もこのバイト列 1 本で済む
+（bytes のハッシュ値は CPython がオブジェクト内にキャッシュする）。
+既存の builder（build_d1 など）には planets プロパティ（読み取り専用の
+Mapping アダプタ）を渡せばそのまま使える。
+"""
+import hashlib
+import struct
+from typing import Any, Dict, Iterator, Mapping, Sequence
+
+from .ephemeris import BODY_KEYS
+
+_N = len(BODY_KEYS)
+_LON = 3
+_SPD = 3 + _N
+_SIZE = 3 + 2 * _N
+_INDEX: Dict[str, int] = {k: i for i, k in enumerate(BODY_KEYS)}
+
+_PACK = struct.Struct(f"<{_SIZE}d")
+_D = struct.Struct("<d").unpack_from
+_NODE_BYTE = {"True": b"\x01", "Mean": b"\x00"}
+_NODE_TYPE = {1: "True", 0: "Mean"}
+
+
+class PlanetsView(Mapping):
+    """ChartCore の惑星部分を planet_sidereal_longitudes と同じ形で見せる読み取り専用 Mapping。"""
+
+    __slots__ = ("_v",)
+
+    def __init__(self, raw: bytes):
+        self._v = raw
+
+    def __getitem__(self, key: str) -> Dict[str, float]:
+        i = _INDEX[key]
+        return {"lon": _D(self._v, 8 * (_LON + i))[0], "speed": _D(self._v, 8 * (_SPD + i))[0]}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(BODY_KEYS)
+
+    def __len__(self) -> int:
+        return _N
+
+
+class ChartCore:
+    """不変のコア計算結果。compute_core の dict の代わりに使う。"""
+
+    __slots__ = ("_v",)
+
+    def __init__(self, values: Sequence[float], node_type: str = "True"):
+        if len(values) != _SIZE:
+            raise ValueError(f"ChartCore expects {_SIZE} values, got {len(values)}")
+        object.__setattr__(self, "_v", _PACK.pack(*values) + _NODE_BYTE[node_type])
+
+    # ---- constructors ----
+    @classmethod
+    def from_parts(
+        cls,
+        jd_ut: float,
+        asc: float,
+        ayanamsa: float,
+        planets: Mapping[str, Mapping[str, float]],
+        node_type: str = "True",
+    ) -> "ChartCore":
+        """planet_sidereal_longitudes 形式の dict から作る。"""
+        lons = [planets[k]["lon"] for k in BODY_KEYS]
+        spds = [planets[k]["speed"] for k in BODY_KEYS]
+        return cls([jd_ut, asc, ayanamsa, *lons, *spds], node_type)
+
+    @classmethod
+    def from_dict(cls, core: Mapping[str, Any], node_type: str = "True") -> "ChartCore":
+        """compute_core 形式の dict（jd_ut/asc/planets/ayanamsa）から作る。"""
+        return cls.from_parts(core["jd_ut"], core["asc"], core["ayanamsa"], core["planets"], node_type)
+
+    @classmethod
+    def from_batch(cls, batch: Mapping[str, Any], i: int, node_type: str = "True") -> "ChartCore":
+        """calc.batch.compute_core_batch の i 行目から作る（列順は BODY_KEYS で共通）。"""
+        return cls(
+            [float(batch["jd_ut"][i]), float(batch["asc"][i]), float(batch["ayanamsa"][i]),
+             *batch["lon"][i].tolist(), *batch["speed"][i].tolist()],
+            node_type,
+        )
+
+    # ---- immutability ----
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("ChartCore is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("ChartCore is immutable")
+
+    # ---- accessors ----
+    @property
+    def jd_ut(self) -> float:
+        return _D(self._v, 0)[0]
+
+    @property
+    def asc(self) -> float:
+        return _D(self._v, 8)[0]
+
+    @property
+    def ayanamsa(self) -> float:
+        return _D(self._v, 16)[0]
+
+    @property
+    def node_type(self) -> str:
+        return _NODE_TYPE[self._v[-1]]
+
+    @property
+    def planets(self) -> PlanetsView:
+        return PlanetsView(self._v)
+
+    def lon(self, planet: str) -> float:
+        return _D(self._v, 8 * (_LON + _INDEX[planet]))[0]
+
+    def speed(self, planet: str) -> float:
+        return _D(self._v, 8 * (_SPD + _INDEX[planet]))[0]
+
+    def values(self) -> tuple:
+        """レイアウト順の 21 値。"""
+        return _PACK.unpack_from(self._v)
+
+    def lons(self) -> Dict[str, float]:
+        """{planet: lon}（compute_chara_karaka 等の入力形式）"""
+        v = self.values()
+        return {k: v[_LON + i] for k, i in _INDEX.items()}
+
+    def as_dict(self) -> Dict[str, Any]:
+        """compute_core と同じ形の dict へ戻す（互換アダプタ）。"""
+        v = self.values()
+        return {
+            "jd_ut": v[0],
+            "asc": v[1],
+            "planets": {k: {"lon": v[_LON + i], "speed": v[_SPD + i]} for k, i in _INDEX.items()},
+            "ayanamsa": v[2],
+        }
+
+    # ---- hashing / equality / pickling ----
+    def key(self) -> str:
+        """プロセスをまたいで安定なキー（キャッシュ用）。"""
+        return hashlib.blake2b(self._v, digest_size=16).hexdigest()
+
+    def __hash__(self) -> int:
+        return hash(self._v)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ChartCore):
+            return NotImplemented
+        return self._v == other._v
+
+    def __reduce__(self):
+        return (_from_bytes, (self._v,))
+
+    def __repr__(self) -> str:
+        return f"ChartCore(jd_ut={self.jd_ut!r}, asc={self.asc:.4f}, node_type={self.node_type!r})"
+
+
+def _from_bytes(raw: bytes) -> ChartCore:
+    if len(raw) != _PACK.size + 1:
+        raise ValueError("invalid ChartCore payload")
+    obj = object.__new__(ChartCore)
+    object.__setattr__(obj, "_v", raw)
+    return obj
@@ -1,16 +1,19 @@
 # calc/d1.py
 from typing import Dict, Any
 from .base import (
-    deg_in_sign,
-    house_from_signs,
+    SIGNS,
+    deg_in_sign_index,
+    house_from_index,
     nakshatra_pada,
     round2,
-    EXALTATION_SIGN,
+    EXALTATION_INDEX,
 )
 from .speed import flags as speed_flags
 from .chara_karaka import compute_chara_karaka
 from .lordship import planet_lordship
 from .panchanga import tithi_from_elongation
+from .ashtakavarga import TARGETS as AV_TARGETS, ashtakavarga
+from .aspects import chart_aspects
 
 
 def build_d1(asc_lon: float, planets: Dict[str, Dict[str, float]], opts: Dict[str, Any]) -> Dict[str, Any]:
@@ -29,6 +32,8 @@ def build_d1(asc_lon: float, planets: Dict[str, Dict[str, float]], opts: Dict[st
         {
           "ck_mode": "7" | "8",           # Jaimini Chara Karaka system
           "include_lordship": bool,       # include planet->houses rulership
+          "include_ashtakavarga": bool,   # include BAV/SAV (default False)
+          "include_aspects": bool,        # include graha/rashi drishti (default False)
         }
 
     Returns
@@ -38,34 +43,39 @@ def build_d1(asc_lon: float, planets: Dict[str, Dict[str, float]], opts: Dict[st
           "Asc": {...},
           "planets": { "Su": {...}, ... },
           "jaimini": {...},               # (if ck_mode provided)
-          "lordship": {...}               # (if include_lordship True)
+          "lordship": {...},              # (if include_lordship True)
+          "ashtakavarga": {...},          # (if include_ashtakavarga True)
+          "aspects": {...}                # (if include_aspects True)
         }
 
     Notes
     -----
     - House system: Whole Sign
     - Nakshatra labels: JH英名（例：Uttara Bhadrapada）
-    - Degree: 0.00–29.99, 小数2桁
+    - Degree: 0.00–29.99, 小数2桁（0.00 および speed 0.000 は出力しない）
+    - 出力は常に prune 済み（None/False/空のリスト・辞書を含まない）。検査は validators.validate_output
     - retrograde / exalted は true の時のみ出力
     - Moon：常に speed(小数3桁) を出し、very_slow/slow/fast/very_fast を真の時のみ付与
     - 他惑星：station/fast/very_fast のいずれかが真の時のみ speed(3桁) を出力
     - Nodes(Ra/Ke)：degree/nakshatra は出力しない（house/signは出力）
     - 月に限り "paksha"（Shukla/Krishna） と "tithi"（Pratipada〜/Purnima/Amavasya）を付与
     - karakamsa_sign は app.py 側で D9 から注入してください
+    - ashtakavarga：{"BAV": {"Su": [...], ..., "Sa": [...]}, "SAV": [...]}、各リストはサイン順（Ar..Pi）の 12 個
+    - aspects：{"graha": {"Ma": {"houses": [...], "planets": [...]}, ...}, "rashi": {...}}（calc.aspects.chart_aspects）
     """
 
     # ---- Ascendant ----
-    asc_sign, asc_deg = deg_in_sign(asc_lon)
+    asc_si, asc_deg = deg_in_sign_index(asc_lon)
+    asc_sign = SIGNS[asc_si]
     asc_nak, asc_pada = nakshatra_pada(asc_lon)
 
-    out: Dict[str, Any] = {
-        "Asc": {
-            "sign": asc_sign,
-            "degree": round2(asc_deg),
-            "nakshatra": f"{asc_nak}-{asc_pada}",
-        },
-        "planets": {}
-    }
+    asc_one: Dict[str, Any] = {"sign": asc_sign}
+    asc_d = round2(asc_deg)
+    if asc_d:  # 0.00 is never emitted (same rule as validators.is_prunable)
+        asc_one["degree"] = asc_d
+    asc_one["nakshatra"] = f"{asc_nak}-{asc_pada}"
+    out: Dict[str, Any] = {"Asc": asc_one, "planets": {}}
+    sign_idx: Dict[str, int] = {}
 
     # ---- keep Sun/Moon longitudes for Tithi ----
     sun_lon = planets.get("Su", {}).get("lon")
@@ -77,15 +87,18 @@ def build_d1(asc_lon: float, planets: Dict[str, Dict[str, float]], opts: Dict[st
         lon = float(dat["lon"])
         spd = float(dat["speed"])
 
-        sign, deg = deg_in_sign(lon)
+        si, deg = deg_in_sign_index(lon)
+        sign_idx[p] = si
         one: Dict[str, Any] = {
-            "sign": sign,
-            "house": house_from_signs(asc_sign, sign),
+            "sign": SIGNS[si],
+            "house": house_from_index(asc_si, si),
         }
 
         # Nodes は degree/nakshatra を出さない
         if p not in ("Ra", "Ke"):
-            one["degree"] = round2(deg)
+            d = round2(deg)
+            if d:
+                one["degree"] = d
             nk, pa = nakshatra_pada(lon)
             one["nakshatra"] = f"{nk}-{pa}"
 
@@ -98,7 +111,7 @@ def build_d1(asc_lon: float, planets: Dict[str, Dict[str, float]], opts: Dict[st
 
         # Moon：常時 speed（3桁）＋ 該当する速度バンドのみ出力
         if p == "Mo":
-            if sp.get("speed") is not None:
+            if sp.get("speed"):
                 one["speed"] = sp["speed"]
             for key in ("very_slow", "slow", "fast", "very_fast"):
                 if sp.get(key):
@@ -113,14 +126,14 @@ def build_d1(asc_lon: float, planets: Dict[str, Dict[str, float]], opts: Dict[st
 
         else:
             # 他惑星：station/fast/very_fast のいずれかが真なら speed を出力
-            if sp.get("speed") is not None:
+            if sp.get("speed"):
                 one["speed"] = sp["speed"]
             for key in ("station", "fast", "very_fast"):
                 if sp.get(key):
                     one[key] = True
 
         # exalted（真のときのみ）
-        if EXALTATION_SIGN.get(p) == sign:
+        if EXALTATION_INDEX.get(p) == si:
             one["exalted"] = True
 
         out["planets"][p] = one
@@ -135,6 +148,15 @@ def build_d1(asc_lon: float, planets: Dict[str, Dict[str, float]], opts: Dict[st
 
     # ---- Lordship（Whole Sign）----
     if (opts or {}).get("include_lordship", True):
-        out["lordship"] = planet_lordship(asc_sign)
+        # Ra/Ke rule no sign -> their empty lists are left out
+        out["lordship"] = {p: h for p, h in planet_lordship(asc_sign).items() if h}
+
+    # ---- Ashtakavarga（BAV / SAV、D1 のサインから）----
+    if (opts or {}).get("include_ashtakavarga") and all(p in sign_idx for p in AV_TARGETS):
+        out["ashtakavarga"] = ashtakavarga(sign_idx, asc_si)
+
+    # ---- Aspects（グラハ／ラーシ・ドリシュティ）----
+    if (opts or {}).get("include_aspects"):
+        out["aspects"] = chart_aspects(sign_idx, asc_si)
 
     return out
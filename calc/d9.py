@@ -1,14 +1,12 @@
 # calc/d9.py
 from typing import Dict
-from .base import deg_in_sign, house_from_signs
-from .varga import d9_sign
+from .base import SIGNS, deg_in_sign_index, house_from_index
+from .varga import d9_index
 
 def build_d9(asc_lon: float, planets: Dict[str, Dict]) -> Dict:
-    asc_sign, asc_deg = deg_in_sign(asc_lon)
-    asc_d9 = d9_sign(asc_sign, asc_deg)
-    out = {"Asc": {"sign": asc_d9}, "planets": {}}
+    asc_d9 = d9_index(*deg_in_sign_index(asc_lon))
+    out = {"Asc": {"sign": SIGNS[asc_d9]}, "planets": {}}
     for p, dat in planets.items():
-        s, d = deg_in_sign(dat["lon"])
-        vs = d9_sign(s, d)
-        out["planets"][p] = {"sign": vs, "house": house_from_signs(asc_d9, vs)}
+        vs = d9_index(*deg_in_sign_index(dat["lon"]))
+        out["planets"][p] = {"sign": SIGNS[vs], "house": house_from_index(asc_d9, vs)}
     return out
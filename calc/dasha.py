@@ -0,0 +1,184 @@
+# calc/dasha.py
+"""
+Vimshottari ダシャー（maha / antar / pratyantar / sookshma / prana）。
+
+5 階層の全期間（9^5 ≒ 59k ノード）を作らずに、
+  - dasha_at(...)        : ある時刻 T の期間チェーン（階層ごとに 9 区分から 1 つ選ぶだけ、O(levels)）
+  - dasha_at_batch(...)  : 多数チャート × 時刻の同じ問い合わせを NumPy でまとめて評価
+  - iter_periods(...)    : 指定階層の期間を時刻順に遅延生成（[start, end) と重なる枝だけ降りる）
+を提供する。
+
+種（seed）は出生時の月のサイデリアル黄経（planet_sidereal_longitudes / ChartCore の "Mo"）：
+  ナクシャトラ番号 % 9 の支配星から始まり、ナクシャトラ内の経過割合ぶん最初のマハーダシャーは
+  出生前に始まっている。120 年で 1 周し、以後も同じ順で繰り返す。
+どの階層も「親期間を、親の支配星から始まる 9 星の年数比（年数 / 120）で分割」なので、
+マハーダシャー自体も「長さ 120 年・支配星 = 種の星」の仮想期間の分割として同じ式で扱う。
+
+時刻はすべて Julian day（UT）。1 年 = DASHA_YEAR_DAYS 日（既定 365.25）。
+
+  chain = dasha_at(core.lon("Mo"), core.jd_ut, jd_now, levels=3)           # ChartCore から
+  b = compute_core_batch(...)                                               # 1 万件の現在チェーン
+  res = dasha_at_batch(b["lon"][:, BODY_COLUMN["Mo"]], b["jd_ut"], jd_now, levels=3)
+"""
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .base import NAK_SIZE
+
+DASHA_LORDS: Tuple[str, ...] = ("Ke", "Ve", "Su", "Mo", "Ma", "Ra", "Ju", "Sa", "Me")
+DASHA_YEARS: Tuple[int, ...] = (7, 20, 6, 10, 7, 18, 16, 19, 17)
+TOTAL_YEARS = 120
+LEVEL_NAMES: Tuple[str, ...] = ("maha", "antar", "pratyantar", "sookshma", "prana")
+DASHA_YEAR_DAYS = 365.25
+
+_FRAC: Tuple[float, ...] = tuple(y / TOTAL_YEARS for y in DASHA_YEARS)
+# _CUM[l][k]：支配星 l の期間を分割したとき、k 番目の区分（支配星 (l + k) % 9）が始まる割合（k = 0..9）
+_CUM: Tuple[Tuple[float, ...], ...] = tuple(
+    tuple(sum(_FRAC[(l + j) % 9] for j in range(k)) for k in range(10)) for l in range(9)
+)
+_CUM_NP = np.array(_CUM, dtype=np.float64)            # (9, 10)
+_FRAC_NP = np.array(_FRAC, dtype=np.float64)           # (9,)
+
+
+class Period(NamedTuple):
+    level: int      # 0 = maha … 4 = prana
+    lord: str
+    start: float    # jd_ut
+    end: float      # jd_ut
+
+
+def dasha_seed(moon_lon: float, jd_birth: float, year_days: float = DASHA_YEAR_DAYS) -> Tuple[int, float]:
+    """(最初のマハーダシャーの支配星番号, その周期の開始 jd)。"""
+    pos = moon_lon % 360.0
+    nak = int(pos // NAK_SIZE) % 27
+    lord = nak % 9
+    elapsed = (pos - nak * NAK_SIZE) / NAK_SIZE
+    return lord, jd_birth - elapsed * DASHA_YEARS[lord] * year_days
+
+
+def balance_at_birth(moon_lon: float, year_days: float = DASHA_YEAR_DAYS) -> Tuple[str, float]:
+    """(出生時のマハーダシャー支配星, 残り年数)。"""
+    pos = moon_lon % 360.0
+    nak = int(pos // NAK_SIZE) % 27
+    lord = nak % 9
+    remaining = 1.0 - (pos - nak * NAK_SIZE) / NAK_SIZE
+    return DASHA_LORDS[lord], remaining * DASHA_YEARS[lord]
+
+
+def _split(lord: int, start: float, length: float, k: int) -> Tuple[int, float, float]:
+    """親（lord, start, length）の k 番目の区分 → (支配星, 開始, 長さ)。"""
+    return (lord + k) % 9, start + _CUM[lord][k] * length, _FRAC[(lord + k) % 9] * length
+
+
+def dasha_at(
+    moon_lon: float,
+    jd_birth: float,
+    jd: float,
+    levels: int = 3,
+    year_days: float = DASHA_YEAR_DAYS,
+) -> List[Period]:
+    """時刻 jd の期間チェーン（maha から levels 階層ぶん）。"""
+    if not 1 <= levels <= len(LEVEL_NAMES):
+        raise ValueError(f"levels must be 1..{len(LEVEL_NAMES)}")
+    lord, cycle0 = dasha_seed(moon_lon, jd_birth, year_days)
+    length = TOTAL_YEARS * year_days
+    n_cycle = (jd - cycle0) // length
+    start = cycle0 + n_cycle * length
+    chain: List[Period] = []
+    for level in range(levels):
+        f = (jd - start) / length
+        cum = _CUM[lord]
+        k = 0
+        while k < 8 and cum[k + 1] <= f:
+            k += 1
+        lord, start, length = _split(lord, start, length, k)
+        chain.append(Period(level, DASHA_LORDS[lord], start, start + length))
+    return chain
+
+
+def iter_periods(
+    moon_lon: float,
+    jd_birth: float,
+    level: int = 0,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    year_days: float = DASHA_YEAR_DAYS,
+) -> Iterator[Period]:
+    """
+    level 階層（0 = maha … 4 = prana）の期間を時刻順に遅延生成する。
+    [start, end) と重なるものだけを返し、重ならない枝には降りない。
+    start 省略時は出生時、end 省略時は出生から 120 年。
+    """
+    if not 0 <= level < len(LEVEL_NAMES):
+        raise ValueError(f"level must be 0..{len(LEVEL_NAMES) - 1}")
+    lo = jd_birth if start is None else start
+    hi = jd_birth + TOTAL_YEARS * year_days if end is None else end
+    seed, cycle0 = dasha_seed(moon_lon, jd_birth, year_days)
+    cycle_len = TOTAL_YEARS * year_days
+
+    def walk(lord: int, s: float, length: float, depth: int) -> Iterator[Period]:
+        for k in range(9):
+            sub, ss, sl = _split(lord, s, length, k)
+            if ss + sl <= lo:
+                continue
+            if ss >= hi:
+                return
+            if depth == level:
+                yield Period(level, DASHA_LORDS[sub], ss, ss + sl)
+            else:
+                yield from walk(sub, ss, sl, depth + 1)
+
+    c = cycle0 + ((lo - cycle0) // cycle_len) * cycle_len
+    while c < hi:
+        yield from walk(seed, c, cycle_len, 0)
+        c += cycle_len
+
+
+def dasha_at_batch(
+    moon_lon: Sequence[float],
+    jd_birth: Sequence[float],
+    jd: Any,
+    levels: int = 3,
+    year_days: float = DASHA_YEAR_DAYS,
+) -> Dict[str, np.ndarray]:
+    """
+    dasha_at のバッチ版（N 件のチャート、jd はスカラーまたは (N,)）。
+
+    Returns:
+      {"lord": (N, levels) int8  DASHA_LORDS の番号,
+       "start": (N, levels) float64 jd, "end": (N, levels) float64 jd}
+    """
+    if not 1 <= levels <= len(LEVEL_NAMES):
+        raise ValueError(f"levels must be 1..{len(LEVEL_NAMES)}")
+    pos = np.mod(np.asarray(moon_lon, dtype=np.float64), 360.0)
+    birth = np.asarray(jd_birth, dtype=np.float64)
+    t = np.broadcast_to(np.asarray(jd, dtype=np.float64), pos.shape)
+    nak = (pos // NAK_SIZE).astype(np.int64) % 27
+    lord = nak % 9
+    elapsed = (pos - nak * NAK_SIZE) / NAK_SIZE
+    length = np.full(pos.shape, TOTAL_YEARS * year_days)
+    cycle0 = birth - elapsed * np.array(DASHA_YEARS, dtype=np.float64)[lord] * year_days
+    start = cycle0 + np.floor((t - cycle0) / length) * length
+
+    n = pos.shape[0]
+    out_lord = np.empty((n, levels), dtype=np.int8)
+    out_start = np.empty((n, levels), dtype=np.float64)
+    out_end = np.empty((n, levels), dtype=np.float64)
+    for level in range(levels):
+        f = (t - start) / length
+        cum = _CUM_NP[lord]                                   # (N, 10)
+        k = np.minimum((cum[:, 1:] <= f[:, None]).sum(axis=1), 8)
+        sub = (lord + k) % 9
+        start = start + cum[np.arange(n), k] * length
+        length = _FRAC_NP[sub] * length
+        lord = sub
+        out_lord[:, level] = sub
+        out_start[:, level] = start
+        out_end[:, level] = start + length
+    return {"lord": out_lord, "start": out_start, "end": out_end}
+
+
+def chain_names(lords: Sequence[int]) -> str:
+    """(1, 5, 3) → "Ve-Ra-Mo"（dasha_at_batch の lord 行の表示用）"""
+    return "-".join(DASHA_LORDS[int(i)] for i in lords)
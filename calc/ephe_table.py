@@ -0,0 +1,296 @@
+# calc/ephe_table.py
+"""
+事前計算した Chebyshev 係数による惑星位置テーブル（オプションの "table" バックエンド）。
+
+planet_sidereal_longitudes は 1 件ごとに swe.calc_ut を 8 回呼ぶ。対象期間
+（既定 1800–2100 年）のサイデリアル黄経を天体ごと・一定日数の区間ごとに
+Chebyshev 多項式で近似してバイナリファイルに保存し、mmap して評価する。
+評価時に swisseph は呼ばない。速度は黄経多項式の導関数から求める。
+
+  python -m calc.ephe_table build ephe_1800_2100.bin        # 生成（1〜2 分）
+  python -m calc.ephe_table info  ephe_1800_2100.bin        # ヘッダと誤差
+  python -m calc.ephe_table check ephe_1800_2100.bin        # swe.calc_ut と再比較
+
+最大誤差（build 時にランダム時刻で calc_ut と比較し、ヘッダに記録）：
+  - 黄経：1e-3° 以下（Su/Mo/Ra/Rm は 2e-5° 未満。他天体の上限は Swiss Ephemeris
+    自体の出力にある微小な不連続に由来する）
+  - 速度：1e-3 deg/day 以下（calc_ut の速度自体が数値微分のため）
+出力は黄経 2 桁・速度 3 桁なので、表示上の差は境界付近でのみ起こりうる。
+
+テーブルは build 時のアヤナーンシャ（ayan_mode）で固定される。
+Asc / アヤナーンシャは従来どおり swisseph で計算するため、同じモードで
+init_ephemeris / setup_sidereal しておくこと。
+"""
+import argparse
+import mmap
+import struct
+import sys
+import time
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+import numpy as np
+import swisseph as swe
+
+from .ephemeris import BODY_KEYS, SIDEREAL_SPEED_FLAG, setup_sidereal
+
+MAGIC = b"JYEPHT1\0"
+VERSION = 1
+_HEADER = struct.Struct("<8sII16sdd")   # magic, version, n_bodies, ayan_mode, jd_start, jd_end
+_BODY = struct.Struct("<4siIIQddd")     # key, body, n_coef, n_segs, offset, seg_days, err_lon, err_speed
+
+# (テーブル上のキー, swisseph 天体番号, 区間日数, 次数)。"Rm" は Mean Node。
+BODY_SPECS: Tuple[Tuple[str, int, float, int], ...] = (
+    ("Su", swe.SUN, 16.0, 10),
+    ("Mo", swe.MOON, 4.0, 12),
+    ("Me", swe.MERCURY, 8.0, 12),
+    ("Ve", swe.VENUS, 16.0, 10),
+    ("Ma", swe.MARS, 16.0, 10),
+    ("Ju", swe.JUPITER, 32.0, 10),
+    ("Sa", swe.SATURN, 32.0, 10),
+    ("Ra", swe.TRUE_NODE, 4.0, 12),
+    ("Rm", swe.MEAN_NODE, 64.0, 8),
+)
+
+JD_1800 = 2378496.5  # 1800-01-01 0h UT
+JD_2100 = 2488069.5  # 2100-01-01 0h UT
+
+
+def _cheb_nodes(n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Chebyshev 第 1 種の節点 x_k と、節点値 → 係数の変換行列。"""
+    k = np.arange(n)
+    x = np.cos(np.pi * (k + 0.5) / n)
+    m = np.cos(np.pi * np.outer(np.arange(n), k + 0.5) / n) * (2.0 / n)
+    m[0] *= 0.5
+    return x, m
+
+
+def _eval_array(coef: np.ndarray, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """coef: (N, n) の係数、x: (N,) の [-1, 1] → (値, d/dx)"""
+    n = coef.shape[1]
+    t0 = np.ones_like(x)
+    t1 = x
+    d0 = np.zeros_like(x)
+    d1 = np.ones_like(x)
+    val = coef[:, 0] + coef[:, 1] * x
+    der = coef[:, 1].copy()
+    for j in range(2, n):
+        t2 = 2.0 * x * t1 - t0
+        d2 = 2.0 * t1 + 2.0 * x * d1 - d0
+        val += coef[:, j] * t2
+        der += coef[:, j] * d2
+        t0, t1, d0, d1 = t1, t2, d1, d2
+    return val, der
+
+
+def _fit_body(body: int, jd_start: float, n_segs: int, seg_days: float, degree: int) -> np.ndarray:
+    n = degree + 1
+    x, m = _cheb_nodes(n)
+    calc_ut = swe.calc_ut
+    flag = SIDEREAL_SPEED_FLAG
+    starts = jd_start + np.arange(n_segs) * seg_days
+    ts = starts[:, None] + (x[None, :] + 1.0) * (0.5 * seg_days)
+    lon = np.empty_like(ts)
+    for i, row in enumerate(ts.tolist()):
+        for k, t in enumerate(row):
+            lon[i, k] = calc_ut(t, body, flag)[0][0]
+    # 区間内で 360° をまたぐ場合に備えて連続化
+    lon = np.unwrap(lon, period=360.0, axis=1)
+    return lon @ m.T
+
+
+def build_table(
+    path: str,
+    jd_start: float = JD_1800,
+    jd_end: float = JD_2100,
+    ayan_mode: str = "Lahiri_ICRC",
+    n_check: int = 2000,
+    seed: int = 0,
+) -> Dict[str, Dict[str, float]]:
+    """
+    テーブルを生成して path に書き出す。返り値は天体ごとの最大誤差
+    {"Su": {"lon": deg, "speed": deg/day}, ...}（n_check 点のランダム比較）。
+    ephe パスは呼び出し側で設定しておくこと（init_ephemeris）。
+    """
+    setup_sidereal(ayan_mode)  # type: ignore[arg-type]
+    rng = np.random.default_rng(seed)
+    blocks: List[Tuple[str, int, int, int, float, np.ndarray, float, float]] = []
+    for key, body, seg_days, degree in BODY_SPECS:
+        n_segs = int(np.ceil((jd_end - jd_start) / seg_days))
+        coef = _fit_body(body, jd_start, n_segs, seg_days, degree)
+
+        # 節点以外の時刻で calc_ut と比較
+        t = jd_start + rng.random(n_check) * (jd_end - jd_start)
+        u = (t - jd_start) / seg_days
+        idx = np.minimum(u.astype(np.int64), n_segs - 1)
+        val, der = _eval_array(coef[idx], 2.0 * (u - idx) - 1.0)
+        ref = np.array([swe.calc_ut(tt, body, SIDEREAL_SPEED_FLAG)[0] for tt in t.tolist()])
+        err_lon = float(np.max(np.abs((val - ref[:, 0] + 180.0) % 360.0 - 180.0)))
+        err_spd = float(np.max(np.abs(der * (2.0 / seg_days) - ref[:, 3])))
+        blocks.append((key, body, degree + 1, n_segs, seg_days, coef, err_lon, err_spd))
+
+    offset = _HEADER.size + _BODY.size * len(blocks)
+    with open(path, "wb") as fp:
+        fp.write(_HEADER.pack(MAGIC, VERSION, len(blocks), ayan_mode.encode("ascii"), jd_start, jd_end))
+        for key, body, n_coef, n_segs, seg_days, coef, e_lon, e_spd in blocks:
+            fp.write(_BODY.pack(key.encode("ascii"), body, n_coef, n_segs, offset, seg_days, e_lon, e_spd))
+            offset += coef.size * 8
+        for blk in blocks:
+            fp.write(np.ascontiguousarray(blk[5], dtype="<f8").tobytes())
+    return {b[0]: {"lon": b[6], "speed": b[7]} for b in blocks}
+
+
+class EpheTable:
+    """
+    build_table で作ったファイルを mmap して評価する。
+    常駐メモリは実際に触れたページ分のみ。
+    """
+
+    def __init__(self, path: str):
+        self._fp = open(path, "rb")
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_bodies, ayan, jd_start, jd_end = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not an ephemeris table (or unsupported version): {path}")
+        self.ayan_mode = ayan.rstrip(b"\0").decode("ascii")
+        self.jd_start = jd_start
+        self.jd_end = jd_end
+        self.max_error: Dict[str, Dict[str, float]] = {}
+        # key -> (seg_days, n_coef, n_segs, memoryview[d], ndarray(n_segs, n_coef))
+        self._bodies: Dict[str, Tuple[float, int, int, Any, np.ndarray]] = {}
+        buf = memoryview(self._mm)
+        for i in range(n_bodies):
+            key, _body, n_coef, n_segs, offset, seg_days, e_lon, e_spd = _BODY.unpack_from(
+                self._mm, _HEADER.size + i * _BODY.size
+            )
+            key = key.rstrip(b"\0").decode("ascii")
+            view = buf[offset:offset + n_coef * n_segs * 8].cast("d")
+            arr = np.frombuffer(self._mm, dtype="<f8", count=n_coef * n_segs, offset=offset)
+            self._bodies[key] = (seg_days, n_coef, n_segs, view, arr.reshape(n_segs, n_coef))
+            self.max_error[key] = {"lon": e_lon, "speed": e_spd}
+
+    def close(self) -> None:
+        self._bodies.clear()
+        self._mm.close()
+        self._fp.close()
+
+    def __enter__(self) -> "EpheTable":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def covers(self, jd_ut: float) -> bool:
+        return self.jd_start <= jd_ut <= self.jd_end
+
+    def _segment(self, key: str, jd_ut: float) -> Tuple[int, float]:
+        seg_days, _n, n_segs, _v, _a = self._bodies[key]
+        if not self.covers(jd_ut):
+            raise ValueError(f"jd {jd_ut} outside table range [{self.jd_start}, {self.jd_end}]")
+        u = (jd_ut - self.jd_start) / seg_days
+        i = min(int(u), n_segs - 1)
+        return i, 2.0 * (u - i) - 1.0
+
+    def lon_speed(self, key: str, jd_ut: float) -> Tuple[float, float]:
+        """1 天体の (サイデリアル黄経, 速度)。key は "Su".."Sa", "Ra"(True), "Rm"(Mean)。"""
+        seg_days, n, _n_segs, c, _a = self._bodies[key]
+        i, x = self._segment(key, jd_ut)
+        b = i * n
+        t0, t1, d0, d1 = 1.0, x, 0.0, 1.0
+        val = c[b] + c[b + 1] * x
+        der = c[b + 1]
+        x2 = x + x
+        for j in range(b + 2, b + n):
+            t2 = x2 * t1 - t0
+            d2 = 2.0 * t1 + x2 * d1 - d0
+            cj = c[j]
+            val += cj * t2
+            der += cj * d2
+            t0, t1, d0, d1 = t1, t2, d1, d2
+        return val % 360.0, der * 2.0 / seg_days
+
+    def lon_speed_array(self, key: str, jd_ut: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """lon_speed の配列版。"""
+        seg_days, _n, n_segs, _v, arr = self._bodies[key]
+        jd = np.asarray(jd_ut, dtype=np.float64)
+        if jd.size and (jd.min() < self.jd_start or jd.max() > self.jd_end):
+            raise ValueError(f"jd outside table range [{self.jd_start}, {self.jd_end}]")
+        u = (jd - self.jd_start) / seg_days
+        idx = np.minimum(u.astype(np.int64), n_segs - 1)
+        val, der = _eval_array(arr[idx], 2.0 * (u - idx) - 1.0)
+        return np.mod(val, 360.0), der * (2.0 / seg_days)
+
+    def planet_sidereal_longitudes(
+        self, jd_ut: float, node_type: Literal["True", "Mean"] = "True"
+    ) -> Dict[str, Dict[str, float]]:
+        """calc.ephemeris.planet_sidereal_longitudes と同じ形の dict を返す。"""
+        res: Dict[str, Dict[str, float]] = {}
+        for key in BODY_KEYS[:-2]:
+            lon, spd = self.lon_speed(key, jd_ut)
+            res[key] = {"lon": lon, "speed": spd}
+        ra_lon, ra_spd = self.lon_speed("Ra" if node_type == "True" else "Rm", jd_ut)
+        res["Ra"] = {"lon": ra_lon, "speed": ra_spd}
+        res["Ke"] = {"lon": (ra_lon + 180.0) % 360.0, "speed": -ra_spd}
+        return res
+
+
+def check_table(table: EpheTable, n: int = 2000, seed: int = 1) -> Dict[str, Dict[str, float]]:
+    """swe.calc_ut（現在の ephe パス・サイデリアル設定）とランダム時刻で比較し、最大誤差を返す。"""
+    rng = np.random.default_rng(seed)
+    t = table.jd_start + rng.random(n) * (table.jd_end - table.jd_start)
+    out: Dict[str, Dict[str, float]] = {}
+    for key, body, _seg, _deg in BODY_SPECS:
+        lon, spd = table.lon_speed_array(key, t)
+        ref = np.array([swe.calc_ut(tt, body, SIDEREAL_SPEED_FLAG)[0] for tt in t.tolist()])
+        out[key] = {
+            "lon": float(np.max(np.abs((lon - ref[:, 0] + 180.0) % 360.0 - 180.0))),
+            "speed": float(np.max(np.abs(spd - ref[:, 3]))),
+        }
+    return out
+
+
+def _print_errors(errs: Dict[str, Dict[str, float]]) -> None:
+    for key, e in errs.items():
+        print(f"  {key}: lon {e['lon']:.2e} deg, speed {e['speed']:.2e} deg/day")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .pipeline import init_ephemeris
+
+    ap = argparse.ArgumentParser(prog="python -m calc.ephe_table", description="惑星位置テーブルの生成・確認")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="テーブルを生成")
+    b.add_argument("path")
+    b.add_argument("--start-year", type=int, default=1800)
+    b.add_argument("--end-year", type=int, default=2100)
+    b.add_argument("--ayanamsa", default="Lahiri_ICRC", choices=["Lahiri_ICRC", "Lahiri"])
+    b.add_argument("--ephe-path", default="")
+    i = sub.add_parser("info", help="ヘッダと build 時の最大誤差を表示")
+    i.add_argument("path")
+    c = sub.add_parser("check", help="swe.calc_ut と再比較")
+    c.add_argument("path")
+    c.add_argument("--samples", type=int, default=2000)
+    c.add_argument("--ephe-path", default="")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        init_ephemeris(args.ephe_path, args.ayanamsa)
+        jd0 = swe.julday(args.start_year, 1, 1, 0.0, swe.GREG_CAL)
+        jd1 = swe.julday(args.end_year, 1, 1, 0.0, swe.GREG_CAL)
+        t0 = time.perf_counter()
+        errs = build_table(args.path, jd0, jd1, args.ayanamsa)
+        print(f"built {args.path} in {time.perf_counter() - t0:.1f}s; max error vs swe.calc_ut:")
+        _print_errors(errs)
+        return 0
+
+    with EpheTable(args.path) as tbl:
+        print(f"{args.path}: {tbl.ayan_mode}, jd {tbl.jd_start} .. {tbl.jd_end}")
+        if args.cmd == "info":
+            _print_errors(tbl.max_error)
+        else:
+            init_ephemeris(args.ephe_path, tbl.ayan_mode)
+            _print_errors(check_table(tbl, args.samples))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,85 @@
 # calc/ephemeris.py
-from typing import Dict, Literal, Tuple, Any
+import math
+from typing import Any, Callable, Dict, Literal, Tuple
+
+import numpy as np
 import swisseph as swe
 
+from . import metrics
+
+# 天体の出力順（Ra/Ke を除く）。planet_sidereal_longitudes の dict 順・batch の列順に共通。
+BODY_IDS: Tuple[Tuple[str, int], ...] = (
+    ("Su", swe.SUN),
+    ("Mo", swe.MOON),
+    ("Me", swe.MERCURY),
+    ("Ve", swe.VENUS),
+    ("Ma", swe.MARS),
+    ("Ju", swe.JUPITER),
+    ("Sa", swe.SATURN),
+)
+BODY_KEYS: Tuple[str, ...] = tuple(k for k, _ in BODY_IDS) + ("Ra", "Ke")
+
+# サイデリアル + 速度つき計算フラグ
+SIDEREAL_SPEED_FLAG = swe.FLG_SWIEPH | swe.FLG_SIDEREAL | swe.FLG_SPEED
+# トロピカル + 速度つき計算フラグ（calc.variants：アヤナーンシャは後から差し引く）
+TROPICAL_SPEED_FLAG = swe.FLG_SWIEPH | swe.FLG_SPEED
+
+# アヤナーンシャ名 → (swisseph の SIDM_* 定数名, meta 表記)。この環境に無い定数は除外。
+_AYANAMSA_SPECS: Tuple[Tuple[str, str, str], ...] = (
+    ("Lahiri", "SIDM_LAHIRI", "Lahiri"),
+    ("Lahiri_ICRC", "SIDM_LAHIRI_ICRC", "Lahiri ICRC"),
+    ("Raman", "SIDM_RAMAN", "Raman"),
+    ("KP", "SIDM_KRISHNAMURTI", "Krishnamurti"),
+    ("Yukteshwar", "SIDM_YUKTESHWAR", "Sri Yukteshwar"),
+    ("Fagan_Bradley", "SIDM_FAGAN_BRADLEY", "Fagan/Bradley"),
+    ("True_Chitra", "SIDM_TRUE_CITRA", "True Chitra"),
+    ("JN_Bhasin", "SIDM_JN_BHASIN", "J.N. Bhasin"),
+)
+AYANAMSA_MODES: Dict[str, Tuple[int, str]] = {
+    name: (getattr(swe, const), label) for name, const, label in _AYANAMSA_SPECS if hasattr(swe, const)
+}
+
+# 最後に setup_sidereal で設定したアヤナーンシャ名（一時的に切り替えた後の復元用）
+_current_mode = [""]
+
 
-def setup_sidereal(ayanamsha: Literal["Lahiri_ICRC", "Lahiri"] = "Lahiri_ICRC") -> None:
+def setup_sidereal(ayanamsha: str = "Lahiri_ICRC") -> None:
     """
-    Swiss Ephemeris をサイデリアル（Lahiri ICRC 優先）に設定。
-    環境に SIDM_LAHIRI_ICRC が無い場合は Lahiri にフォールバック。
+    Swiss Ephemeris をサイデリアル（既定は Lahiri ICRC）に設定。
+    ayanamsha は AYANAMSA_MODES のキー。環境に無い（SIDM_LAHIRI_ICRC 等）・未知の名前は Lahiri にフォールバック。
     """
-    if ayanamsha == "Lahiri_ICRC" and hasattr(swe, "SIDM_LAHIRI_ICRC"):
-        swe.set_sid_mode(getattr(swe, "SIDM_LAHIRI_ICRC"), 0, 0)
+    if ayanamsha in AYANAMSA_MODES:
+        swe.set_sid_mode(AYANAMSA_MODES[ayanamsha][0], 0, 0)
     else:
         # getattr(..., 1) は古い環境における保険。通常は swe.SIDM_LAHIRI が存在する。
         swe.set_sid_mode(getattr(swe, "SIDM_LAHIRI", 1), 0, 0)
+        ayanamsha = "Lahiri"
+    _current_mode[0] = ayanamsha
+
+
+def current_ayanamsa_mode() -> str:
+    """setup_sidereal で最後に設定したアヤナーンシャ名（未設定なら ""）。"""
+    return _current_mode[0]
+
+
+# 最後に set_ephe_path で設定した ephe パス（別プロセスを同じ設定で初期化するため）
+_current_ephe_path = [""]
+
+
+def set_ephe_path(ephe_path: str) -> None:
+    """Swiss Ephemeris のファイルパスを設定（空なら内蔵）。設定できなければ内蔵に戻す。"""
+    path = ephe_path.strip()
+    try:
+        swe.set_ephe_path(path or None)
+    except Exception:
+        swe.set_ephe_path(None)
+        path = ""
+    _current_ephe_path[0] = path
+
+
+def current_ephe_path() -> str:
+    """set_ephe_path で最後に設定したパス（内蔵なら ""）。"""
+    return _current_ephe_path[0]
 
 
 def jd_ut_from_local(y: int, m: int, d: int, h_float: float, tz_hours: float) -> float:
@@ -24,54 +91,203 @@ def jd_ut_from_local(y: int, m: int, d: int, h_float: float, tz_hours: float) ->
     return jd_local - tz_hours / 24.0
 
 
-def ayanamsa_deg(jd_ut: float) -> float:
+# =======================================================
+# pyswisseph の呼び出し規約（版差）を import 時に 1 回だけ判定し、直接呼べる関数を束縛する
+# =======================================================
+_PROBE_JD = 2451545.0  # J2000
+_PROBE_LAT, _PROBE_LON = 35.68, 139.75
+_ASC_HSYS = b"W"
+
+
+def _ayan_from_ex(idx: int) -> Callable[[float], float]:
+    get_ex = swe.get_ayanamsa_ex_ut
+
+    def ayan(jd_ut: float) -> float:
+        return float(get_ex(jd_ut, 0)[idx])
+    return ayan
+
+
+def _ayan_ex_scalar(jd_ut: float) -> float:
+    return float(swe.get_ayanamsa_ex_ut(jd_ut, 0))
+
+
+def _ayan_ut(jd_ut: float) -> float:
+    return float(swe.get_ayanamsa_ut(jd_ut))
+
+
+def _probe_ayanamsa() -> Tuple[str, Callable[[float], float]]:
     """
-    現在設定のアヤナーンシャ（度）を返す。
-    pyswisseph の版差により get_ayanamsa_ex_ut の戻り値が
-      - (ayan, iflag)         # 2 要素
-      - (retflag, ayan, serr) # 3 要素
-    のいずれかになるため、長さに応じて安全に取り出す。
-    例外発生時は get_ayanamsa_ut にフォールバック。
+    get_ayanamsa_ex_ut の戻り値は版により
+      - (ayan, iflag) / (retflag, ayan)  # 2 要素（順序も版による）
+      - (retflag, ayan, serr)            # 3 要素
+      - (ayan,) / ayan                   # 1 要素・単値
+    のいずれか。タプルでは float の要素をアヤナーンシャとみなす（フラグは int）。
+    使えなければ旧 API get_ayanamsa_ut（単値）。
     """
     try:
-        res: Any = swe.get_ayanamsa_ex_ut(jd_ut, 0)
+        res: Any = swe.get_ayanamsa_ex_ut(_PROBE_JD, 0)
         if isinstance(res, tuple):
-            if len(res) == 2:
-                ayan, _iflag = res
-                return float(ayan)
-            if len(res) == 3:
-                _retflag, ayan, _serr = res
-                return float(ayan)
-            if len(res) == 1:
-                return float(res[0])
-        # 想定外でも 0 番目を試みる（ほぼ来ないはず）
-        return float(res[0])  # type: ignore[index]
+            idx = next((i for i, x in enumerate(res) if isinstance(x, float)), None)
+            if idx is not None:
+                return f"get_ayanamsa_ex_ut -> {len(res)}-tuple[{idx}]", _ayan_from_ex(idx)
+        else:
+            float(res)
+            return "get_ayanamsa_ex_ut -> float", _ayan_ex_scalar
     except Exception:
-        # 旧 API：単値（度）を返すため安全
-        return float(swe.get_ayanamsa_ut(jd_ut))
+        pass
+    return "get_ayanamsa_ut", _ayan_ut
 
 
-def _norm360(x: float) -> float:
-    """0–360 の範囲に正規化。"""
-    return x % 360.0
+def _asc_std(jd_ut: float, lat: float, lon: float, iflag: int = swe.FLG_SIDEREAL) -> float:
+    return swe.houses_ex(jd_ut, lat, lon, _ASC_HSYS, iflag)[1][0] % 360.0
 
 
-def asc_sidereal(jd_ut: float, lat: float, lon: float) -> float:
+def _asc_alt(jd_ut: float, lat: float, lon: float, iflag: int = swe.FLG_SIDEREAL) -> float:
+    return swe.houses_ex(jd_ut, iflag, lat, lon, _ASC_HSYS)[1][0] % 360.0
+
+
+def _asc_unknown(jd_ut: float, lat: float, lon: float, iflag: int = swe.FLG_SIDEREAL) -> float:
+    # 判定できなかった環境：従来どおり毎回両方を試す
+    try:
+        return _asc_std(jd_ut, lat, lon, iflag)
+    except TypeError:
+        return _asc_alt(jd_ut, lat, lon, iflag)
+
+
+def _probe_houses() -> Tuple[str, Callable[..., float]]:
     """
-    サイデリアル Whole Sign の Asc を取得。
-    pyswisseph の houses_ex は実装差があり、以下 2 通りを試す：
+    houses_ex は実装差があり、以下 2 通りがある：
       1) houses_ex(jd, lat, lon, hsys[, iflag])   ← Python 拡張で一般的
       2) houses_ex(jd, iflag, lat, lon, hsys)     ← 一部バインディング
     戻り値の ascmc[0] が Asc（deg）。
     """
-    hsys = b"W"
-    try:
-        # パターン1：jd, lat, lon, hsys, iflag
-        _houses, ascmc = swe.houses_ex(jd_ut, lat, lon, hsys, swe.FLG_SIDEREAL)
-    except TypeError:
-        # パターン2：jd, iflag, lat, lon, hsys
-        _houses, ascmc = swe.houses_ex(jd_ut, swe.FLG_SIDEREAL, lat, lon, hsys)
-    return _norm360(ascmc[0])  # Asc
+    for name, fn in (
+        ("houses_ex(jd, lat, lon, hsys, iflag)", _asc_std),
+        ("houses_ex(jd, iflag, lat, lon, hsys)", _asc_alt),
+    ):
+        try:
+            v = fn(_PROBE_JD, _PROBE_LAT, _PROBE_LON)
+        except (TypeError, ValueError, IndexError):
+            continue
+        if isinstance(v, float) and 0.0 <= v < 360.0:
+            return name, fn
+    return "unknown (try both per call)", _asc_unknown
+
+
+def _rise_result(res: Any) -> float:
+    """rise_trans の戻り値 (res, tret) / tret → 時刻（周極などで見つからなければ nan）。"""
+    if isinstance(res, tuple) and len(res) == 2 and isinstance(res[0], int):
+        flag, tret = res
+        return float(tret[0]) if flag == 0 else math.nan
+    return float(res[0]) if res[0] > 0.0 else math.nan
+
+
+def _rise_std(jd_ut: float, rsmi: int, lat: float, lon: float) -> float:
+    return _rise_result(swe.rise_trans(jd_ut, swe.SUN, rsmi, (lon, lat, 0.0)))
+
+
+def _rise_old(jd_ut: float, rsmi: int, lat: float, lon: float) -> float:
+    return _rise_result(swe.rise_trans(jd_ut, swe.SUN, lon, lat, 0.0, 0.0, 0.0, rsmi))
+
+
+def _rise_unavailable(jd_ut: float, rsmi: int, lat: float, lon: float) -> float:
+    raise RuntimeError("swe.rise_trans is not usable with this pyswisseph (see compat_report)")
+
+
+def _probe_rise_trans() -> Tuple[str, Callable[[float, int, float, float], float]]:
+    """
+    rise_trans の引数は版により
+      1) rise_trans(jd, body, rsmi, geopos[, atpress, attemp, flags])   ← 2.10 以降
+      2) rise_trans(jd, body, lon, lat, alt, press, temp, rsmi[, flag]) ← それ以前
+    """
+    errors = (TypeError, ValueError, IndexError, getattr(swe, "Error", ValueError))
+    for name, fn in (
+        ("rise_trans(jd, body, rsmi, geopos)", _rise_std),
+        ("rise_trans(jd, body, lon, lat, alt, press, temp, rsmi)", _rise_old),
+    ):
+        try:
+            v = fn(_PROBE_JD, swe.CALC_RISE, _PROBE_LAT, _PROBE_LON)
+        except errors:
+            continue
+        if _PROBE_JD < v < _PROBE_JD + 1.5:
+            return name, fn
+    return "unavailable", _rise_unavailable
+
+
+_AYAN_VARIANT, _ayanamsa = _probe_ayanamsa()
+_ASC_VARIANT, _asc = _probe_houses()
+_RISE_VARIANT, _rise = _probe_rise_trans()
+
+
+def compat_report() -> Dict[str, Any]:
+    """インストール済み pyswisseph について、判定した呼び出し規約などを返す。"""
+    return {
+        "pyswisseph": getattr(swe, "__version__", "?"),
+        "swisseph": swe.version if isinstance(getattr(swe, "version", None), str) else "?",
+        "ayanamsa": _AYAN_VARIANT,
+        "houses": _ASC_VARIANT,
+        "rise_trans": _RISE_VARIANT,
+        "sidm_lahiri_icrc": hasattr(swe, "SIDM_LAHIRI_ICRC"),
+    }
+
+
+def ayanamsa_deg(jd_ut: float) -> float:
+    """
+    現在設定のアヤナーンシャ（度）を返す。
+    呼び出し方は import 時に判定済み（_probe_ayanamsa、compat_report 参照）。
+    """
+    metrics.incr("swe_calls_total", fn="get_ayanamsa")
+    return _ayanamsa(jd_ut)
+
+
+def asc_sidereal(jd_ut: float, lat: float, lon: float) -> float:
+    """
+    サイデリアル Whole Sign の Asc を取得（0–360）。
+    houses_ex の引数順は import 時に判定済み（_probe_houses、compat_report 参照）。
+    """
+    metrics.incr("swe_calls_total", fn="houses_ex")
+    return _asc(jd_ut, lat, lon)
+
+
+def sun_rise_trans(jd_ut: float, lat: float, lon: float, rsmi: int = swe.CALC_RISE) -> float:
+    """
+    jd_ut 以降で最初の太陽の出（rsmi = CALC_SET で入り）の時刻（jd UT）。無ければ nan（白夜・極夜）。
+    rise_trans の引数順は import 時に判定済み（_probe_rise_trans、compat_report 参照）。
+    """
+    metrics.incr("swe_calls_total", fn="rise_trans")
+    return _rise(jd_ut, rsmi, lat, lon)
+
+
+def asc_tropical(jd_ut: float, lat: float, lon: float) -> float:
+    """トロピカル Asc（0–360）。サイデリアル Asc = asc_tropical - アヤナーンシャ。"""
+    metrics.incr("swe_calls_total", fn="houses_ex")
+    return _asc(jd_ut, lat, lon, 0)
+
+
+def ayanamsa_deg_array(jd_ut: np.ndarray) -> np.ndarray:
+    """ayanamsa_deg のベクトル版（(N,) の jd_ut → (N,) float64）。"""
+    jd = np.asarray(jd_ut, dtype=np.float64)
+    metrics.incr("swe_calls_total", jd.size, fn="get_ayanamsa")
+    fn = _ayanamsa
+    return np.fromiter((fn(t) for t in jd.ravel().tolist()), dtype=np.float64, count=jd.size).reshape(jd.shape)
+
+
+def asc_sidereal_array(jd_ut: np.ndarray, lat: Any, lon: Any) -> np.ndarray:
+    """asc_sidereal のベクトル版。lat / lon はスカラーまたは jd_ut と同じ長さの配列。"""
+    jd, la, lo = np.broadcast_arrays(
+        np.asarray(jd_ut, dtype=np.float64),
+        np.asarray(lat, dtype=np.float64),
+        np.asarray(lon, dtype=np.float64),
+    )
+    metrics.incr("swe_calls_total", jd.size, fn="houses_ex")
+    fn = _asc
+    it = (fn(t, a, b) for t, a, b in zip(jd.ravel().tolist(), la.ravel().tolist(), lo.ravel().tolist()))
+    return np.fromiter(it, dtype=np.float64, count=jd.size).reshape(jd.shape)
+
+
+def _norm360(x: float) -> float:
+    """0–360 の範囲に正規化。"""
+    return x % 360.0
 
 
 def planet_sidereal_longitudes(
@@ -97,28 +313,19 @@ def planet_sidereal_longitudes(
     res: Dict[str, Dict[str, float]] = {}
 
     # サイデリアル + 速度つき計算
-    flag = swe.FLG_SWIEPH | swe.FLG_SIDEREAL | swe.FLG_SPEED
+    flag = SIDEREAL_SPEED_FLAG
+    metrics.incr("swe_calls_total", len(BODY_IDS) + 1, fn="calc_ut")
 
-    node_body = swe.TRUE_NODE if node_type == "True" else swe.MEAN_NODE
-    body_map: Dict[str, int] = {
-        "Su": swe.SUN,
-        "Mo": swe.MOON,
-        "Me": swe.MERCURY,
-        "Ve": swe.VENUS,
-        "Ma": swe.MARS,
-        "Ju": swe.JUPITER,
-        "Sa": swe.SATURN,
-        "Ra": node_body,
-        "Ke": node_body,  # Ketu は後で 180°加算・速度反転
-    }
-
-    for key, body in body_map.items():
+    for key, body in BODY_IDS:
         xx, _ret = swe.calc_ut(jd_ut, body, flag)
-        lon = _norm360(xx[0])
-        spd = float(xx[3])
-        if key == "Ke":
-            lon = _norm360(lon + 180.0)
-            spd = -spd
-        res[key] = {"lon": float(lon), "speed": spd}
+        res[key] = {"lon": float(_norm360(xx[0])), "speed": float(xx[3])}
+
+    # Rahu/Ketu：ノードは 1 回だけ計算し、Ketu は 180°加算・速度反転で導出
+    node_body = swe.TRUE_NODE if node_type == "True" else swe.MEAN_NODE
+    xx, _ret = swe.calc_ut(jd_ut, node_body, flag)
+    ra_lon = _norm360(xx[0])
+    ra_spd = float(xx[3])
+    res["Ra"] = {"lon": float(ra_lon), "speed": ra_spd}
+    res["Ke"] = {"lon": float(_norm360(ra_lon + 180.0)), "speed": -ra_spd}
 
     return res
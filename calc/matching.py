@@ -0,0 +1,324 @@
+# calc/matching.py
+"""
+Ashtakoota（Guna Milan、36 点満点）による相性の一括採点。
+
+8 つのクータはすべて両者の月のナクシャトラ・パダ（月のサインはパダから決まる：1 サイン = 9 パダ）
+だけで決まるので、パダ番号（0..107 = ナクシャトラ × 4 + パダ - 1）どうしの 108 × 108 の表を
+import 時に 1 度だけ作っておき、採点は表の行を候補のパダ番号で引くだけにする。
+10 万件の候補でも、採点（gather 1 回）と上位 k 件の選択（np.partition で閾値を求めてから並べる）で数ミリ秒。
+
+表は [男性, 女性] の向き（Varna・Gana は向きで点が変わる）。点は 0.5 刻み。
+ドーシャの取り消し（同じナクシャトラ・同じサイン支配星などによる例外）は扱わない。
+
+Vashya の Sg / Cp の前半・後半（15°）はパダの中で切り替わるため、パダの始点で判定する。
+
+  me = pada_index(moon_lon)                                   # 自分の月
+  cand = pada_index_array(moon_lons)                          # 候補の月（(N,)）
+  top = match(me, cand, role="girl", k=20)                    # Matches(index, total)
+  koota_scores(boy_idx, girl_idx)                             # {"varna": 1.0, ..., "total": 27.5}
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .base import NAK_LABELS_JH, PADA_SIZE, SIGNS
+from .lordship import RULER
+
+KOOTAS: Tuple[str, ...] = ("varna", "vashya", "tara", "yoni", "maitri", "gana", "bhakoot", "nadi")
+KOOTA_MAX: Dict[str, float] = {
+    "varna": 1, "vashya": 2, "tara": 3, "yoni": 4, "maitri": 5, "gana": 6, "bhakoot": 7, "nadi": 8,
+}
+PADA_COUNT = 108
+
+# ---- Varna（サイン）：Brahmin 3 > Kshatriya 2 > Vaishya 1 > Shudra 0 ----
+# 水 = Brahmin、火 = Kshatriya、地 = Vaishya、風 = Shudra（Ar, Ta, Ge, Cn, ...）
+_VARNA: Tuple[int, ...] = (2, 1, 0, 3) * 3
+
+# ---- Vashya ----
+# 0 = Chatushpada, 1 = Manava, 2 = Jalachara, 3 = Vanachara, 4 = Keeta
+# サインごとの (前半, 後半)
+_VASHYA_SIGN: Tuple[Tuple[int, int], ...] = (
+    (0, 0), (0, 0), (1, 1), (2, 2), (3, 3), (1, 1),
+    (1, 1), (4, 4), (1, 0), (0, 2), (1, 1), (2, 2),
+)
+_VASHYA_SCORE: Tuple[Tuple[float, ...], ...] = (
+    (2, 1, 1, 0.5, 1),
+    (1, 2, 0.5, 0, 1),
+    (1, 0.5, 2, 1, 1),
+    (0.5, 0, 1, 2, 0),
+    (1, 1, 1, 0, 2),
+)
+
+# ---- Yoni（ナクシャトラ → 動物）----
+# 0 Horse, 1 Elephant, 2 Sheep, 3 Serpent, 4 Dog, 5 Cat, 6 Rat,
+# 7 Cow, 8 Buffalo, 9 Tiger, 10 Deer, 11 Monkey, 12 Mongoose, 13 Lion
+_YONI: Tuple[int, ...] = (
+    0, 1, 2, 3, 3, 4, 5, 2, 5, 6, 6, 7, 8, 9,
+    8, 9, 10, 10, 4, 11, 12, 11, 13, 0, 13, 7, 1,
+)
+_YONI_SCORE: Tuple[Tuple[int, ...], ...] = (
+    (4, 2, 2, 3, 2, 2, 2, 1, 0, 1, 3, 3, 2, 1),
+    (2, 4, 3, 3, 2, 2, 2, 2, 3, 1, 2, 3, 2, 0),
+    (2, 3, 4, 2, 1, 2, 1, 3, 3, 1, 2, 0, 3, 1),
+    (3, 3, 2, 4, 2, 1, 1, 1, 1, 2, 2, 2, 0, 2),
+    (2, 2, 1, 2, 4, 2, 1, 2, 2, 1, 0, 2, 1, 1),
+    (2, 2, 2, 1, 2, 4, 0, 2, 2, 1, 3, 3, 2, 1),
+    (2, 2, 1, 1, 1, 0, 4, 2, 2, 2, 2, 2, 1, 2),
+    (1, 2, 3, 1, 2, 2, 2, 4, 3, 0, 3, 2, 2, 1),
+    (0, 3, 3, 1, 2, 2, 2, 3, 4, 1, 2, 2, 2, 1),
+    (1, 1, 1, 2, 1, 1, 2, 0, 1, 4, 1, 1, 2, 1),
+    (3, 2, 2, 2, 0, 3, 2, 3, 2, 1, 4, 2, 2, 1),
+    (3, 3, 0, 2, 2, 3, 2, 2, 2, 1, 2, 4, 3, 2),
+    (2, 2, 3, 0, 1, 2, 1, 2, 2, 2, 2, 3, 4, 2),
+    (1, 0, 1, 2, 1, 1, 2, 1, 1, 1, 1, 2, 2, 4),
+)
+
+# ---- Graha Maitri（サイン支配星の生来の友好関係）----
+_FRIENDS: Dict[str, Tuple[str, ...]] = {
+    "Su": ("Mo", "Ma", "Ju"), "Mo": ("Su", "Me"), "Ma": ("Su", "Mo", "Ju"), "Me": ("Su", "Ve"),
+    "Ju": ("Su", "Mo", "Ma"), "Ve": ("Me", "Sa"), "Sa": ("Me", "Ve"),
+}
+_ENEMIES: Dict[str, Tuple[str, ...]] = {
+    "Su": ("Ve", "Sa"), "Mo": (), "Ma": ("Me",), "Me": ("Mo",),
+    "Ju": ("Me", "Ve"), "Ve": ("Su", "Mo"), "Sa": ("Su", "Mo", "Ma"),
+}
+# (a から見た b, b から見た a)：1 = 友、0 = 中立、-1 = 敵（順不同）
+_MAITRI_SCORE: Dict[Tuple[int, int], float] = {
+    (1, 1): 5, (0, 1): 4, (0, 0): 3, (-1, 1): 1, (-1, 0): 0.5, (-1, -1): 0,
+}
+
+# ---- Gana（ナクシャトラ）：0 = Deva, 1 = Manushya, 2 = Rakshasa ----
+_GANA: Tuple[int, ...] = (
+    0, 1, 2, 1, 0, 1, 0, 0, 2, 2, 1, 1, 0, 2,
+    0, 2, 0, 2, 2, 1, 1, 0, 2, 2, 1, 1, 0,
+)
+_GANA_SCORE: Tuple[Tuple[int, ...], ...] = (  # [男性][女性]
+    (6, 6, 1),
+    (5, 6, 0),
+    (1, 0, 6),
+)
+
+# ---- Nadi（ナクシャトラ）：Aadi / Madhya / Antya が 0, 1, 2, 2, 1, 0 の順に繰り返す ----
+_NADI: Tuple[int, ...] = tuple((0, 1, 2, 2, 1, 0)[i % 6] for i in range(27))
+
+# Bhakoot：互いのサインの数え（n, 14 - n）が 2/12・5/9・6/8 なら 0 点
+_BHAKOOT_BAD = frozenset((2, 12, 5, 9, 6, 8))
+
+
+# =======================================================
+# 表の構築（import 時に 1 回）
+# =======================================================
+def _relation(a: str, b: str) -> int:
+    if a == b or b in _FRIENDS[a]:
+        return 1
+    return -1 if b in _ENEMIES[a] else 0
+
+
+def _tara_good(n_from: int, n_to: int) -> bool:
+    """n_from から数えて n_to が何番目か（1..27）を 9 で割った余りが 3, 5, 7 以外なら吉。"""
+    return ((n_to - n_from) % 27 + 1) % 9 not in (3, 5, 7)
+
+
+def _pada_sign(i: int) -> int:
+    return i // 9
+
+
+def _pada_vashya(i: int) -> int:
+    # パダの始点（度）がサインの前半なら前半の分類
+    start = (i % 9) * PADA_SIZE
+    return _VASHYA_SIGN[_pada_sign(i)][0 if start < 15.0 else 1]
+
+
+def _pair_scores(b: int, g: int) -> Tuple[float, ...]:
+    """パダ番号 b（男性）・g（女性）の 8 クータの点（KOOTAS 順）。"""
+    bn, gn = b // 4, g // 4
+    bs, gs = _pada_sign(b), _pada_sign(g)
+    rb, rg = sorted((_relation(RULER[SIGNS[bs]], RULER[SIGNS[gs]]), _relation(RULER[SIGNS[gs]], RULER[SIGNS[bs]])))
+    n = (bs - gs) % 12 + 1
+    return (
+        1.0 if _VARNA[bs] >= _VARNA[gs] else 0.0,
+        float(_VASHYA_SCORE[_pada_vashya(b)][_pada_vashya(g)]),
+        1.5 * _tara_good(gn, bn) + 1.5 * _tara_good(bn, gn),
+        float(_YONI_SCORE[_YONI[bn]][_YONI[gn]]),
+        float(_MAITRI_SCORE[(rb, rg)]),
+        float(_GANA_SCORE[_GANA[bn]][_GANA[gn]]),
+        0.0 if n in _BHAKOOT_BAD else 7.0,
+        0.0 if _NADI[bn] == _NADI[gn] else 8.0,
+    )
+
+
+def _build_tables() -> np.ndarray:
+    """(8, 108, 108) uint8：各クータの点 × 2（0.5 点刻みを整数で持つ）。"""
+    out = np.empty((len(KOOTAS), PADA_COUNT, PADA_COUNT), dtype=np.uint8)
+    for b in range(PADA_COUNT):
+        for g in range(PADA_COUNT):
+            out[:, b, g] = [int(2 * s) for s in _pair_scores(b, g)]
+    return out
+
+
+# [koota, 男性, 女性] の点 × 2 と、その合計
+KOOTA_HALF: np.ndarray = _build_tables()
+TOTAL_HALF: np.ndarray = KOOTA_HALF.sum(axis=0, dtype=np.uint8)
+KOOTA_HALF.setflags(write=False)
+TOTAL_HALF.setflags(write=False)
+
+
+# =======================================================
+# パダ番号
+# =======================================================
+def pada_index(moon_lon: float) -> int:
+    """月のサイデリアル黄経 → パダ番号 0..107（nakshatra_pada と同じ区切り）。"""
+    return min(int((moon_lon % 360.0) // PADA_SIZE), PADA_COUNT - 1)
+
+
+def pada_index_array(moon_lons: Sequence[float]) -> np.ndarray:
+    lon = np.mod(np.asarray(moon_lons, dtype=np.float64), 360.0)
+    return np.minimum(np.floor_divide(lon, PADA_SIZE), PADA_COUNT - 1).astype(np.intp)
+
+
+def pada_index_from(nakshatra: str, pada: int) -> int:
+    """("Rohini", 2) → パダ番号（build_d1 の "nakshatra": "Rohini-2" から）。"""
+    try:
+        return NAK_LABELS_JH.index(nakshatra) * 4 + int(pada) - 1
+    except ValueError:
+        raise ValueError(f"unknown nakshatra: {nakshatra!r}") from None
+
+
+# =======================================================
+# 採点
+# =======================================================
+class Matches(NamedTuple):
+    index: np.ndarray  # 候補配列内の位置（点の高い順、同点は位置の小さい順）
+    total: np.ndarray  # 合計点（float32）
+
+
+def koota_scores(boy: int, girl: int) -> Dict[str, float]:
+    """1 組の各クータの点と合計 {"varna": ..., ..., "total": ...}。"""
+    out = {k: int(KOOTA_HALF[i, boy, girl]) / 2.0 for i, k in enumerate(KOOTAS)}
+    out["total"] = int(TOTAL_HALF[boy, girl]) / 2.0
+    return out
+
+
+def score_all(subject: int, candidates: Sequence[int], role: str = "boy") -> np.ndarray:
+    """
+    subject（パダ番号）と候補全員（パダ番号の配列）の合計点 × 2（uint8、(N,)）。
+    role は subject の側（"boy" / "girl"）。候補は反対側として採点する。
+    """
+    if role == "boy":
+        row = TOTAL_HALF[subject]
+    elif role == "girl":
+        row = TOTAL_HALF[:, subject]
+    else:
+        raise ValueError(f"role must be 'boy' or 'girl', got {role!r}")
+    return row[np.asarray(candidates, dtype=np.intp)]
+
+
+def match(
+    subject: int,
+    candidates: Sequence[int],
+    role: str = "boy",
+    k: int = 10,
+    min_total: Optional[float] = None,
+    exclude_nadi_dosha: bool = False,
+) -> Matches:
+    """
+    候補全員を採点して上位 k 件を返す（k <= 0 なら全件を点の高い順に）。
+    min_total 未満・（exclude_nadi_dosha のとき）Nadi 0 点の候補は除く。
+    """
+    cand = np.asarray(candidates, dtype=np.intp)
+    half = score_all(subject, cand, role)
+    keep = None
+    if min_total is not None:
+        keep = half >= int(np.ceil(2 * min_total))
+    if exclude_nadi_dosha:
+        nadi = KOOTA_HALF[KOOTAS.index("nadi")]
+        ok = (nadi[subject] if role == "boy" else nadi[:, subject])[cand] > 0
+        keep = ok if keep is None else keep & ok
+    pos = np.flatnonzero(keep) if keep is not None else np.arange(len(cand))
+    s = half[pos]
+    if 0 < k < len(pos):
+        # 点の閾値（k 番目）以上だけを残してから並べる（同点の順序を位置で決めるため）
+        kth = np.partition(s, len(s) - k)[len(s) - k]
+        sel = np.flatnonzero(s >= kth)
+        pos, s = pos[sel], s[sel]
+    order = np.lexsort((pos, -s.astype(np.int16)))
+    if k > 0:
+        order = order[:k]
+    return Matches(pos[order], s[order].astype(np.float32) / 2.0)
+
+
+# =======================================================
+# CLI
+# =======================================================
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m calc.matching", description="Ashtakoota による相性の一括採点（JSONL）")
+    ap.add_argument("--date", required=True, help="本人の出生日（YYYY-MM-DD）")
+    ap.add_argument("--time", required=True, help="本人の出生時刻（HH:MM[:SS]、ローカル）")
+    ap.add_argument("--tz", required=True, type=float, help="UTC オフセット（時間）")
+    ap.add_argument("--lat", required=True, type=float)
+    ap.add_argument("--lon", required=True, type=float)
+    ap.add_argument("--role", choices=["boy", "girl"], required=True, help="本人の側")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--candidates", help="候補の出生レコード（JSONL、calc.pipeline.parse_record の形式）")
+    src.add_argument("--store", help="候補のチャートストア（calc.chart_store の SQLite）")
+    ap.add_argument("-k", type=int, default=10, help="出力件数（既定 10）")
+    ap.add_argument("--min-total", type=float, default=None, help="この点未満を除く")
+    ap.add_argument("--no-nadi-dosha", action="store_true", help="Nadi 0 点の候補を除く")
+    ap.add_argument("--ayanamsa", default="Lahiri_ICRC", help="アヤナーンシャ（既定 Lahiri_ICRC）")
+    ap.add_argument("--ephe-path", default="", help="Swiss Ephemeris ファイルパス（空で内蔵）")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .batch import compute_core_batch
+    from .pipeline import compute_core, init_ephemeris, parse_record
+
+    args = build_parser().parse_args(argv)
+    init_ephemeris(args.ephe_path, args.ayanamsa)
+    try:
+        r = parse_record({"date": args.date, "time": args.time, "tz": args.tz, "lat": args.lat, "lon": args.lon})
+        bd = r["date"]
+        core = compute_core(bd.year, bd.month, bd.day, r["h"] + r["m"] / 60.0 + r["s"] / 3600.0,
+                            r["tz"], r["lat"], r["lon"], "True")
+        subject = pada_index(core.lon("Mo"))
+
+        if args.store:
+            if not os.path.exists(args.store):
+                raise ValueError(f"no such store: {args.store}")
+            from .chart_store import ChartStore
+            store = ChartStore(args.store)
+            try:
+                cand = store.column("Mo.nakshatra").astype(np.intp) * 4 + store.column("Mo.pada")
+                names = store.names()
+            finally:
+                store.close()
+        else:
+            with open(args.candidates, encoding="utf-8") as fp:
+                recs = [parse_record(json.loads(line)) for line in fp if line.strip()]
+            batch = compute_core_batch(
+                [x["date"] for x in recs],
+                [x["h"] + x["m"] / 60.0 + x["s"] / 3600.0 for x in recs],
+                [x["tz"] for x in recs], [x["lat"] for x in recs], [x["lon"] for x in recs],
+            )
+            cand = pada_index_array(batch["lon"][:, list(batch["bodies"]).index("Mo")])
+            names = [x["name"] for x in recs]
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    top = match(subject, cand, args.role, args.k, args.min_total, args.no_nadi_dosha)
+    for rank, (i, total) in enumerate(zip(top.index.tolist(), top.total.tolist()), 1):
+        b, g = (subject, int(cand[i])) if args.role == "boy" else (int(cand[i]), subject)
+        row: Dict[str, Any] = {"rank": rank, "id": i, "name": names[i], "total": total}
+        row["kootas"] = {k: v for k, v in koota_scores(b, g).items() if k != "total"}
+        sys.stdout.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+# calc/metrics.py
+"""
+生成パイプラインの計測（ステージ別の所要時間・カウンタ・ヒストグラム）。
+
+既定では無効。無効時の span() は共有の nullcontext を返すだけ、incr() は即 return なので
+計測コードを残したままでもオーバーヘッドはほぼ無い。
+
+  JYOTISH_METRICS=1 python -m calc.cli ...      # 環境変数で有効化
+  metrics.enable()                                # またはコードから
+
+  with metrics.span("compute_core"):
+      ...
+  metrics.incr("swe_calls_total", 8, fn="calc_ut")
+
+出力：
+  - snapshot()        : JSON 化できる dict（counters / histograms）
+  - prometheus_text() : Prometheus text exposition format（0.0.4）
+  - drain()           : 生の中身を取り出してリセット（ワーカー → 親プロセスへの差分送付用）
+  - merge(raw)        : 別プロセスの drain() を足し込む
+  - summary()         : stage ごとの件数・合計/平均 ms（app.py のタイミング表示用）
+
+ステージ（stage_seconds の stage ラベル）：
+  init_ephemeris / compute_core / build_vargas / inject_karakamsa / assemble（validate 含む）/
+  generate（1 件全体）/ serialize（プレビュー + 最小化 JSON、または JSONL 1 行）
+"""
+import os
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+from time import perf_counter
+from typing import Any, Dict, List, Tuple
+
+# ヒストグラムの上限（秒）。最後に +Inf が付く。
+BUCKETS: Tuple[float, ...] = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+ENABLED = os.environ.get("JYOTISH_METRICS", "") not in ("", "0")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Labels], float] = {}
+_hists: Dict[Tuple[str, Labels], List[float]] = {}  # [bucket counts..., +Inf, sum, count]
+_NULL = nullcontext()
+
+
+def enable(on: bool = True) -> None:
+    global ENABLED
+    ENABLED = bool(on)
+
+
+def disable() -> None:
+    enable(False)
+
+
+def _labels(kw: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in kw.items()))
+
+
+def incr(name: str, n: float = 1, **labels: Any) -> None:
+    """カウンタを n 増やす（無効時は何もしない）。"""
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    """ヒストグラムに 1 件記録（無効時は何もしない）。"""
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        h = _hists.get(key)
+        if h is None:
+            h = _hists[key] = [0.0] * (len(BUCKETS) + 3)
+        h[bisect_left(BUCKETS, value)] += 1
+        h[-2] += value
+        h[-1] += 1
+
+
+class _Span:
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "_Span":
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        observe("stage_seconds", perf_counter() - self.t0, stage=self.stage)
+
+
+def span(stage: str):
+    """with span("compute_core"): ... の所要時間を stage_seconds{stage=...} に記録する。"""
+    return _Span(stage) if ENABLED else _NULL
+
+
+# =======================================================
+# 出力・集約
+# =======================================================
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _hists.clear()
+
+
+def snapshot() -> Dict[str, Any]:
+    """
+    {"counters":   [{"name", "labels", "value"}, ...],
+     "histograms": [{"name", "labels", "buckets": [[le, 累積件数], ...], "sum", "count"}, ...]}
+    """
+    with _lock:
+        counters = [
+            {"name": name, "labels": dict(labels), "value": v}
+            for (name, labels), v in sorted(_counters.items())
+        ]
+        hists = []
+        for (name, labels), h in sorted(_hists.items()):
+            acc = 0.0
+            buckets = []
+            for le, c in zip(BUCKETS + (float("inf"),), h):
+                acc += c
+                buckets.append(["+Inf" if le == float("inf") else le, acc])
+            hists.append({"name": name, "labels": dict(labels), "buckets": buckets, "sum": h[-2], "count": h[-1]})
+    return {"counters": counters, "histograms": hists}
+
+
+def drain() -> Dict[str, Any]:
+    """中身を生のまま（merge() 用、pickle 可）取り出してリセットする。"""
+    with _lock:
+        snap_c = dict(_counters)
+        snap_h = {k: list(v) for k, v in _hists.items()}
+        _counters.clear()
+        _hists.clear()
+    return {"raw_counters": snap_c, "raw_hists": snap_h}
+
+
+def merge(raw: Dict[str, Any]) -> None:
+    """drain() の結果（別プロセス分）を足し込む。無効時も足し込む（親が集計役のため）。"""
+    with _lock:
+        for key, v in raw["raw_counters"].items():
+            _counters[key] = _counters.get(key, 0) + v
+        for key, h in raw["raw_hists"].items():
+            cur = _hists.get(key)
+            if cur is None:
+                _hists[key] = list(h)
+            else:
+                for i, c in enumerate(h):
+                    cur[i] += c
+
+
+def summary() -> Dict[str, Dict[str, float]]:
+    """stage ごとの {count, total_ms, mean_ms}（アプリのタイミング表示用）。"""
+    out: Dict[str, Dict[str, float]] = {}
+    with _lock:
+        for (name, labels), h in sorted(_hists.items()):
+            if name != "stage_seconds":
+                continue
+            stage = dict(labels).get("stage", "")
+            n = h[-1]
+            out[stage] = {
+                "count": int(n),
+                "total_ms": round(h[-2] * 1000.0, 3),
+                "mean_ms": round(h[-2] * 1000.0 / n, 3) if n else 0.0,
+            }
+    return out
+
+
+def _fmt_labels(labels: Dict[str, Any], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = list(labels.items()) + list(extra)
+    if not items:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in items
+    )
+    return "{" + body + "}"
+
+
+def _fmt_num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def prometheus_text(prefix: str = "jyotish_") -> str:
+    """Prometheus text exposition format。"""
+    snap = snapshot()
+    lines: List[str] = []
+    seen = set()
+    for c in snap["counters"]:
+        name = prefix + c["name"]
+        if name not in seen:
+            lines.append(f"# TYPE {name} counter")
+            seen.add(name)
+        lines.append(f"{name}{_fmt_labels(c['labels'])} {_fmt_num(c['value'])}")
+    for h in snap["histograms"]:
+        name = prefix + h["name"]
+        if name not in seen:
+            lines.append(f"# TYPE {name} histogram")
+            seen.add(name)
+        for le, n in h["buckets"]:
+            le_s = le if isinstance(le, str) else repr(le)
+            lines.append(f"{name}_bucket{_fmt_labels(h['labels'], (('le', le_s),))} {_fmt_num(n)}")
+        lines.append(f"{name}_sum{_fmt_labels(h['labels'])} {repr(float(h['sum']))}")
+        lines.append(f"{name}_count{_fmt_labels(h['labels'])} {_fmt_num(h['count'])}")
+    return "\n".join(lines) + "\n"
@@ -10,18 +10,26 @@ TITHI_NAMES_CORE = [
 FULL_MOON = "Purnima"
 NEW_MOON  = "Amavasya"
 
+# Yoga：(Sun_lon + Moon_lon) を 13°20′ ごとに 27 区分
+YOGA_NAMES = [
+    "Vishkambha","Priti","Ayushman","Saubhagya","Shobhana","Atiganda","Sukarma",
+    "Dhriti","Shula","Ganda","Vriddhi","Dhruva","Vyaghata","Harshana",
+    "Vajra","Siddhi","Vyatipata","Variyana","Parigha","Shiva","Siddha",
+    "Sadhya","Shubha","Shukla","Brahma","Indra","Vaidhriti",
+]
+# Karana：離角 6° ごとに 60 区分。1 = Kimstughna、2..57 は移動 7 種の繰り返し、58..60 は固定
+KARANA_MOVABLE = ["Bava","Balava","Kaulava","Taitila","Gara","Vanija","Vishti"]
+KARANA_FIXED_FIRST = "Kimstughna"
+KARANA_FIXED_LAST = ["Shakuni","Chatushpada","Naga"]
+
+# 曜日（datetime.weekday：月曜 = 0）→ 曜日（vara）の支配星
+VARA_LORDS = ("Mo","Ma","Me","Ju","Ve","Sa","Su")
+
 def _norm360(x: float) -> float:
     return x % 360.0
 
-def tithi_from_elongation(delta_deg: float) -> Tuple[str, str, int]:
-    """
-    delta_deg: (Moon_lon - Sun_lon) in degrees, normalized to [0,360)
-    returns (paksha, tithi_name, tithi_number[1..30])
-    1..15  => Shukla; 16..30 => Krishna
-    15 => Purnima, 30 => Amavasya
-    """
-    d = _norm360(delta_deg)
-    tithi_no = int(d // 12.0) + 1  # 1..30
+def tithi_name(tithi_no: int) -> Tuple[str, str]:
+    """tithi_number[1..30] -> (paksha, tithi_name)"""
     if tithi_no <= 15:
         paksha = "Shukla"
         if tithi_no == 15:
@@ -35,4 +43,34 @@ def tithi_from_elongation(delta_deg: float) -> Tuple[str, str, int]:
             tname = NEW_MOON
         else:
             tname = TITHI_NAMES_CORE[k-1]
+    return paksha, tname
+
+def tithi_from_elongation(delta_deg: float) -> Tuple[str, str, int]:
+    """
+    delta_deg: (Moon_lon - Sun_lon) in degrees, normalized to [0,360)
+    returns (paksha, tithi_name, tithi_number[1..30])
+    1..15  => Shukla; 16..30 => Krishna
+    15 => Purnima, 30 => Amavasya
+    """
+    d = _norm360(delta_deg)
+    tithi_no = int(d // 12.0) + 1  # 1..30
+    paksha, tname = tithi_name(tithi_no)
     return paksha, tname, tithi_no
+
+def karana_name(karana_no: int) -> str:
+    """karana_number[1..60] -> karana_name"""
+    if karana_no == 1:
+        return KARANA_FIXED_FIRST
+    if karana_no >= 58:
+        return KARANA_FIXED_LAST[karana_no - 58]
+    return KARANA_MOVABLE[(karana_no - 2) % 7]
+
+def karana_from_elongation(delta_deg: float) -> Tuple[str, int]:
+    """delta_deg: (Moon_lon - Sun_lon) -> (karana_name, karana_number[1..60])"""
+    karana_no = int(_norm360(delta_deg) // 6.0) + 1
+    return karana_name(karana_no), karana_no
+
+def yoga_from_sum(sum_deg: float) -> Tuple[str, int]:
+    """sum_deg: (Sun_lon + Moon_lon), sidereal -> (yoga_name, yoga_number[1..27])"""
+    yoga_no = int(_norm360(sum_deg) // (13 + 20/60)) % 27 + 1
+    return YOGA_NAMES[yoga_no-1], yoga_no
@@ -0,0 +1,291 @@
+# calc/panchanga_calendar.py
+"""
+パンチャーンガ暦（tithi / nakshatra / yoga / karana の開始・終了時刻）を年単位でまとめて作る。
+
+4 要素はどれも太陽・月の黄経の単調増加な量の等間隔の区切りで決まる：
+  tithi     : 離角（月 - 太陽）     12° × 30
+  karana    : 離角（月 - 太陽）      6° × 60
+  nakshatra : 月（サイデリアル）    13°20′ × 27
+  yoga      : 太陽 + 月（サイデリアル）13°20′ × 27
+
+時刻ごとに独立に評価（サンプリング）する代わりに
+  1) 太陽・月の (黄経, 速度) を一定刻み（step_days、既定 1 日）で 1 回だけ評価し、
+     各量を巻き戻し（unwrap）した単調列にする
+  2) 区切り k × step ごとに、その区切りを挟む刻み（ブラケット）を searchsorted で 1 回で求め、
+     両端の値と速度による 3 次エルミート補間の上で Newton 法を解く（全区切りを NumPy でまとめて）
+ので、ブラケットは隣の区切りと共有され、天体計算は刻みの数（100 年で 3.7 万点 × 2 天体）だけで済む。
+補間の誤差は月の 4 階微分で決まり、1 日刻みで 1 秒未満（swisseph の速度は数値微分のため、
+ephe ファイル無しでは ±1 秒程度揺れる）。
+
+table（calc.ephe_table.EpheTable）を渡すと swisseph の代わりにテーブルを配列で評価するため、
+100 年分でも 1 秒を大きく下回る。swisseph の場合は calc_ut の回数が律速。
+
+  init_ephemeris("", "Lahiri_ICRC")
+  cal = build_calendar(jd0, jd1)                 # {"tithi": Spans, "nakshatra": Spans, ...}
+  for row in daily(cal, date(2025, 1, 1), date(2026, 1, 1), tz=9.0):
+      ...                                        # 1 日 1 行（その日にかかる各要素の区間）
+
+  python -m calc.panchanga_calendar --start 2025-01-01 --end 2026-01-01 --tz 9 -o panchanga_2025.jsonl
+  python -m calc.panchanga_calendar --start 2025-01-01 --end 2026-01-01 --tz 5.5 --lat 28.61 --lon 77.21   # 日の出つき
+"""
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import swisseph as swe
+
+from . import metrics
+from .base import NAK_LABELS_JH, NAK_SIZE
+from .ephemeris import SIDEREAL_SPEED_FLAG, jd_ut_from_local
+from .panchanga import VARA_LORDS, YOGA_NAMES, karana_name, tithi_name
+from .pipeline import DEFAULT_OPTS, init_ephemeris
+
+if TYPE_CHECKING:
+    from .ephe_table import EpheTable
+    from .sunrise import SunTimes
+
+# 要素名 → (量, 区切りの幅 deg, 区分の数)
+ELEMENTS: Dict[str, Tuple[str, float, int]] = {
+    "tithi": ("elongation", 12.0, 30),
+    "nakshatra": ("moon", NAK_SIZE, 27),
+    "yoga": ("sum", NAK_SIZE, 27),
+    "karana": ("elongation", 6.0, 60),
+}
+# 範囲の前後に足す余白（日）：最長の要素（約 1.2 日）の区間を両端で完結させる
+_PAD_DAYS = 2.0
+_NEWTON_ITER = 4
+
+
+class Spans(NamedTuple):
+    start: np.ndarray   # (N,) float64 jd_ut
+    end: np.ndarray     # (N,) float64 jd_ut
+    index: np.ndarray   # (N,) int16  0 始まりの区分番号（tithi 番号 - 1 など）
+
+
+def sun_moon(jd_ut: np.ndarray, table: Optional["EpheTable"] = None) -> Tuple[np.ndarray, ...]:
+    """(太陽の黄経, 速度, 月の黄経, 速度)（サイデリアル、各 (N,)）。"""
+    jd = np.asarray(jd_ut, dtype=np.float64)
+    if table is not None:
+        ls, vs = table.lon_speed_array("Su", jd)
+        lm, vm = table.lon_speed_array("Mo", jd)
+        return ls, vs, lm, vm
+    out = np.empty((4, jd.size), dtype=np.float64)
+    calc_ut = swe.calc_ut
+    flag = SIDEREAL_SPEED_FLAG
+    metrics.incr("swe_calls_total", 2 * jd.size, fn="calc_ut")
+    for i, t in enumerate(jd.tolist()):
+        s = calc_ut(t, swe.SUN, flag)[0]
+        m = calc_ut(t, swe.MOON, flag)[0]
+        out[0, i], out[1, i], out[2, i], out[3, i] = s[0], s[3], m[0], m[3]
+    return out[0], out[1], out[2], out[3]
+
+
+def _unwrap(q: np.ndarray) -> np.ndarray:
+    """刻みごとの増分が 360° 未満の単調増加な角度列を巻き戻す。"""
+    out = np.empty_like(q)
+    out[0] = q[0]
+    np.cumsum(np.mod(np.diff(q), 360.0), out=out[1:])
+    out[1:] += q[0]
+    return out
+
+
+def element_spans(
+    t: np.ndarray, q: np.ndarray, dq: np.ndarray, step: float, count: int, jd_start: float, jd_end: float
+) -> Spans:
+    """
+    刻み t 上の単調増加な量 q（巻き戻し済み）とその速度 dq から、区切り k × step の通過時刻を解き、
+    [jd_start, jd_end) にかかる区間を返す。
+    """
+    k = np.arange(np.ceil(q[0] / step), np.floor(q[-1] / step) + 1.0)
+    target = k * step
+    i = np.clip(np.searchsorted(q, target, side="right") - 1, 0, len(t) - 2)
+    h = t[i + 1] - t[i]
+    q0, q1 = q[i], q[i + 1]
+    m0, m1 = dq[i] * h, dq[i + 1] * h
+    # エルミート補間 H(s)（s ∈ [0, 1]）上で H(s) = target を Newton 法で解く（初期値は線形補間）
+    s = np.clip((target - q0) / (q1 - q0), 0.0, 1.0)
+    for _ in range(_NEWTON_ITER):
+        s2 = s * s
+        s3 = s2 * s
+        hv = (2 * s3 - 3 * s2 + 1) * q0 + (s3 - 2 * s2 + s) * m0 + (-2 * s3 + 3 * s2) * q1 + (s3 - s2) * m1
+        hd = (6 * s2 - 6 * s) * q0 + (3 * s2 - 4 * s + 1) * m0 + (-6 * s2 + 6 * s) * q1 + (3 * s2 - 2 * s) * m1
+        s = np.clip(s - (hv - target) / hd, 0.0, 1.0)
+    tc = t[i] + s * h
+    # 区切り j から j + 1 までが区分 k_j % count
+    idx = (k[:-1].astype(np.int64) % count).astype(np.int16)
+    start, end = tc[:-1], tc[1:]
+    keep = (end > jd_start) & (start < jd_end)
+    return Spans(start[keep], end[keep], idx[keep])
+
+
+def build_calendar(
+    jd_start: float,
+    jd_end: float,
+    elements: Sequence[str] = tuple(ELEMENTS),
+    step_days: float = 1.0,
+    table: Optional["EpheTable"] = None,
+) -> Dict[str, Spans]:
+    """
+    [jd_start, jd_end) にかかる各要素の区間（時刻順）。先に init_ephemeris(...) を済ませておくこと
+    （table を使う場合は、テーブルと同じアヤナーンシャで）。
+    """
+    bad = [e for e in elements if e not in ELEMENTS]
+    if bad:
+        raise ValueError(f"unknown panchanga elements: {', '.join(bad)}")
+    if not jd_start < jd_end:
+        raise ValueError("jd_end must be after jd_start")
+    n = int(np.ceil((jd_end - jd_start + 2 * _PAD_DAYS) / step_days)) + 1
+    t = jd_start - _PAD_DAYS + np.arange(n) * step_days
+    ls, vs, lm, vm = sun_moon(t, table)
+    quantities: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    for e in elements:
+        kind = ELEMENTS[e][0]
+        if kind in quantities:
+            continue
+        if kind == "elongation":
+            quantities[kind] = (_unwrap(np.mod(lm - ls, 360.0)), vm - vs)
+        elif kind == "moon":
+            quantities[kind] = (_unwrap(lm), vm)
+        else:
+            quantities[kind] = (_unwrap(np.mod(lm + ls, 360.0)), vm + vs)
+    out: Dict[str, Spans] = {}
+    for e in elements:
+        kind, step, count = ELEMENTS[e]
+        q, dq = quantities[kind]
+        out[e] = element_spans(t, q, dq, step, count, jd_start, jd_end)
+    return out
+
+
+def element_label(element: str, index: int) -> Dict[str, Any]:
+    """区分番号（0 始まり）→ 出力用の名前など。"""
+    if element == "tithi":
+        paksha, name = tithi_name(index + 1)
+        return {"number": index + 1, "paksha": paksha, "name": name}
+    if element == "nakshatra":
+        return {"number": index + 1, "name": NAK_LABELS_JH[index]}
+    if element == "yoga":
+        return {"number": index + 1, "name": YOGA_NAMES[index]}
+    return {"number": index + 1, "name": karana_name(index + 1)}
+
+
+_UNIX_JD = 2440587.5
+
+
+def local_iso(jd_ut: np.ndarray, tz: float) -> np.ndarray:
+    """jd（UT、配列）→ ローカル時刻の "YYYY-MM-DDTHH:MM:SS"（秒は四捨五入）の配列。"""
+    sec = np.rint((np.asarray(jd_ut, dtype=np.float64) - _UNIX_JD) * 86400.0 + tz * 3600.0)
+    return np.datetime_as_string(sec.astype("datetime64[s]"), unit="s")
+
+
+def daily(
+    cal: Dict[str, Spans],
+    start: date,
+    end: date,
+    tz: float,
+    sun: Optional["SunTimes"] = None,
+    lat: float = 0.0,
+    lon: float = 0.0,
+) -> Iterator[Dict[str, Any]]:
+    """
+    ローカル日付 [start, end) の 1 日 1 行。各要素はその日（ローカル 0 時〜24 時）にかかる区間の一覧：
+      {"date": "2025-01-01", "vara": "Me",
+       "tithi": [{"number": 1, "paksha": "Shukla", "name": "Pratipada", "start": "...", "end": "..."}, ...],
+       "nakshatra": [...], "yoga": [...], "karana": [...]}
+    sun（calc.sunrise.SunTimes）を渡すと lat / lon の "sunrise" / "sunset" と、日の出の時点の
+    各要素の番号 "udaya": {"tithi": 2, ...} を加える（日の出が無い日は省略）。
+    cal はその範囲を含めて build_calendar しておくこと。
+    """
+    n_days = (end - start).days
+    if n_days <= 0:
+        return
+    jd0 = jd_ut_from_local(start.year, start.month, start.day, 0.0, tz)
+    day_start = jd0 + np.arange(n_days, dtype=np.float64)
+    prepared = []
+    udaya: Dict[str, List[int]] = {}
+    if sun is not None:
+        rise, set_ = sun.rise_set_range(start, end, lat, lon)
+        has_sun = (~np.isnan(rise) & ~np.isnan(set_)).tolist()
+        rise_iso = local_iso(np.nan_to_num(rise), tz).tolist()
+        set_iso = local_iso(np.nan_to_num(set_), tz).tolist()
+        for e, sp in cal.items():
+            at = np.clip(np.searchsorted(sp.start, np.nan_to_num(rise), side="right") - 1, 0, len(sp.index) - 1)
+            udaya[e] = (sp.index[at].astype(np.int64) + 1).tolist()
+    for e, sp in cal.items():
+        lo = np.searchsorted(sp.end, day_start, side="right")
+        hi = np.searchsorted(sp.start, day_start + 1.0, side="left")
+        labels = [element_label(e, int(i)) for i in sp.index.tolist()]
+        prepared.append((e, lo.tolist(), hi.tolist(), labels, local_iso(sp.start, tz).tolist(),
+                         local_iso(sp.end, tz).tolist()))
+    d = start
+    for j in range(n_days):
+        row: Dict[str, Any] = {"date": d.isoformat(), "vara": VARA_LORDS[d.weekday()]}
+        if sun is not None and has_sun[j]:
+            row["sunrise"] = rise_iso[j]
+            row["sunset"] = set_iso[j]
+            row["udaya"] = {e: u[j] for e, u in udaya.items()}
+        for e, lo, hi, labels, s_iso, e_iso in prepared:
+            row[e] = [dict(labels[i], start=s_iso[i], end=e_iso[i]) for i in range(lo[j], hi[j])]
+        yield row
+        d += timedelta(days=1)
+
+
+# =======================================================
+# CLI
+# =======================================================
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m calc.panchanga_calendar", description="パンチャーンガ暦（1 日 1 行の JSONL）")
+    ap.add_argument("--start", required=True, type=date.fromisoformat, help="開始日（ローカル、YYYY-MM-DD）")
+    ap.add_argument("--end", required=True, type=date.fromisoformat, help="終了日（ローカル、含まない）")
+    ap.add_argument("--tz", type=float, default=0.0, help="UTC オフセット（時間）")
+    ap.add_argument("--lat", type=float, default=None, help="緯度（--lon と一緒に指定すると日の出・日の入りを付ける）")
+    ap.add_argument("--lon", type=float, default=None, help="経度")
+    ap.add_argument("--elements", default=",".join(ELEMENTS), help="要素（tithi,nakshatra,yoga,karana）")
+    ap.add_argument("--step", type=float, default=1.0, help="太陽・月を評価する刻み（日、既定 1）")
+    ap.add_argument("--table", default="", help="calc.ephe_table のテーブルファイル（省略時は swisseph）")
+    ap.add_argument("--ayanamsa", default=DEFAULT_OPTS["ayan_mode"], help="アヤナーンシャ（既定 Lahiri_ICRC）")
+    ap.add_argument("--ephe-path", default="", help="Swiss Ephemeris ファイルパス（空で内蔵）")
+    ap.add_argument("-o", "--output", default="-", help="出力 JSONL（省略または - で stdout）")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    elements = tuple(e.strip() for e in args.elements.split(",") if e.strip())
+    table = None
+    if args.table:
+        from .ephe_table import EpheTable
+        table = EpheTable(args.table)
+        args.ayanamsa = table.ayan_mode
+    init_ephemeris(args.ephe_path, args.ayanamsa)
+    s, e = args.start, args.end
+    try:
+        cal = build_calendar(
+            jd_ut_from_local(s.year, s.month, s.day, 0.0, args.tz),
+            jd_ut_from_local(e.year, e.month, e.day, 0.0, args.tz),
+            elements, args.step, table,
+        )
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    sun = None
+    if args.lat is not None and args.lon is not None:
+        from .sunrise import SunTimes
+        sun = SunTimes()
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for row in daily(cal, s, e, args.tz, sun, args.lat or 0.0, args.lon or 0.0):
+            out.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+            out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if table is not None:
+            table.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+# calc/parallel.py
+"""
+マルチプロセスでのチャート一括生成。
+
+Swiss Ephemeris の状態（ephe パス・サイデリアルモード）はプロセス全体で共有されるため、
+スレッドでは並列化できない。ここでは ProcessPoolExecutor を使い、
+各ワーカーを 1 回だけ初期化（init_ephemeris + 生成オプション）したうえで、
+入力をチャンク単位で配る。
+
+- 出力順は入力順と同じ
+- 同時に投入するチャンク数を制限するため、入力がジェネレータでもメモリは一定
+- ワーカーが落ちた（BrokenProcessPool）場合はプールを作り直し、未完了チャンクを
+  1 つずつ単独で再実行する。同じチャンクで max_retries 回落ちたら 1 件ずつに分割して
+  原因レコードを特定し、そのレコードだけ {"error": ..., "line": n} を返す
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import metrics
+from .cli import iter_results
+from .pipeline import DEFAULT_OPTS, init_ephemeris
+
+Item = Tuple[int, Any]  # (行番号, レコード)
+
+# ワーカー側の生成オプション（_worker_init で設定）
+_WORKER_OPTS: Dict[str, Any] = {}
+
+
+def _worker_init(ephe_path: str, ayan_mode: str, opts: Dict[str, Any], collect_metrics: bool = False) -> None:
+    """
+    ワーカープロセスの初期化（ephe パス・サイデリアル・ノード種別などを 1 回だけ設定）
+    collect_metrics=True なら calc.metrics を有効にする（結果と一緒に drain() を親へ返す）。
+    """
+    metrics.enable(collect_metrics)
+    init_ephemeris(ephe_path, ayan_mode)
+    _WORKER_OPTS.clear()
+    _WORKER_OPTS.update(opts)
+
+
+def _worker_run(chunk: List[Item]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """(結果, 計測の差分 or None)"""
+    results = list(iter_results(chunk, _WORKER_OPTS))
+    return results, (metrics.drain() if metrics.ENABLED else None)
+
+
+def _chunks(items: Iterable[Item], size: int) -> Iterator[List[Item]]:
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parallel_results(
+    items: Iterable[Item],
+    opts: Optional[Dict[str, Any]] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+    ephe_path: str = "",
+    ayan_mode: str = DEFAULT_OPTS["ayan_mode"],
+    max_retries: int = 2,
+) -> Iterator[Dict[str, Any]]:
+    """
+    calc.cli.iter_results のマルチプロセス版。
+    items は (行番号, レコード) の反復子（calc.cli.iter_records の出力など）。
+    workers を省略すると CPU コア数。
+    """
+    o = dict(DEFAULT_OPTS)
+    o.update(opts or {})
+    n_workers = workers or os.cpu_count() or 1
+    max_inflight = n_workers * 2
+
+    def new_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_worker_init,
+            initargs=(ephe_path, ayan_mode, o, metrics.ENABLED),
+        )
+
+    source = _chunks(items, chunk_size)
+    # [chunk, future, 失敗回数, suspect]
+    inflight: Deque[List[Any]] = deque()
+    pool = new_pool()
+
+    def fill() -> None:
+        while len(inflight) < max_inflight:
+            chunk = next(source, None)
+            if chunk is None:
+                return
+            inflight.append([chunk, pool.submit(_worker_run, chunk), 0, False])
+
+    try:
+        fill()
+        while inflight:
+            entry = inflight[0]
+            chunk, fut, fails, suspect = entry
+            if fut is None:
+                # suspect は 1 つずつ単独で流し、落ちたらそのチャンクの責任とみなす
+                if fails >= max_retries:
+                    inflight.popleft()
+                    if len(chunk) > 1:
+                        for item in reversed(chunk):
+                            inflight.appendleft([[item], None, 0, True])
+                    else:
+                        yield {"error": "worker process crashed", "line": chunk[0][0]}
+                    continue
+                fut = entry[1] = pool.submit(_worker_run, chunk)
+            try:
+                results, raw = fut.result()
+            except BrokenProcessPool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = new_pool()
+                if suspect:
+                    entry[2] += 1
+                for e in inflight:
+                    f = e[1]
+                    if f is not None and f.done() and not f.cancelled() and f.exception() is None:
+                        continue  # 完了済みの結果はそのまま使う
+                    e[1] = None
+                    e[3] = True
+                continue
+            inflight.popleft()
+            if raw is not None:
+                metrics.merge(raw)
+            yield from results
+            if not any(e[3] for e in inflight):
+                fill()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
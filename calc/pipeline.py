@@ -0,0 +1,296 @@
+# calc/pipeline.py
+"""
+出生データ 1 件 → AI 向け JSON（dict）までの生成パイプライン。
+
+app.py（Streamlit）と calc.cli（ヘッドレス）で共通に使う。
+Streamlit 依存は持たない（キャッシュは呼び出し側で被せる）。
+"""
+from datetime import date
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from . import metrics
+from .ephemeris import (
+    set_ephe_path,
+    setup_sidereal,
+    jd_ut_from_local,
+    ayanamsa_deg,
+    asc_sidereal,
+    planet_sidereal_longitudes,
+)
+from .core import ChartCore
+from .d1 import build_d1
+from .shodasavarga import build_shodasavarga
+from .validators import validate_output
+from .varga import VARGA_NAMES
+
+# generate_chart の既定オプション（app.py の UI 初期値と同じ）
+DEFAULT_OPTS: Dict[str, Any] = {
+    "node_type": "True",        # "True" | "Mean"
+    "ck_mode": "7",             # "7" | "8"
+    "include_lordship": True,
+    "include_ashtakavarga": False,  # True で D1 に ashtakavarga（BAV/SAV）を含む
+    "include_aspects": False,       # True で D1 に aspects（グラハ／ラーシ・ドリシュティ）を含む
+    "vargas": ("D1", "D9"),
+    "ayan_mode": "Lahiri_ICRC",
+    "validate": False,          # True で assemble 時にスキーマ検査（validators.validate_output）
+    "compare": None,            # {"ayanamsas": [...], "node_types": [...]} で比較ドキュメント（calc.variants）
+}
+
+
+# ----------------------
+# Helpers
+# ----------------------
+def format_tz(offset: float) -> str:
+    """UTC ±h を文字列化（例：UTC+9 / UTC-5.5）"""
+    sign = "+" if offset >= 0 else "-"
+    val = abs(offset)
+    if abs(val - int(val)) < 1e-9:
+        return f"UTC{sign}{int(val)}"
+    return f"UTC{sign}{val:.1f}"
+
+
+def deg_to_dms_str(deg: float, always_sign_minus=False) -> str:
+    """
+    23.565 -> "-23:33:54" 風に整形。
+    always_sign_minus=True の時は “-" で出す（アヤナーンシャ表記向け）。
+    """
+    d = abs(deg)
+    D = int(d)
+    m_f = (d - D) * 60
+    M = int(m_f)
+    S = int(round((m_f - M) * 60))
+    if S == 60:
+        S = 0
+        M += 1
+    if M == 60:
+        M = 0
+        D += 1
+    prefix = "-" if always_sign_minus else ""
+    return f"{prefix}{D:02d}:{M:02d}:{S:02d}"
+
+
+# =======================================================
+# 0) Ephemeris 初期化（パス・サイデリアル）
+# =======================================================
+def init_ephemeris(ephe_path: str, ayan_mode: str = "Lahiri_ICRC") -> bool:
+    """
+    Swiss Ephemeris の初期設定。
+    - ephe_path: パス（空なら None）
+    - ayan_mode: 'Lahiri_ICRC' or 'Lahiri'（calc/ephemeris.setup_sidereal 内でフォールバック）
+    返り値はダミー（True）。
+    """
+    with metrics.span("init_ephemeris"):
+        set_ephe_path(ephe_path)
+        setup_sidereal(ayan_mode)
+    return True
+
+
+# =======================================================
+# 1) コア計算（Asc/惑星/アヤナーンシャ）
+# =======================================================
+def compute_core(
+    y: int,
+    mo: int,
+    d: int,
+    h_float: float,
+    tz: float,
+    lat_deg: float,
+    lon_deg: float,
+    node_flag: str,  # "True" | "Mean"
+) -> ChartCore:
+    """
+    重いコア計算部分（Asc/惑星/アヤナーンシャ）
+    ※ 先に init_ephemeris(...) を済ませておくこと（パス/サイデリアル設定）
+    従来の dict 形式が必要な場合は .as_dict()。
+    """
+    jd_ut = jd_ut_from_local(y, mo, d, h_float, tz)
+    asc = asc_sidereal(jd_ut, lat_deg, lon_deg)
+    planets = planet_sidereal_longitudes(jd_ut, node_flag)
+    aya = ayanamsa_deg(jd_ut)
+    return ChartCore.from_parts(jd_ut, asc, aya, planets, node_flag)
+
+
+# =======================================================
+# 2) Varga 生成（D1/D9/D20/D60 + その他の分割図）
+# =======================================================
+def build_vargas(
+    asc: float,
+    planets: dict,
+    ck_mode: str,               # "7" | "8"
+    include_lordship: bool,
+    need_d1: bool,
+    need_d9: bool,
+    need_d20: bool,
+    need_d60: bool,
+    extra: tuple = (),          # 追加の分割図（例：("D10", "D30")、varga.VARGA_RULES 参照）
+    include_ashtakavarga: bool = False,
+    include_aspects: bool = False,
+) -> dict:
+    """
+    各分割図の JSON 断片を生成（必要なものだけ）
+    D1 は build_d1、それ以外は build_shodasavarga で 1 パスにまとめて生成。
+    """
+    out = {}
+    opts = {
+        "ck_mode": ck_mode,
+        "include_lordship": include_lordship,
+        "include_ashtakavarga": include_ashtakavarga,
+        "include_aspects": include_aspects,
+    }
+
+    if need_d1:
+        out["D1"] = build_d1(asc, planets, opts)
+    names = set(extra) - {"D1"}
+    if need_d9:
+        names.add("D9")
+    if need_d20:
+        names.add("D20")
+    if need_d60:
+        names.add("D60")
+    if names:
+        out.update(build_shodasavarga(asc, planets, names))
+    return out
+
+
+def inject_karakamsa(vargas: dict) -> None:
+    """D9 がある場合、karakamsa_sign を D1 へ注入（in-place）"""
+    if ("D1" in vargas) and ("D9" in vargas):
+        try:
+            ak_planet = vargas["D1"].get("jaimini", {}).get("AK")
+            if ak_planet:
+                karaka_sign = vargas["D9"]["planets"][ak_planet]["sign"]
+                vargas["D1"].setdefault("jaimini", {})["karakamsa_sign"] = karaka_sign
+        except Exception:
+            pass
+
+
+def build_meta(
+    name: str,
+    birth_date: date,
+    h: int,
+    m: int,
+    tz_offset: float,
+    lat: float,
+    lon: float,
+    location_label: str,
+    aya_val: float,
+    node_flag: str,
+) -> dict:
+    """meta セクションを構築"""
+    aya_str = deg_to_dms_str(aya_val, always_sign_minus=True)
+    return {
+        "name": name,
+        "birth": f"{birth_date.isoformat()} {int(h):02d}:{int(m):02d}",
+        "timezone": format_tz(tz_offset),
+        "latitude": f"{lat:.2f}",
+        "longitude": f"{lon:.2f}",
+        "location": location_label,
+        "ayanamsa": f"Lahiri ICRC {aya_str}",
+        "calculation_model": "Drik Siddhanta",
+        "node_type": node_flag,
+        "house_system": "Whole Sign",
+    }
+
+
+def assemble(meta: dict, vargas: dict, validate: bool = False) -> dict:
+    """
+    トップレベル JSON まとめ。
+    builder は prune 済みの値しか出さないため、コピーはせずにそのまま束ねる。
+    validate=True ならスキーマ検査（不正なら ValueError）。
+    """
+    out = {"meta": meta}
+    out.update(vargas)
+    if validate:
+        validate_output(out)
+    return out
+
+
+# =======================================================
+# 3) レコード（1 件）→ 出力 JSON
+# =======================================================
+def parse_record(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    入力レコードを正規化する。
+      {"name": "Guest", "date": "1990-01-01", "time": "12:00[:00]",
+       "tz": 9.0, "lat": 35.68, "lon": 139.75, "location": "Tokyo"}
+    name / location は省略可。不正な値は ValueError。
+    """
+    try:
+        birth_date = date.fromisoformat(str(rec["date"]))
+        hms = [int(x) for x in str(rec.get("time", "12:00")).split(":")]
+        tz = float(rec["tz"])
+        lat = float(rec["lat"])
+        lon = float(rec["lon"])
+    except KeyError as e:
+        raise ValueError(f"missing field: {e.args[0]}") from None
+    if not 2 <= len(hms) <= 3:
+        raise ValueError(f"invalid time: {rec.get('time')!r}")
+    h, m, s = (hms + [0])[:3]
+    if not (0 <= h < 24 and 0 <= m < 60 and 0 <= s < 60):
+        raise ValueError(f"invalid time: {rec.get('time')!r}")
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        raise ValueError("lat/lon out of range")
+    return {
+        "name": str(rec.get("name", "Guest")),
+        "location": str(rec.get("location", "Unknown")),
+        "date": birth_date,
+        "h": h, "m": m, "s": s,
+        "tz": tz, "lat": lat, "lon": lon,
+    }
+
+
+def generate_chart(rec: Dict[str, Any], opts: Optional[Dict[str, Any]] = None) -> dict:
+    """
+    1 レコードから app.py の「生成」ボタンと同じ JSON（dict）を作る。
+    先に init_ephemeris(...) を済ませておくこと。
+    """
+    return generate_chart_with_core(rec, opts)[0]
+
+
+def generate_chart_with_core(
+    rec: Dict[str, Any], opts: Optional[Dict[str, Any]] = None
+) -> Tuple[dict, ChartCore]:
+    """
+    generate_chart と同じだが、途中のコア計算結果（ChartCore）も返す。
+    各ステージの所要時間は calc.metrics（有効時のみ）に記録する。
+    """
+    o = dict(DEFAULT_OPTS)
+    o.update(opts or {})
+    with metrics.span("generate"):
+        r = parse_record(rec)
+        need = set(o["vargas"])
+
+        h_float = r["h"] + r["m"] / 60.0 + r["s"] / 3600.0
+        bd = r["date"]
+        with metrics.span("compute_core"):
+            core = compute_core(bd.year, bd.month, bd.day, h_float, r["tz"], r["lat"], r["lon"], o["node_type"])
+        with metrics.span("build_vargas"):
+            vargas = build_vargas(
+                core.asc,
+                core.planets,
+                o["ck_mode"],
+                o["include_lordship"],
+                "D1" in need,
+                "D9" in need,
+                "D20" in need,
+                "D60" in need,
+                tuple(sorted(need.difference(("D1", "D9", "D20", "D60")))),
+                o["include_ashtakavarga"],
+                o["include_aspects"],
+            )
+        with metrics.span("inject_karakamsa"):
+            inject_karakamsa(vargas)
+        meta = build_meta(
+            r["name"], bd, r["h"], r["m"], r["tz"], r["lat"], r["lon"],
+            r["location"], core.ayanamsa, o["node_type"],
+        )
+        with metrics.span("assemble"):
+            out = assemble(meta, vargas, o["validate"])
+    metrics.incr("charts_total")
+    return out, core
+
+
+def generate_charts(records: Iterable[Dict[str, Any]], opts: Optional[Dict[str, Any]] = None):
+    """generate_chart のジェネレータ版（入力を逐次消費し、1 件ずつ返す）"""
+    for rec in records:
+        yield generate_chart(rec, opts)
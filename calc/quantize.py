@@ -0,0 +1,247 @@
+# calc/quantize.py
+"""
+出力等価キーによるチャートキャッシュ（near-duplicate 入力のヒット率向上）。
+
+出力 JSON は丸められている（degree は 2 桁、speed は 3 桁、meta の時刻は分まで・緯度経度は 2 桁、
+D60 は 0.5° ごと …）ため、数秒・数メートル違いの入力は多くの場合まったく同じ JSON になる。
+ここでは
+
+  1) 正準キー：meta に出る文字列（name / birth "YYYY-MM-DD HH:MM" / timezone / latitude /
+     longitude / location / node_type）と生成オプション。これが違えば出力は必ず違う。
+  2) 連続部分：jd_ut（秒・tz の端数）と生の緯度経度。同じキーの中で出力が変わらない範囲を
+     エントリごとに求めて一緒に保存し、問い合わせがその範囲内ならフル計算を省く。
+
+範囲の決め方：
+  - 惑星の黄経（jd のみに依存、なめらか）：出力に効く区切りまでの距離 ÷ 変化率（speed）を
+    時間窓にする → |jd - jd_ref| <= window_days。区切りは
+      サイン 30° / パダ 10/3° / degree の丸め（0.005 + 0.01k）/ 要求された分割図（30/parts、
+      mul 指定時は 1/mul）/ tithi（Mo - Su の 12°）/ Chara Karaka の順位（サイン内度数の隣接差）。
+    線形近似の誤差（ACC_MAX × Δt² / 2）と数値の揺れは tol として距離から差し引く。
+  - 惑星の速度：Moshier（ephe ファイル無し）の speed は数値微分で、瞬間的に ~0.015 deg/day
+    跳ねることがあるため、加速度の上限では抑えられない。speed を出力する天体と、速度フラグの
+    閾値・逆行（0）に SPEED_NOISE 以内の天体は「volatile」とし、問い合わせ時にその天体だけ
+    calc_ut して速度フラグ（speed.flags）の結果を比較する。それ以外は閾値までの距離が
+    SPEED_NOISE を超えているので窓内で変わらない。
+  - Asc（jd・緯度・経度に依存し変化が速い）とアヤナーンシャは、問い合わせのたびに実際に計算し、
+    出力に効く区分（サイン・丸め後 degree・ナクシャトラ/パダ・各分割図の Asc サイン）と
+    meta の ayanamsa 文字列を比較する。
+
+範囲外・不一致ならフル計算して新しいエントリを足す（1 キーあたり max_entries 件まで）。
+境界の近くでは窓が小さくなる（0 にもなる）だけなので、返る JSON は常にフル計算と同一。
+"""
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import swisseph as swe
+
+from . import metrics
+from .base import PADA_SIZE, deg_in_sign_index, nakshatra_pada, round2
+from .cache import ResultCache, make_key
+from .core import ChartCore
+from .ephemeris import BODY_IDS, SIDEREAL_SPEED_FLAG, asc_sidereal, ayanamsa_deg, jd_ut_from_local
+from .pipeline import DEFAULT_OPTS, deg_to_dms_str, format_tz, generate_chart_with_core, parse_record
+from .speed import TH, flags as speed_flags
+from .varga import VARGA_RULES, varga_indices, varga_plan
+
+# 黄経の 2 階微分の上限（deg/day²、Moshier の数値を含めた実測最大値の約 1.5 倍）
+ACC_MAX: Dict[str, float] = {
+    "Su": 0.001, "Mo": 0.8, "Me": 0.35, "Ve": 0.07, "Ma": 0.1,
+    "Ju": 0.45, "Sa": 0.26, "Ra": 0.1, "Ke": 0.1,
+}
+# speed の揺れ（deg/day）：閾値までこれ以上離れていれば窓内でフラグは変わらない
+SPEED_NOISE = 0.02
+# 窓の上限（日）：線形近似の誤差評価の前提
+MAX_WINDOW_DAYS = 600.0 / 86400.0
+# 黄経の数値の揺れ（deg）
+LON_NOISE = 1e-6
+
+# 速度フラグの閾値（|speed| と比較、speed.TH と同じ）
+_SPEED_TH: Dict[str, Tuple[float, ...]] = {
+    "Su": (),
+    "Mo": (TH["MOON_VERY_SLOW"], TH["MOON_SLOW"], TH["MOON_FAST"], TH["MOON_VERY_FAST"]),
+    "Me": (TH["MERCURY_STATION"], TH["MERCURY_VERY_FAST"]),
+    "Ve": (TH["VENUS_STATION"], TH["VENUS_FAST"]),
+    "Ma": (TH["MARS_STATION"], TH["MARS_FAST"]),
+    "Ju": (TH["JUPITER_STATION"], TH["JUPITER_FAST"]),
+    "Sa": (TH["SATURN_STATION"], TH["SATURN_FAST"]),
+    "Ra": (TH["RAHU_STATION"], TH["RAHU_FAST"]),
+    "Ke": (TH["RAHU_STATION"], TH["RAHU_FAST"]),
+}
+_BODY = dict(BODY_IDS)
+_CK_CAND = ("Su", "Mo", "Ma", "Me", "Ju", "Ve", "Sa")
+
+Entry = Tuple[float, float, Tuple[Any, ...], str, Tuple[Tuple[str, Any], ...], str]
+
+
+def _grid_margin(x: float, step: float, offset: float = 0.0) -> float:
+    """x から offset + k*step 形の区切りまでの最短距離。"""
+    r = (x - offset) % step
+    return min(r, step - r)
+
+
+def _varga_step(name: str) -> float:
+    rule = VARGA_RULES[name]
+    mul = rule.get("mul")
+    return 1.0 / mul if mul else 30.0 / rule["parts"]
+
+
+def _window(margin: float, rate: float, tol: float) -> float:
+    """|rate| * dt + tol <= margin を満たす dt の上限。"""
+    m = margin - tol
+    if m <= 0.0:
+        return 0.0
+    r = abs(rate)
+    return m / r if r > 0.0 else math.inf
+
+
+def _tol(acc: float) -> float:
+    return 0.5 * acc * MAX_WINDOW_DAYS * MAX_WINDOW_DAYS + LON_NOISE
+
+
+def canonical_key(r: Dict[str, Any], opts: Dict[str, Any]) -> Tuple[Any, ...]:
+    """出力に文字列として現れる入力 + 出力を左右するオプション（r は parse_record 済み）。"""
+    return (
+        r["name"],
+        r["location"],
+        r["date"].isoformat(),
+        r["h"], r["m"],
+        format_tz(r["tz"]),
+        f"{r['lat']:.2f}", f"{r['lon']:.2f}",
+        opts["node_type"], opts["ck_mode"], bool(opts["include_lordship"]),
+        bool(opts["include_ashtakavarga"]), bool(opts["include_aspects"]),
+        tuple(sorted(set(opts["vargas"]))),
+        opts["ayan_mode"],
+    )
+
+
+def speed_signature(planet: str, speed: float) -> Tuple[Tuple[str, Any], ...]:
+    """速度に由来する出力（retrograde / 速度フラグ / 出力される speed 値）。"""
+    return tuple(sorted(speed_flags(planet, speed).items()))
+
+
+def planet_window(core: ChartCore, opts: Dict[str, Any]) -> Tuple[float, Tuple[str, ...]]:
+    """
+    (window_days, volatile)
+    window_days : |jd - jd_ref| がこれ以下なら、volatile 以外の惑星由来の出力は変わらない
+    volatile    : 問い合わせ時に速度を実際に確かめる天体
+    """
+    need = set(opts["vargas"])
+    d1 = "D1" in need
+    steps = [30.0]
+    if d1:
+        steps.append(PADA_SIZE)
+    steps.extend(_varga_step(n) for n in need if n != "D1")
+    w = MAX_WINDOW_DAYS
+    volatile: List[str] = []
+
+    for p, dat in core.planets.items():
+        lon, spd = dat["lon"], dat["speed"]
+        margin = min(_grid_margin(lon, s) for s in steps)
+        if d1 and p not in ("Ra", "Ke"):
+            margin = min(margin, _grid_margin(lon, 0.01, 0.005))
+        w = min(w, _window(margin, spd, _tol(ACC_MAX[p])))
+        if d1:
+            s = abs(spd)
+            sm = min([s] + [abs(s - t) for t in _SPEED_TH[p]])
+            if p == "Mo" or "speed" in speed_flags(p, spd) or sm <= SPEED_NOISE:
+                volatile.append(p)
+        if w <= 0.0:
+            return 0.0, ()
+
+    if d1:
+        su, mo = core.planets["Su"], core.planets["Mo"]
+        elong = (mo["lon"] - su["lon"]) % 360.0
+        w = min(w, _window(_grid_margin(elong, 12.0), mo["speed"] - su["speed"], _tol(ACC_MAX["Mo"])))
+        if opts["ck_mode"] in ("7", "8"):
+            cand = _CK_CAND + (("Ra",) if opts["ck_mode"] == "8" else ())
+            ranked = []
+            for p in cand:
+                _, d = deg_in_sign_index(core.lon(p))
+                rate = core.speed(p)
+                if p == "Ra":
+                    d, rate = 30.0 - d, -rate
+                ranked.append((d, rate, ACC_MAX[p]))
+            ranked.sort()
+            for (d1_, r1, a1), (d2_, r2, a2) in zip(ranked, ranked[1:]):
+                w = min(w, _window(d2_ - d1_, r2 - r1, _tol(a1 + a2)))
+    return max(w, 0.0), tuple(volatile)
+
+
+def asc_signature(asc: float, vargas: Tuple[str, ...]) -> Tuple[Any, ...]:
+    """Asc に由来する出力を決める区分（サイン・丸め後 degree・ナクシャトラ/パダ・各分割図の Asc サイン）。"""
+    si, deg = deg_in_sign_index(asc)
+    plan = varga_plan(v for v in vargas if v != "D1")
+    return (si, round2(deg), nakshatra_pada(asc), tuple(varga_indices(si, deg, plan)))
+
+
+class EquivalenceCache:
+    """
+    generate_chart の結果を「出力が変わらない入力の範囲」ごとにキャッシュする。
+    store は ResultCache（SQLite 共有も可）。省略時はメモリのみの ResultCache。
+    namespace はキーに混ぜる任意の値（ephe_path など、opts の外で出力を左右するもの）。
+    先に init_ephemeris(...) を済ませておくこと。
+    """
+
+    def __init__(self, store: Optional[ResultCache] = None, max_entries: int = 8, namespace: Any = None):
+        self.store = store if store is not None else ResultCache()
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "window_misses": 0}
+
+    def generate(self, rec: Dict[str, Any], opts: Optional[Dict[str, Any]] = None) -> dict:
+        """generate_chart と同じ結果を返す（範囲内ならキャッシュから）。"""
+        o = dict(DEFAULT_OPTS)
+        o.update(opts or {})
+        r = parse_record(rec)
+        key = make_key(("eq", self.namespace) + canonical_key(r, o))
+        bd = r["date"]
+        h_float = r["h"] + r["m"] / 60.0 + r["s"] / 3600.0
+        jd = jd_ut_from_local(bd.year, bd.month, bd.day, h_float, r["tz"])
+        sig = asc_signature(asc_sidereal(jd, r["lat"], r["lon"]), tuple(o["vargas"]))
+        aya = deg_to_dms_str(ayanamsa_deg(jd), always_sign_minus=True)
+
+        entries: List[Entry] = self.store.get(key) or []
+        for jd_ref, w, sig_ref, aya_ref, speeds_ref, out_key in entries:
+            if abs(jd - jd_ref) > w or sig != sig_ref or aya != aya_ref:
+                continue
+            if speeds_ref and self._speeds(jd, o["node_type"], speeds_ref):
+                continue
+            out = self.store.get(out_key)
+            if out is not None:
+                self.stats["hits"] += 1
+                metrics.incr("cache_lookups_total", cache="equivalence", result="hit")
+                return out
+        if entries:
+            self.stats["window_misses"] += 1
+        self.stats["misses"] += 1
+        metrics.incr("cache_lookups_total", cache="equivalence", result="miss")
+
+        out, core = generate_chart_with_core(rec, o)
+        w, volatile = planet_window(core, o)
+        if w > 0.0:
+            speeds = tuple((p, speed_signature(p, core.speed(p))) for p in volatile)
+            out_key = make_key((key, jd, r["lat"], r["lon"]))
+            self.store.set(out_key, out)
+            entries.append((jd, w, sig, aya, speeds, out_key))
+            self.store.set(key, entries[-self.max_entries:])
+        return out
+
+    @staticmethod
+    def _speeds(jd: float, node_type: str, speeds_ref: Tuple[Tuple[str, Any], ...]) -> bool:
+        """volatile な天体の速度出力が変わっていれば True。"""
+        node = swe.TRUE_NODE if node_type == "True" else swe.MEAN_NODE
+        for p, ref in speeds_ref:
+            body = _BODY.get(p, node)
+            metrics.incr("swe_calls_total", fn="calc_ut")
+            spd = swe.calc_ut(jd, body, SIDEREAL_SPEED_FLAG)[0][3]
+            if p == "Ke":
+                spd = -spd
+            if speed_signature(p, spd) != ref:
+                return True
+        return False
+
+    def info(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self.stats)
+        n = out["hits"] + out["misses"]
+        out["hit_rate"] = out["hits"] / n if n else 0.0
+        return out
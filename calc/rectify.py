@@ -0,0 +1,391 @@
+# calc/rectify.py
+"""
+出生時刻スイープ（レクティフィケーション用）。
+
+出生時刻の不確かさの幅（例：±2 時間）を、D1 / D9 / D20 / D60（と指定した分割図）の
+区分が変わらない区間のリストに分割する。1 分ごとに生成し直す代わりに、区分が変わる時刻
+（区切りの通過時刻）を直接解く：
+
+  - Asc：粗い刻み（ASC_STEP_DAYS）で asc_sidereal を評価し、刻みの中で越えた区切り
+    （サイン 30° / パダ 3°20′ / 各分割図の 1 区分）ごとに Illinois 法（はさみうち）で通過時刻を解く。
+    Asc は時刻に対して単調増加なので、1 区切りあたり asc_sidereal 数回で済む。
+  - 惑星：calc.transit と同じく (黄経, 速度) を使った Newton 法で、サイン・パダ・分割図の区切りを解く
+    （刻み内の留は速度の符号変化から先に解いて区間を分けるので、逆行中も同じ扱い）。
+  - tithi：月 - 太陽の離角の 12° 区切り。
+  - Chara Karaka：惑星の区切りで分けた各区間の両端で順位を比べ、入れ替わった 2 天体の
+    サイン内度数の差 = 0 を解く。
+
+各区間の中点で区分（シグネチャ）を評価し、隣と同じものは結合する（D30 のような不等分割は
+1° 刻みを区切り候補にしているため）。区間内ではハウス・支配関係・karakamsa も変わらない。
+degree（小数 2 桁）と speed（3 桁）の値そのもの、および速度フラグ（留・fast 等）は
+区分に含めない（数秒〜数時間で変わり続けるか、留の近くでしか変わらないため）。
+
+  init_ephemeris("", "Lahiri_ICRC")
+  rows = sweep_record({"date": "1990-01-01", "time": "12:00", "tz": 9, "lat": 35.68, "lon": 139.75},
+                      minutes=120, opts={"vargas": ("D1", "D9", "D20", "D60")})
+  # [{"start": "1990-01-01 10:00:00", "end": "10:00:16", "seconds": 16.2, "changed": [],
+  #   "Asc": {"sign": "Aq", "nakshatra": "Shatabhisha-2", "D9": "Cp", "D20": "Le", "D60": "Ar"},
+  #   "contains_input": False, "record": {... 区間中点の時刻 ...}},
+  #  {..., "changed": ["Asc.nakshatra", "Asc.D9"], ...}, ...]
+
+  python -m calc.rectify --date 1990-01-01 --time 12:00 --tz 9 --lat 35.68 --lon 139.75 --minutes 120
+"""
+import argparse
+import json
+import math
+import sys
+from itertools import combinations
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import swisseph as swe
+
+from .base import PADA_SIZE, PLANETS, SIGNS, deg_in_sign_index, nakshatra_pada
+from .chara_karaka import KARAKA_7, KARAKA_8
+from .ephemeris import asc_sidereal, jd_ut_from_local
+from .pipeline import DEFAULT_OPTS, init_ephemeris, parse_record
+from .transit import (
+    STEP_DAYS,
+    TOL_DAYS,
+    TOL_DEG,
+    MAX_ITER,
+    PosFn,
+    _grid_crossings,
+    _wrap180,
+    position_fn,
+    solve_crossing,
+    solve_station,
+)
+from .varga import VARGA_RULES, varga_indices, varga_plan
+
+# Asc を評価する粗い刻み（日）：この間に Asc が 180° 以上進むことはない（高緯度の急変も含めて）
+ASC_STEP_DAYS = 4.0 / 1440.0
+# スイープ幅の上限（日）
+MAX_SPAN_DAYS = 3.0
+
+_CK_CAND = ("Su", "Mo", "Ma", "Me", "Ju", "Ve", "Sa")
+_TITHI_SIZE = 12.0
+# Chara Karaka の順位を区間の端から少し内側で評価する幅（日、約 0.1 秒）
+_CK_EPS_DAYS = 1e-6
+
+Signature = Dict[str, str]
+
+
+class Interval(NamedTuple):
+    start: float                 # jd_ut
+    end: float                   # jd_ut
+    changed: Tuple[str, ...]     # 直前の区間から変わった区分（"Asc.D60", "Mo.nakshatra", "jaimini" など）
+    signature: Dict[str, str]    # 区分名 → 値
+
+
+def _varga_step(name: str) -> float:
+    rule = VARGA_RULES[name]
+    mul = rule.get("mul")
+    return 1.0 / mul if mul else 30.0 / rule["parts"]
+
+
+def _steps(vargas: Iterable[str], pada: bool) -> Tuple[float, ...]:
+    """区切りの刻み（重複なし、粗い順）。"""
+    steps = {30.0}
+    if pada:
+        steps.add(PADA_SIZE)
+    steps.update(_varga_step(v) for v in vargas if v != "D1")
+    return tuple(sorted(steps, reverse=True))
+
+
+# =======================================================
+# 区切りの通過時刻
+# =======================================================
+def solve_asc(asc: Callable[[float], float], target: float, ta: float, ga: float, tb: float, gb: float) -> float:
+    """Asc が target を通過する時刻（ga = Asc(ta) - target < 0 <= gb、Illinois 法）。"""
+    side = 0
+    t = ta
+    for _ in range(MAX_ITER):
+        t = (ta * gb - tb * ga) / (gb - ga)
+        g = _wrap180(asc(t) - target)
+        if abs(g) < TOL_DEG or tb - ta < TOL_DAYS:
+            break
+        if g < 0:
+            ta, ga = t, g
+            if side == -1:
+                gb *= 0.5
+            side = -1
+        else:
+            tb, gb = t, g
+            if side == 1:
+                ga *= 0.5
+            side = 1
+    return t
+
+
+def asc_cuts(jd_start: float, jd_end: float, lat: float, lon: float, steps: Sequence[float]) -> List[float]:
+    """[jd_start, jd_end] で Asc が区切り（steps の各倍数）を越える時刻。"""
+
+    def asc(t: float) -> float:
+        return asc_sidereal(t, lat, lon)
+
+    out: List[float] = []
+    n = max(1, math.ceil((jd_end - jd_start) / ASC_STEP_DAYS))
+    h = (jd_end - jd_start) / n
+    ta, aa = jd_start, asc(jd_start)
+    for i in range(1, n + 1):
+        tb = jd_end if i == n else jd_start + i * h
+        ab = asc(tb)
+        delta = (ab - aa) % 360.0
+        targets = {round(target, 9) for s in steps for target, _ in _grid_crossings(aa, delta, s, 0.0)}
+        for target in sorted(targets, key=lambda x: (x - aa) % 360.0):
+            ga, gb = _wrap180(aa - target), _wrap180(ab - target)
+            if ga == 0.0:
+                continue
+            out.append(tb if gb == 0.0 else solve_asc(asc, target, ta, ga, tb, gb))
+        ta, aa = tb, ab
+    return out
+
+
+def body_cuts(pos: PosFn, jd_start: float, jd_end: float, steps: Sequence[float], h: float) -> List[float]:
+    """[jd_start, jd_end] で黄経が区切りを越える時刻（刻み h、留で区間を分けて単調な区間ごとに解く）。"""
+    out: List[float] = []
+    t, (la, va) = jd_start, pos(jd_start)
+    while t < jd_end:
+        tn = min(t + h, jd_end)
+        lb, vb = pos(tn)
+        segs = [(t, la, tn, lb)]
+        if (va < 0) != (vb < 0):
+            ts, ls = solve_station(pos, t, va, tn, vb)
+            if t < ts < tn:
+                segs = [(t, la, ts, ls), (ts, ls, tn, lb)]
+        for ta, l0, tb, l1 in segs:
+            delta = _wrap180(l1 - l0)
+            targets = {round(target, 9) for s in steps for target, _ in _grid_crossings(l0, delta, s, 0.0)}
+            out.extend(solve_crossing(pos, target, ta, tb, l0) for target in targets)
+        t, la, va = tn, lb, vb
+    return out
+
+
+def _elongation_fn(su: PosFn, mo: PosFn) -> PosFn:
+    def pos(t: float) -> Tuple[float, float]:
+        (ls, vs), (lm, vm) = su(t), mo(t)
+        return (lm - ls) % 360.0, vm - vs
+    return pos
+
+
+def _ck_value(planet: str, lon: float, speed: float) -> Tuple[float, float]:
+    """Chara Karaka の順位に使う値（サイン内度数、Ra は 30 - 度数）とその変化率。"""
+    _, d = deg_in_sign_index(lon)
+    return (30.0 - d, -speed) if planet == "Ra" else (d, speed)
+
+
+def ck_cuts(pos: Dict[str, PosFn], cand: Sequence[str], knots: Sequence[float]) -> List[float]:
+    """
+    knots（惑星のサイン区切りを含む時刻列）で分けた各区間について、両端で順位が入れ替わった
+    2 天体の順位値の差 = 0 を解く（区間内ではサインが変わらないので差は連続）。
+    端点ちょうどはサインの区切りの上にあり得るので、区間の内側（_CK_EPS_DAYS）で評価する。
+    """
+    out: List[float] = []
+    for ta, tb in zip(knots, knots[1:]):
+        if tb - ta <= 2.0 * _CK_EPS_DAYS:
+            continue
+        a, b = ta + _CK_EPS_DAYS, tb - _CK_EPS_DAYS
+        va = {p: _ck_value(p, *pos[p](a)) for p in cand}
+        vb = {p: _ck_value(p, *pos[p](b)) for p in cand}
+        for p, q in combinations(cand, 2):
+            if (va[p][0] < va[q][0]) == (vb[p][0] < vb[q][0]):
+                continue
+            fp, fq = pos[p], pos[q]
+
+            def diff(x: float, p: str = p, q: str = q, fp: PosFn = fp, fq: PosFn = fq) -> Tuple[float, float]:
+                dp, rp = _ck_value(p, *fp(x))
+                dq, rq = _ck_value(q, *fq(x))
+                return dp - dq, rp - rq
+
+            out.append(solve_crossing(diff, 0.0, a, b, va[p][0] - va[q][0]))
+    return out
+
+
+# =======================================================
+# シグネチャ（区間の区分）
+# =======================================================
+def _place(prefix: str, lon: float, plan, pada: bool, sig: Signature) -> None:
+    si, deg = deg_in_sign_index(lon)
+    sig[prefix + ".sign"] = SIGNS[si]
+    if pada:
+        nk, pa = nakshatra_pada(lon)
+        sig[prefix + ".nakshatra"] = f"{nk}-{pa}"
+    for (name, _p, _m, _l), vi in zip(plan, varga_indices(si, deg, plan)):
+        sig[f"{prefix}.{name}"] = SIGNS[vi]
+
+
+def planet_signature(
+    pos: Dict[str, PosFn], t: float, plan, d1: bool, ck_mode: Optional[str]
+) -> Signature:
+    """時刻 t の惑星由来の区分（サイン・パダ・分割図・tithi・Chara Karaka）。"""
+    sig: Signature = {}
+    lons: Dict[str, Tuple[float, float]] = {p: f(t) for p, f in pos.items()}
+    for p, (lon, _) in lons.items():
+        _place(p, lon, plan, d1 and p not in ("Ra", "Ke"), sig)
+    if d1:
+        elong = (lons["Mo"][0] - lons["Su"][0]) % 360.0
+        sig["tithi"] = str(int(elong // _TITHI_SIZE) + 1)
+        if ck_mode in ("7", "8"):
+            cand = _CK_CAND + (("Ra",) if ck_mode == "8" else ())
+            ranked = sorted(cand, key=lambda p: _ck_value(p, *lons[p])[0], reverse=True)
+            roles = KARAKA_8 if ck_mode == "8" else KARAKA_7
+            sig["jaimini"] = ",".join(f"{r}={p}" for r, p in zip(roles, ranked))
+    return sig
+
+
+def asc_signature(asc: float, plan, d1: bool) -> Signature:
+    sig: Signature = {}
+    _place("Asc", asc, plan, d1, sig)
+    return sig
+
+
+# =======================================================
+# スイープ
+# =======================================================
+def sweep(
+    jd_start: float,
+    jd_end: float,
+    lat: float,
+    lon: float,
+    vargas: Sequence[str] = ("D1", "D9", "D20", "D60"),
+    node_type: str = "True",
+    ck_mode: Optional[str] = "7",
+) -> List[Interval]:
+    """
+    [jd_start, jd_end] を区分が変わらない区間に分割する（時刻順、隣接区間のシグネチャは必ず異なる）。
+    先に init_ephemeris(...) を済ませておくこと。
+    """
+    if not jd_start < jd_end:
+        raise ValueError("jd_end must be after jd_start")
+    if jd_end - jd_start > MAX_SPAN_DAYS:
+        raise ValueError(f"sweep span must be <= {MAX_SPAN_DAYS} days")
+    plan = varga_plan(v for v in vargas if v != "D1")
+    d1 = "D1" in vargas
+    varga_steps = _steps(vargas, False)
+    pada_steps = _steps(vargas, d1)
+
+    # 惑星の区切り（惑星由来の区分はこの時刻でしか変わらない）
+    pos = {p: position_fn(p, node_type) for p in PLANETS}
+    knots: List[float] = []
+    for p in PLANETS:
+        if p == "Ke":
+            continue  # Ke = Ra + 180°：どの区切りも 180° を割り切るので Ra と同じ時刻
+        steps = pada_steps if p != "Ra" else varga_steps
+        knots.extend(body_cuts(pos[p], jd_start, jd_end, steps, STEP_DAYS[p]))
+    if d1:
+        elong = _elongation_fn(pos["Su"], pos["Mo"])
+        knots.extend(body_cuts(elong, jd_start, jd_end, (_TITHI_SIZE,), STEP_DAYS["Mo"]))
+        if ck_mode in ("7", "8"):
+            cand = _CK_CAND + (("Ra",) if ck_mode == "8" else ())
+            base = sorted({jd_start, jd_end, *knots})
+            knots.extend(ck_cuts(pos, cand, base))
+    pknots = sorted({t for t in knots if jd_start < t < jd_end})
+
+    # Asc の区切りと合わせて区間に分け、中点で評価する
+    cuts = sorted(set(pknots).union(t for t in asc_cuts(jd_start, jd_end, lat, lon, pada_steps)
+                                    if jd_start < t < jd_end))
+    bounds = [jd_start] + cuts + [jd_end]
+    out: List[Interval] = []
+    psig: Signature = {}
+    pseg = -1
+    j = 0
+    for a, b in zip(bounds, bounds[1:]):
+        if b - a <= 0.0:
+            continue
+        mid = 0.5 * (a + b)
+        while j < len(pknots) and pknots[j] <= mid:
+            j += 1
+        if j != pseg:
+            lo = pknots[j - 1] if j else jd_start
+            hi = pknots[j] if j < len(pknots) else jd_end
+            psig = planet_signature(pos, 0.5 * (lo + hi), plan, d1, ck_mode)
+            pseg = j
+        sig = asc_signature(asc_sidereal(mid, lat, lon), plan, d1)
+        sig.update(psig)
+        if out and out[-1].signature == sig:
+            last = out[-1]
+            out[-1] = last._replace(end=b)
+            continue
+        prev = out[-1].signature if out else {}
+        changed = tuple(k for k, v in sig.items() if prev and prev.get(k) != v)
+        out.append(Interval(a, b, changed, sig))
+    return out
+
+
+def _local(jd_ut: float, tz: float) -> Tuple[str, str]:
+    """jd（UT）→ ローカルの ("YYYY-MM-DD", "HH:MM:SS")（秒は切り捨て）。"""
+    y, m, d, h = swe.revjul(jd_ut + tz / 24.0 + 1e-9, swe.GREG_CAL)
+    sec = int(h * 3600.0)
+    return f"{y:04d}-{m:02d}-{d:02d}", f"{sec // 3600:02d}:{sec // 60 % 60:02d}:{sec % 60:02d}"
+
+
+def sweep_record(
+    rec: Dict[str, Any], minutes: float = 120.0, opts: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    入力レコードの時刻 ±minutes をスイープして、区間ごとの表示用 dict を返す。
+    "record" は区間中点の時刻に置き換えたレコード（そのまま generate_chart に渡せる）。
+    opts は generate_chart と同じ（vargas / node_type / ck_mode を使う）。
+    """
+    o = dict(DEFAULT_OPTS)
+    o.update(opts or {})
+    r = parse_record(rec)
+    bd = r["date"]
+    jd = jd_ut_from_local(bd.year, bd.month, bd.day, r["h"] + r["m"] / 60.0 + r["s"] / 3600.0, r["tz"])
+    half = minutes / 1440.0
+    rows: List[Dict[str, Any]] = []
+    for iv in sweep(jd - half, jd + half, r["lat"], r["lon"], tuple(o["vargas"]), o["node_type"], o["ck_mode"]):
+        d0, t0 = _local(iv.start, r["tz"])
+        _, t1 = _local(iv.end, r["tz"])
+        dm, tm = _local(0.5 * (iv.start + iv.end), r["tz"])
+        asc = {k.split(".", 1)[1]: v for k, v in iv.signature.items() if k.startswith("Asc.")}
+        rows.append({
+            "start": f"{d0} {t0}",
+            "end": t1,
+            "seconds": round((iv.end - iv.start) * 86400.0, 1),
+            "changed": list(iv.changed),
+            "Asc": asc,
+            "contains_input": iv.start <= jd < iv.end,
+            "record": dict(rec, date=dm, time=tm),
+        })
+    return rows
+
+
+# =======================================================
+# CLI
+# =======================================================
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m calc.rectify", description="出生時刻スイープ（区分が変わらない区間の一覧、JSONL）")
+    ap.add_argument("--date", required=True, help="出生日（YYYY-MM-DD）")
+    ap.add_argument("--time", required=True, help="出生時刻（HH:MM[:SS]、ローカル）")
+    ap.add_argument("--tz", required=True, type=float, help="UTC オフセット（時間）")
+    ap.add_argument("--lat", required=True, type=float)
+    ap.add_argument("--lon", required=True, type=float)
+    ap.add_argument("--minutes", type=float, default=120.0, help="スイープ幅（±分、既定 120）")
+    ap.add_argument("--vargas", default="D1,D9,D20,D60", help="分割図（カンマ区切り）")
+    ap.add_argument("--node", choices=["True", "Mean"], default=DEFAULT_OPTS["node_type"], help="ノードの計算")
+    ap.add_argument("--ck", choices=["7", "8"], default=DEFAULT_OPTS["ck_mode"], help="Chara Karaka（7/8）")
+    ap.add_argument("--ayanamsa", default=DEFAULT_OPTS["ayan_mode"], help="アヤナーンシャ（既定 Lahiri_ICRC）")
+    ap.add_argument("--ephe-path", default="", help="Swiss Ephemeris ファイルパス（空で内蔵）")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    vargas = tuple(v.strip() for v in args.vargas.split(",") if v.strip())
+    rec = {"date": args.date, "time": args.time, "tz": args.tz, "lat": args.lat, "lon": args.lon}
+    init_ephemeris(args.ephe_path, args.ayanamsa)
+    try:
+        rows = sweep_record(rec, args.minutes, {"vargas": vargas, "node_type": args.node, "ck_mode": args.ck})
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    for row in rows:
+        row.pop("record")
+        sys.stdout.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+# calc/serialize.py
+"""
+生成結果 JSON のシリアライザ。
+
+1 回の走査で
+  - プレビュー用の整形 JSON（配列・小さな辞書を 1 行化、旧 app.pretty_json_inline_lists と同じ出力）
+  - ダウンロード用の最小化 JSON（json.dumps(..., ensure_ascii=False, separators=(",", ":")) と同じ出力）
+の 2 つを同時に組み立てる。スカラーのエンコードは 1 回だけ行い、両方の出力へ同じ断片を積む。
+中間文字列は作らず、断片リストを最後に 1 回だけ join する（ファイル出力時は一定量ごとに書き出す）。
+"""
+import json
+from typing import Any, Callable, List, Optional, Tuple
+
+_encode_str = json.encoder.encode_basestring  # ensure_ascii=False 相当（C 実装があればそれ）
+_float_repr = float.__repr__
+_int_repr = int.__repr__
+
+# 出力先ファイルへ書き出す目安（断片数）
+FLUSH_PARTS = 4096
+
+
+def _encode_float(v: float) -> str:
+    if v != v:
+        return "NaN"
+    if v == float("inf"):
+        return "Infinity"
+    if v == -float("inf"):
+        return "-Infinity"
+    return _float_repr(v)
+
+
+def _is_scalar(x: Any) -> bool:
+    return x is None or isinstance(x, (str, int, float, bool))
+
+
+class _Sink:
+    """断片を溜め、fp があれば一定量ごとに書き出す。fp も parts も不要なら append は捨てる。"""
+
+    __slots__ = ("parts", "append", "fp", "encoding")
+
+    def __init__(self, fp: Any = None, encoding: Optional[str] = None, discard: bool = False):
+        self.parts: List[str] = []
+        self.append: Callable[[str], Any] = (lambda s: None) if discard else self.parts.append
+        self.fp = fp
+        self.encoding = encoding
+
+    def flush(self) -> None:
+        if self.fp is None or not self.parts:
+            return
+        chunk = "".join(self.parts)
+        self.parts.clear()
+        self.fp.write(chunk.encode(self.encoding) if self.encoding else chunk)
+
+    def maybe_flush(self) -> None:
+        if self.fp is not None and len(self.parts) >= FLUSH_PARTS:
+            self.flush()
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
+def _serialize(
+    obj: Any,
+    ps: _Sink,
+    ms: _Sink,
+    indent: int,
+    inline_small_dict_max_items: int,
+    inline_list_max_len: int,
+) -> None:
+    pa = ps.append
+    ma = ms.append
+    memo = {}  # キー・文字列値のエンコード結果（"sign" / "house" / 星座名などが大量に繰り返される）
+    pads = {}
+
+    def enc_str(s: str) -> str:
+        e = memo.get(s)
+        if e is None:
+            e = memo[s] = _encode_str(s)
+        return e
+
+    def enc_key(k: Any) -> str:
+        # json.dumps と同じ規則でキーを文字列化
+        if isinstance(k, str):
+            return enc_str(k)
+        if k is True:
+            return '"true"'
+        if k is False:
+            return '"false"'
+        if k is None:
+            return '"null"'
+        if isinstance(k, float):
+            return '"' + _encode_float(k) + '"'
+        if isinstance(k, int):
+            return '"' + _int_repr(k) + '"'
+        raise TypeError(f"keys must be str, int, float, bool or None, not {type(k).__name__}")
+
+    def pad(level: int) -> str:
+        p = pads.get(level)
+        if p is None:
+            p = pads[level] = "\n" + " " * (indent * level)
+        return p
+
+    def inline(v: Any) -> None:
+        """1 行形式（整形側は ", " / ": "、最小化側は "," / ":"）"""
+        if isinstance(v, str):
+            s = enc_str(v)
+        elif v is None:
+            s = "null"
+        elif v is True:
+            s = "true"
+        elif v is False:
+            s = "false"
+        elif isinstance(v, int):
+            s = _int_repr(v)
+        elif isinstance(v, float):
+            s = _encode_float(v)
+        elif isinstance(v, (list, tuple)):
+            pa("[")
+            ma("[")
+            first = True
+            for x in v:
+                if first:
+                    first = False
+                else:
+                    pa(", ")
+                    ma(",")
+                inline(x)
+            pa("]")
+            ma("]")
+            return
+        elif isinstance(v, dict):
+            pa("{")
+            ma("{")
+            first = True
+            for k, x in v.items():
+                ek = enc_key(k)
+                if first:
+                    pa(ek)
+                    ma(ek)
+                    first = False
+                else:
+                    pa(", ")
+                    pa(ek)
+                    ma(",")
+                    ma(ek)
+                pa(": ")
+                ma(":")
+                inline(x)
+            pa("}")
+            ma("}")
+            return
+        else:
+            raise TypeError(f"Object of type {type(v).__name__} is not JSON serializable")
+        pa(s)
+        ma(s)
+
+    def can_inline(d: dict) -> bool:
+        if len(d) > inline_small_dict_max_items:
+            return False
+        for v in d.values():
+            if _is_scalar(v):
+                continue
+            if isinstance(v, list) and len(v) <= inline_list_max_len and all(_is_scalar(x) for x in v):
+                continue
+            return False
+        return True
+
+    def block(d: dict, level: int) -> None:
+        """複数行形式の辞書（値が辞書なら再帰、それ以外は 1 行形式）"""
+        if can_inline(d):
+            inline(d)
+            return
+        pad_in = pad(level + 1)
+        pa("{")
+        ma("{")
+        first = True
+        for k, v in d.items():
+            ek = enc_key(k)
+            if first:
+                first = False
+            else:
+                pa(",")
+                ma(",")
+            pa(pad_in)
+            pa(ek)
+            pa(": ")
+            ma(ek)
+            ma(":")
+            if isinstance(v, dict):
+                block(v, level + 1)
+            else:
+                inline(v)
+            ps.maybe_flush()
+            ms.maybe_flush()
+        pa(pad(level))
+        pa("}")
+        ma("}")
+
+    if isinstance(obj, dict):
+        block(obj, 0)
+    else:
+        inline(obj)
+
+
+def dumps_pair(
+    obj: Any,
+    indent: int = 2,
+    inline_small_dict_max_items: int = 2,
+    inline_list_max_len: int = 20,
+) -> Tuple[str, str]:
+    """(整形 JSON, 最小化 JSON) を 1 回の走査で返す。"""
+    ps, ms = _Sink(), _Sink()
+    _serialize(obj, ps, ms, indent, inline_small_dict_max_items, inline_list_max_len)
+    return ps.getvalue(), ms.getvalue()
+
+
+def dump_pair(
+    obj: Any,
+    pretty_fp: Any = None,
+    min_fp: Any = None,
+    indent: int = 2,
+    inline_small_dict_max_items: int = 2,
+    inline_list_max_len: int = 20,
+    encoding: Optional[str] = None,
+) -> None:
+    """
+    整形 JSON / 最小化 JSON をファイルライク（.write を持つもの）へ直接書き出す。
+    どちらかを None にするとその出力は組み立てない。
+    encoding（例："utf-8"）を指定すると bytes にして書く（ソケット・バイナリバッファ向け）。
+    """
+    ps = _Sink(pretty_fp, encoding, discard=pretty_fp is None)
+    ms = _Sink(min_fp, encoding, discard=min_fp is None)
+    _serialize(obj, ps, ms, indent, inline_small_dict_max_items, inline_list_max_len)
+    ps.flush()
+    ms.flush()
+
+
+def pretty_json_inline_lists(
+    obj: Any,
+    indent: int = 2,
+    inline_small_dict_max_items: int = 2,
+    inline_list_max_len: int = 20,
+) -> str:
+    """
+    JSON を「読みやすさ + インライン最適化」方針で整形して文字列で返す。
+    - リスト: 可能な限り 1 行 "[a, b]" にする
+    - 小さな辞書: キー数 <= inline_small_dict_max_items かつ
+      値がスカラー or 小さなリストのみの場合に 1 行 "{k: v, k2: v2}" にする
+    """
+    ps = _Sink()
+    _serialize(obj, ps, _Sink(discard=True), indent, inline_small_dict_max_items, inline_list_max_len)
+    return ps.getvalue()
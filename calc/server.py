@@ -0,0 +1,489 @@
+# calc/server.py
+"""
+チャート生成の HTTP JSON API（asyncio、外部依存なし）。
+
+  python -m calc.server --port 8080 -j 0
+
+  POST /charts   {"records": [<record>, ...], "opts": {...}}  → {"results": [...]}
+  POST /chart    <record>（"opts" キーで生成オプションを上書き可）  → 生成結果
+  GET  /healthz  → {"status": "ok", ...}
+  GET  /metrics  → Prometheus text（?format=json で calc.metrics.snapshot() の JSON）
+
+record は calc.pipeline.parse_record と同じ形、opts は DEFAULT_OPTS のキー
+（vargas / node_type / ck_mode / include_lordship / include_ashtakavarga / include_aspects /
+validate / compare）。値は受け付け時に検査し、不正なら 400。
+compare = {"ayanamsas": [...], "node_types": [...]} で比較ドキュメント（calc.variants）を返す。
+
+- 計算はすべて ProcessPoolExecutor（calc.parallel._worker_init で 1 回だけ初期化）で行い、
+  イベントループはソケット I/O だけを担当する。ワーカーは最小化 JSON の bytes まで作って返す。
+- 同時に来た /chart は数ミリ秒だけ溜めて 1 回の submit にまとめる（プロセス間往復を削減）。
+- 受け付け中のレコード数が --max-pending を超えたら即座に 503（Retry-After）を返す（backpressure）。
+  1 リクエストのレコード数だけで --max-pending を超える場合は、待っても通らないので 413。
+- 1 リクエストの処理が --timeout 秒を超えたら 504（ワーカー側の計算は中断されず、結果は捨てる）。
+- --metrics（または JYOTISH_METRICS=1）でステージ別計測を有効化。ワーカーの計測は結果と一緒に
+  差分（calc.metrics.drain）で返し、親プロセスで集計する。
+- HTTP/1.1 keep-alive 対応、Transfer-Encoding: chunked のリクエストは非対応（411）。
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import metrics
+from .cli import iter_results, parse_workers
+from .ephemeris import compat_report
+from .parallel import _WORKER_OPTS, _worker_init
+from .pipeline import DEFAULT_OPTS
+from .varga import VARGA_NAMES
+from .variants import AYANAMSA_MODES, DEFAULT_NODE_TYPES, NODE_BODIES
+
+MAX_HEADER = 16 * 1024
+MAX_BODY = 8 * 1024 * 1024
+OPT_KEYS = ("vargas", "node_type", "ck_mode", "include_lordship", "include_ashtakavarga", "include_aspects",
+            "validate", "compare")
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable", 504: "Gateway Timeout",
+}
+_JSON_CTYPE = "application/json; charset=utf-8"
+_PROM_CTYPE = "text/plain; version=0.0.4; charset=utf-8"
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+# =======================================================
+# ワーカー側
+# =======================================================
+def _serve_run(
+    jobs: List[Tuple[Dict[str, Any], List[Any]]]
+) -> Tuple[List[List[bytes]], Optional[Dict[str, Any]]]:
+    """
+    [(opts, [record, ...]), ...] → (ジョブごとの最小化 JSON(bytes) のリスト, 計測の差分 or None)。
+    不正なレコードは {"error": ..., "line": i}（i はジョブ内の 0 始まり位置）。
+    """
+    out = []
+    for opts, records in jobs:
+        o = dict(_WORKER_OPTS)
+        o.update(opts)
+        items = [(i, rec) for i, rec in enumerate(records)]
+        bodies = []
+        for r in iter_results(items, o):
+            with metrics.span("serialize"):
+                bodies.append(_dumps(r).encode("utf-8"))
+        out.append(bodies)
+    return out, (metrics.drain() if metrics.ENABLED else None)
+
+
+# =======================================================
+# HTTP 層
+# =======================================================
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: Tuple[Tuple[str, str], ...] = ()):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers
+
+
+def _response(
+    status: int,
+    body: bytes,
+    keep_alive: bool,
+    headers: Tuple[Tuple[str, str], ...] = (),
+    content_type: str = _JSON_CTYPE,
+) -> bytes:
+    head = [
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        "Connection: keep-alive" if keep_alive else "Connection: close",
+    ]
+    head.extend(f"{k}: {v}" for k, v in headers)
+    return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+
+def _error_body(message: str) -> bytes:
+    return _dumps({"error": message}).encode("utf-8")
+
+
+_BOOL_OPTS = ("include_lordship", "include_ashtakavarga", "include_aspects", "validate")
+
+
+def _split_opts(opts: Any) -> Dict[str, Any]:
+    """リクエストの opts を検査してワーカーへ渡す形にする（不正な値は 400）。"""
+    if opts is None:
+        return {}
+    if not isinstance(opts, dict):
+        raise HttpError(400, "opts must be an object")
+    bad = [k for k in opts if k not in OPT_KEYS]
+    if bad:
+        raise HttpError(400, f"unknown opts: {', '.join(bad)}")
+    o = dict(opts)
+    if "node_type" in o and o["node_type"] not in NODE_BODIES:
+        raise HttpError(400, 'node_type must be "True" or "Mean"')
+    if "ck_mode" in o:
+        ck = o["ck_mode"]
+        if isinstance(ck, int) and not isinstance(ck, bool):
+            ck = str(ck)
+        if ck not in ("7", "8", None):
+            raise HttpError(400, 'ck_mode must be "7", "8" or null')
+        o["ck_mode"] = ck
+    for k in _BOOL_OPTS:
+        if k in o and not isinstance(o[k], bool):
+            raise HttpError(400, f"{k} must be a boolean")
+    if "vargas" in o:
+        vargas = o["vargas"]
+        if not isinstance(vargas, list) or not all(isinstance(v, str) for v in vargas):
+            raise HttpError(400, "vargas must be a list of varga names")
+        unknown = [v for v in vargas if v not in VARGA_NAMES]
+        if unknown:
+            raise HttpError(400, f"unknown varga: {', '.join(unknown)}")
+        o["vargas"] = tuple(vargas)
+    cmp = o.get("compare")
+    if cmp is not None:
+        usage = 'compare must be {"ayanamsas": [...], "node_types": [...]}'
+        if not isinstance(cmp, dict) or not isinstance(cmp.get("ayanamsas"), list) or not cmp["ayanamsas"]:
+            raise HttpError(400, usage)
+        nodes = cmp.get("node_types") or list(DEFAULT_NODE_TYPES)
+        if not isinstance(nodes, list):
+            raise HttpError(400, usage)
+        unknown = [str(v) for v in cmp["ayanamsas"] if not isinstance(v, str) or v not in AYANAMSA_MODES]
+        if unknown:
+            raise HttpError(400, f"unknown ayanamsa: {', '.join(unknown)}")
+        if any(not isinstance(v, str) or v not in NODE_BODIES for v in nodes):
+            raise HttpError(400, 'compare.node_types must be "True" and/or "Mean"')
+        o["compare"] = {"ayanamsas": tuple(cmp["ayanamsas"]), "node_types": tuple(nodes)}
+    return o
+
+
+class ChartServer:
+    """asyncio サーバ本体。start() / serve_forever() / close()。"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        workers: Optional[int] = None,
+        ephe_path: str = "",
+        opts: Optional[Dict[str, Any]] = None,
+        max_pending: int = 4096,
+        timeout: float = 10.0,
+        batch_max: int = 64,
+        batch_delay: float = 0.002,
+        chunk_size: int = 64,
+    ):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.ephe_path = ephe_path
+        self.opts = dict(DEFAULT_OPTS)
+        self.opts.update(opts or {})
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.batch_max = batch_max
+        self.batch_delay = batch_delay
+        self.chunk_size = chunk_size
+        self.pending = 0  # 受け付け中のレコード数
+        self.stats = {"requests": 0, "charts": 0, "rejected": 0, "timeouts": 0, "pool_restarts": 0}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._queue: List[Tuple[Dict[str, Any], Any, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+    # ---- pool ----
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_worker_init,
+            initargs=(self.ephe_path, self.opts["ayan_mode"], self.opts, metrics.ENABLED),
+        )
+
+    async def _submit(self, jobs: List[Tuple[Dict[str, Any], List[Any]]]) -> List[List[bytes]]:
+        loop = asyncio.get_running_loop()
+        pool = self._pool
+        try:
+            out, raw = await loop.run_in_executor(pool, _serve_run, jobs)
+        except BrokenProcessPool:
+            # 落ちたプールは 1 回だけ作り直す（同時に失敗した他の submit と競合しないよう比較）
+            if self._pool is pool:
+                self.stats["pool_restarts"] += 1
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._new_pool()
+            raise HttpError(500, "worker process crashed")
+        if raw is not None:
+            metrics.merge(raw)
+        return out
+
+    # ---- /chart のまとめ投入 ----
+    def _enqueue(self, opts: Dict[str, Any], rec: Any) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._queue.append((opts, rec, fut))
+        if len(self._queue) >= self.batch_max:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_delay, self._flush)
+        return fut
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._queue = self._queue, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Dict[str, Any], Any, asyncio.Future]]) -> None:
+        jobs = [(opts, [rec]) for opts, rec, _ in batch]
+        try:
+            results = await self._submit(jobs)
+        except Exception as e:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, _, fut), res in zip(batch, results):
+            if not fut.done():
+                fut.set_result(res[0])
+
+    # ---- admission ----
+    def _admit(self, n: int) -> None:
+        if n > self.max_pending:
+            # 空いていても受け付けられない大きさ：再試行しても無駄なので 503 ではなく 413
+            raise HttpError(413, f"too many records in one request ({n} > {self.max_pending}); split the batch")
+        if self.pending + n > self.max_pending:
+            self.stats["rejected"] += 1
+            raise HttpError(503, "server busy", (("Retry-After", "1"),))
+        self.pending += n
+
+    # ---- handlers ----
+    async def _chart(self, payload: Any) -> Tuple[int, bytes]:
+        if not isinstance(payload, dict):
+            raise HttpError(400, "request body must be a JSON object")
+        rec = dict(payload)
+        opts = _split_opts(rec.pop("opts", None))
+        self._admit(1)
+        try:
+            body = await asyncio.wait_for(self._enqueue(opts, rec), self.timeout)
+        finally:
+            self.pending -= 1
+        self.stats["charts"] += 1
+        # 単発リクエストの不正レコードは 400（本文はワーカーの error オブジェクト）
+        return (400 if body.startswith(b'{"error":') else 200), body
+
+    async def _charts(self, payload: Any) -> Tuple[int, bytes]:
+        if isinstance(payload, list):
+            records, opts = payload, {}
+        elif isinstance(payload, dict) and isinstance(payload.get("records"), list):
+            records, opts = payload["records"], _split_opts(payload.get("opts"))
+        else:
+            raise HttpError(400, 'expected {"records": [...]} or a JSON array')
+        n = len(records)
+        self._admit(n)
+        try:
+            step = self.chunk_size
+            # チャンクごとに別の submit にしてワーカー全体へ分散
+            tasks = [
+                self._submit([(opts, records[i:i + step])])
+                for i in range(0, n, step)
+            ]
+            parts = await asyncio.wait_for(asyncio.gather(*tasks), self.timeout)
+        finally:
+            self.pending -= n
+        self.stats["charts"] += n
+        lines: List[bytes] = []
+        for base, part in zip(range(0, n, self.chunk_size), parts):
+            for body in part[0]:
+                if body.startswith(b'{"error":'):
+                    # line はバッチ内の位置（0 始まり）に振り直す
+                    obj = json.loads(body)
+                    obj["line"] += base
+                    body = _dumps(obj).encode("utf-8")
+                lines.append(body)
+        return 200, b'{"results":[' + b",".join(lines) + b"]}"
+
+    def _healthz(self) -> Tuple[int, bytes]:
+        body = {"status": "ok", "workers": self.workers, "pending": self.pending}
+        body.update(self.stats)
+        body["swisseph"] = compat_report()
+        return 200, _dumps(body).encode("utf-8")
+
+    def _metrics(self, query: str) -> Tuple[int, bytes]:
+        if "format=json" in query.split("&"):
+            snap = metrics.snapshot()
+            snap["server"] = dict(self.stats, pending=self.pending)
+            return 200, _dumps(snap).encode("utf-8")
+        lines = [metrics.prometheus_text().rstrip("\n")]
+        for k, v in self.stats.items():
+            lines.append(f"# TYPE jyotish_server_{k}_total counter")
+            lines.append(f"jyotish_server_{k}_total {v}")
+        lines.append("# TYPE jyotish_server_pending gauge")
+        lines.append(f"jyotish_server_pending {self.pending}")
+        return 200, ("\n".join(l for l in lines if l) + "\n").encode("utf-8")
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, bytes]:
+        path, _, query = path.partition("?")
+        if path == "/metrics":
+            if method not in ("GET", "HEAD"):
+                raise HttpError(405, "method not allowed")
+            return self._metrics(query)
+        if path == "/healthz":
+            if method not in ("GET", "HEAD"):
+                raise HttpError(405, "method not allowed")
+            return self._healthz()
+        if path in ("/chart", "/charts"):
+            if method != "POST":
+                raise HttpError(405, "method not allowed")
+            try:
+                payload = json.loads(body)
+            except ValueError as e:
+                raise HttpError(400, f"invalid JSON: {e}") from None
+            if path == "/chart":
+                return await self._chart(payload)
+            return await self._charts(payload)
+        raise HttpError(404, "not found")
+
+    # ---- connection ----
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    writer.write(_response(413, _error_body("header too large"), False))
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, path, version = lines[0].split(" ", 2)
+                except ValueError:
+                    writer.write(_response(400, _error_body("bad request line"), False))
+                    return
+                headers: Dict[str, str] = {}
+                for line in lines[1:]:
+                    if line:
+                        k, _, v = line.partition(":")
+                        headers[k.strip().lower()] = v.strip()
+                conn = headers.get("connection", "").lower()
+                keep_alive = (conn != "close") if version == "HTTP/1.1" else (conn == "keep-alive")
+
+                extra: Tuple[Tuple[str, str], ...] = ()
+                try:
+                    if "chunked" in headers.get("transfer-encoding", "").lower():
+                        keep_alive = False
+                        raise HttpError(411, "chunked request body is not supported")
+                    try:
+                        length = int(headers.get("content-length", "0") or 0)
+                    except ValueError:
+                        keep_alive = False
+                        raise HttpError(400, "bad Content-Length") from None
+                    if length < 0:
+                        keep_alive = False
+                        raise HttpError(400, "bad Content-Length")
+                    if length > MAX_BODY:
+                        keep_alive = False
+                        raise HttpError(413, "request body too large")
+                    body = await reader.readexactly(length) if length else b""
+                    self.stats["requests"] += 1
+                    status, payload = await self._dispatch(method.upper(), path, body)
+                except HttpError as e:
+                    status, payload, extra = e.status, _error_body(str(e)), e.headers
+                except asyncio.TimeoutError:
+                    self.stats["timeouts"] += 1
+                    status, payload = 504, _error_body("request timed out")
+                except asyncio.IncompleteReadError:
+                    return
+                except Exception as e:
+                    # 想定外の失敗でも応答は返す（接続は閉じる）
+                    keep_alive = False
+                    status, payload = 500, _error_body(f"internal error: {type(e).__name__}")
+
+                ctype = _JSON_CTYPE
+                if status == 200 and path.split("?", 1)[0] == "/metrics" and "format=json" not in path:
+                    ctype = _PROM_CTYPE
+                if method.upper() == "HEAD":
+                    payload = b""
+                writer.write(_response(status, payload, keep_alive, extra, ctype))
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # ---- lifecycle ----
+    async def start(self) -> None:
+        self._pool = self._new_pool()
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port, limit=MAX_HEADER, backlog=1024,
+        )
+        if self.port == 0:
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m calc.server", description="チャート生成 HTTP JSON API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("-j", "--workers", type=parse_workers, default=0, help="ワーカープロセス数（0 で CPU コア数）")
+    ap.add_argument("--ephe-path", default="", help="Swiss Ephemeris ファイルパス（空で内蔵）")
+    ap.add_argument("--max-pending", type=int, default=4096, help="受け付け中レコード数の上限（超過は 503、1 リクエストで超えるなら 413）")
+    ap.add_argument("--timeout", type=float, default=10.0, help="1 リクエストのタイムアウト秒（超過は 504）")
+    ap.add_argument("--batch-delay", type=float, default=0.002, help="/chart をまとめる待ち時間（秒）")
+    ap.add_argument("--metrics", action="store_true", help="ステージ別計測を有効にする（GET /metrics）")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+    server = ChartServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers or None,
+        ephe_path=args.ephe_path,
+        max_pending=args.max_pending,
+        timeout=args.timeout,
+        batch_delay=args.batch_delay,
+    )
+
+    async def run() -> None:
+        await server.start()
+        print(f"listening on http://{server.host}:{server.port} ({server.workers} workers)", file=sys.stderr)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+# calc/shodasavarga.py
+from typing import Dict, Iterable
+from .base import SIGNS, deg_in_sign_index, house_from_index, EXALTATION_INDEX
+from .varga import varga_plan, varga_indices
+
+# vargas whose output also flags exaltation (same as build_d20)
+EXALTATION_VARGAS = ("D20",)
+
+def build_shodasavarga(asc_lon: float, planets: Dict[str, Dict], names: Iterable[str]) -> Dict[str, Dict]:
+    """
+    Build several divisional charts (D1..D60, see varga.VARGA_RULES) in one pass.
+
+    Each longitude is decomposed into (sign, degree) once and placed in every
+    requested varga through the precomputed lookup tables, so the cost grows
+    with the number of planets rather than planets x vargas x helper calls.
+
+    Returns { "D9": {"Asc": {"sign": ...}, "planets": {"Su": {"sign", "house"}, ...}}, ... }
+    in varga order; the per-varga shape matches build_d9 / build_d20 / build_d60.
+    """
+    plan = varga_plan(names)
+    asc_v = varga_indices(*deg_in_sign_index(asc_lon), plan)
+    out = {
+        name: {"Asc": {"sign": SIGNS[a]}, "planets": {}}
+        for (name, _parts, _mul, _lut), a in zip(plan, asc_v)
+    }
+    for p, dat in planets.items():
+        vs = varga_indices(*deg_in_sign_index(dat["lon"]), plan)
+        ex = EXALTATION_INDEX.get(p)
+        for (name, _parts, _mul, _lut), a, v in zip(plan, asc_v, vs):
+            one = {"sign": SIGNS[v], "house": house_from_index(a, v)}
+            if v == ex and name in EXALTATION_VARGAS:
+                one["exalted"] = True
+            out[name]["planets"][p] = one
+    return out
@@ -0,0 +1,218 @@
+# calc/sunrise.py
+"""
+日の出・日の入り（ヴェーダの 1 日の区切り：vara / hora / 日の出時点の tithi 用）のテーブルキャッシュ。
+
+swe.rise_trans は 1 回 ~0.1 ms かかるので、リクエストごとに呼ぶ代わりに
+  - 場所を格子に量子化（緯度 LAT_STEP°、経度 LON_STEP°）し、格子点 × 年ごとに
+    日の出・日の入りを SAMPLE_DAYS 日おきに計算した小さな表（float32、約 0.8 KB）を作る
+  - 表の値は「地方平均時の 0 時からの経過（日）」。地方平均時で見た日の出時刻は経度に
+    ほとんど依存しない（経度 1° のずれ = 4 分の時刻差の間の太陽の変化ぶん、0.1 秒未満）ので、
+    経度方向は格子点の値をそのまま使い、緯度方向は隣り合う 2 つの格子点を線形補間する
+  - 日方向は 4 点ラグランジュ補間
+表は ResultCache（既定はメモリのみ。SQLite を渡せばプロセス間で共有）に置き、直近の HOT_TABLES 個は
+復元済みのままプロセス内に持つので、同じ格子内のリクエストは swisseph を呼ばずに数 µs で答えられる。白夜・極夜の近く（補間に使う点に欠けがある日）だけは
+その日を rise_trans で直接計算する。誤差は中緯度で数秒以内。
+
+日の出・日の入りの定義は Swiss Ephemeris の既定（上縁、大気差あり、標高 0 m）。
+
+  sun = SunTimes()
+  rise, set_ = sun.rise_set(date(2025, 1, 1), 35.68, 139.75)      # jd（UT）
+  day = sun.vedic_day(jd_ut, 35.68, 139.75)                       # {"sunrise", "sunset", "vara", "hora", ...}
+"""
+import math
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import swisseph as swe
+
+from .cache import ResultCache, make_key
+from .ephemeris import sun_rise_trans
+from .panchanga import VARA_LORDS
+
+LAT_STEP = 0.25
+LON_STEP = 1.0
+SAMPLE_DAYS = 4
+# 復元済みの表をプロセス内に保持する数（store からの読み出し = unpickle を省く）
+HOT_TABLES = 64
+# ホーラの順（日の出の最初のホーラ = 曜日の支配星、以後この順に 1 時間ずつ）
+HORA_ORDER: Tuple[str, ...] = ("Su", "Ve", "Me", "Mo", "Sa", "Ju", "Ma")
+
+_PAD = 1  # 表の前に置くサンプル数（年初の補間用）
+
+
+def _mean_midnight(d: date, lon: float) -> float:
+    """日付 d の地方平均時 0 時の jd（UT）。"""
+    return swe.julday(d.year, d.month, d.day, 0.0, swe.GREG_CAL) - lon / 360.0
+
+
+def _n_samples(year: int) -> int:
+    days = (date(year + 1, 1, 1) - date(year, 1, 1)).days
+    return _PAD + days // SAMPLE_DAYS + 3
+
+
+def year_table(year: int, lat: float, lon: float) -> np.ndarray:
+    """
+    (2, n) float32：[0] 日の出、[1] 日の入りの、各サンプル日の地方平均時 0 時からの経過（日）。
+    サンプル j は 1 月 1 日 + (j - _PAD) * SAMPLE_DAYS 日。その日に起きなければ nan。
+    """
+    n = _n_samples(year)
+    out = np.empty((2, n), dtype=np.float32)
+    jd0 = _mean_midnight(date(year, 1, 1), lon)
+    for j in range(n):
+        t = jd0 + (j - _PAD) * SAMPLE_DAYS
+        for row, rsmi in ((0, swe.CALC_RISE), (1, swe.CALC_SET)):
+            v = sun_rise_trans(t, lat, lon, rsmi) - t
+            out[row, j] = v if 0.0 <= v < 1.0 else np.nan
+    return out
+
+
+def _weights(f: float) -> Tuple[float, float, float, float]:
+    """4 点ラグランジュ補間（点 -1, 0, 1, 2 の 0 と 1 の間、割合 f）の重み。"""
+    return (
+        -f * (f - 1) * (f - 2) / 6.0,
+        (f + 1) * (f - 1) * (f - 2) / 2.0,
+        -(f + 1) * f * (f - 2) / 2.0,
+        (f + 1) * f * (f - 1) / 6.0,
+    )
+
+
+def _lagrange4(y: np.ndarray, doy: np.ndarray) -> np.ndarray:
+    """year_table の (2, n) を、年初からの日数 doy（(N,)）で 4 点ラグランジュ補間 → (2, N) float64。"""
+    u = np.asarray(doy, dtype=np.float64) / SAMPLE_DAYS + _PAD
+    k = u.astype(np.int64)
+    wa, wb, wc, wd = _weights(u - k)
+    return wa * y[:, k - 1] + wb * y[:, k] + wc * y[:, k + 1] + wd * y[:, k + 2]
+
+
+class SunTimes:
+    """
+    日の出・日の入りのテーブルキャッシュ（スレッドセーフ：状態は store と、ロックで守る復元済み表の LRU）。
+    store は ResultCache（省略時はメモリのみ 8 MB）。namespace はキーに混ぜる任意の値（ephe_path など）。
+    """
+
+    def __init__(self, store: Optional[ResultCache] = None, namespace: Any = None):
+        self.store = store if store is not None else ResultCache(max_bytes=8 << 20)
+        self.namespace = namespace
+        self.stats: Dict[str, int] = {"queries": 0, "tables_built": 0, "direct": 0}
+        # (year, ilat, ilon) -> (float64 の表, 行ごとの list)
+        self._hot: "OrderedDict[Tuple[int, int, int], Tuple[np.ndarray, List[List[float]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _table(self, year: int, ilat: int, ilon: int) -> Tuple[np.ndarray, List[List[float]]]:
+        hot_key = (year, ilat, ilon)
+        with self._lock:
+            hit = self._hot.get(hot_key)
+            if hit is not None:
+                self._hot.move_to_end(hot_key)
+                return hit
+        key = make_key(("sun", self.namespace, year, ilat, ilon, LAT_STEP, LON_STEP, SAMPLE_DAYS))
+        tab = self.store.get(key)
+        if tab is None:
+            tab = year_table(year, ilat * LAT_STEP, ilon * LON_STEP)
+            self.store.set(key, tab)
+            self.stats["tables_built"] += 1
+        arr = tab.astype(np.float64)
+        hit = (arr, arr.tolist())
+        with self._lock:
+            self._hot[hot_key] = hit
+            while len(self._hot) > HOT_TABLES:
+                self._hot.popitem(last=False)
+        return hit
+
+    @staticmethod
+    def _cell(lat: float, lon: float) -> Tuple[int, float, int]:
+        """(下側の緯度格子, 上側への重み, 経度格子)"""
+        g = lat / LAT_STEP
+        top = int(round(90.0 / LAT_STEP))
+        ilat = min(max(math.floor(g), -top), top - 1)
+        return ilat, g - ilat, round(lon / LON_STEP)
+
+    def _offsets(self, year: int, doy: np.ndarray, lat: float, lon: float) -> np.ndarray:
+        """year 年の年初から doy 日目の (日の出, 日の入り) の、地方平均時 0 時からの経過（日）→ (2, N)。"""
+        ilat, w, ilon = self._cell(lat, lon)
+        lo = _lagrange4(self._table(year, ilat, ilon)[0], doy)
+        hi = _lagrange4(self._table(year, ilat + 1, ilon)[0], doy)
+        return (1.0 - w) * lo + w * hi
+
+    def rise_set_range(self, start: date, end: date, lat: float, lon: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        ローカル日付（地方平均時）[start, end) の各日の (日の出, 日の入り)（(N,) の jd UT 配列 2 本）。
+        起きない日は nan。
+        """
+        n = (end - start).days
+        out = np.empty((2, max(n, 0)), dtype=np.float64)
+        i = 0
+        while i < n:
+            d = start + timedelta(days=i)
+            m = min(n - i, (date(d.year + 1, 1, 1) - d).days)
+            doy0 = (d - date(d.year, 1, 1)).days
+            t0 = _mean_midnight(d, lon) + np.arange(m, dtype=np.float64)
+            off = self._offsets(d.year, doy0 + np.arange(m), lat, lon)
+            out[:, i:i + m] = t0 + off
+            for j in np.nonzero(np.isnan(off).any(axis=0))[0].tolist():
+                # 白夜・極夜の近く（補間に使う点に欠けがある日）：その日だけ直接計算
+                self.stats["direct"] += 1
+                for row, rsmi in ((0, swe.CALC_RISE), (1, swe.CALC_SET)):
+                    v = sun_rise_trans(t0[j], lat, lon, rsmi)
+                    out[row, i + j] = v if v - t0[j] < 1.0 else np.nan
+            i += m
+        self.stats["queries"] += max(n, 0)
+        return out[0], out[1]
+
+    def rise_set(self, d: date, lat: float, lon: float) -> Tuple[float, float]:
+        """ローカル日付 d（地方平均時）の (日の出, 日の入り) の jd（UT）。起きなければ nan。"""
+        ilat, w, ilon = self._cell(lat, lon)
+        u = (d - date(d.year, 1, 1)).days / SAMPLE_DAYS + _PAD
+        k = int(u)
+        wa, wb, wc, wd = _weights(u - k)
+        lo = self._table(d.year, ilat, ilon)[1]
+        hi = self._table(d.year, ilat + 1, ilon)[1]
+        t0 = _mean_midnight(d, lon)
+        out = []
+        for row in (0, 1):
+            a, b = lo[row], hi[row]
+            v = (1.0 - w) * (wa * a[k - 1] + wb * a[k] + wc * a[k + 1] + wd * a[k + 2]) + w * (
+                wa * b[k - 1] + wb * b[k] + wc * b[k + 1] + wd * b[k + 2]
+            )
+            out.append(t0 + v)
+        self.stats["queries"] += 1
+        if math.isnan(out[0]) or math.isnan(out[1]):
+            # 白夜・極夜の近く：rise_set_range と同じく直接計算
+            rise, set_ = self.rise_set_range(d, d + timedelta(days=1), lat, lon)
+            self.stats["queries"] -= 1
+            return float(rise[0]), float(set_[0])
+        return out[0], out[1]
+
+    def vedic_day(self, jd_ut: float, lat: float, lon: float) -> Dict[str, Any]:
+        """
+        jd_ut を含むヴェーダの 1 日（日の出から次の日の出まで）：
+          {"sunrise", "sunset", "next_sunrise"（jd UT）, "vara"（日の出の曜日の支配星）,
+           "daytime"（昼なら True）, "hora"（ホーラの支配星）, "hora_index"（0..23）}
+        日の出・日の入りが無い日（白夜・極夜）は ValueError。
+        """
+        y, m, dd, _h = swe.revjul(jd_ut + lon / 360.0, swe.GREG_CAL)
+        day = date(y, m, dd)
+        rise, set_ = self.rise_set(day, lat, lon)
+        if not math.isnan(rise) and jd_ut < rise:
+            day -= timedelta(days=1)
+            rise, set_ = self.rise_set(day, lat, lon)
+        nxt, _ = self.rise_set(day + timedelta(days=1), lat, lon)
+        if math.isnan(rise) or math.isnan(set_) or math.isnan(nxt):
+            raise ValueError("no sunrise/sunset at this location and date")
+        daytime = jd_ut < set_
+        if daytime:
+            idx = int((jd_ut - rise) / ((set_ - rise) / 12.0))
+        else:
+            idx = 12 + int((jd_ut - set_) / ((nxt - set_) / 12.0))
+        vara = VARA_LORDS[day.weekday()]
+        hora = HORA_ORDER[(HORA_ORDER.index(vara) + min(idx, 23)) % 7]
+        return {
+            "sunrise": rise, "sunset": set_, "next_sunrise": nxt,
+            "vara": vara, "daytime": daytime, "hora": hora, "hora_index": min(idx, 23),
+        }
+
+    def info(self) -> Dict[str, Any]:
+        return dict(self.stats, cache=self.store.info())
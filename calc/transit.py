@@ -0,0 +1,349 @@
+# calc/transit.py
+"""
+トランジットのイベント探索（サイン移動・ナクシャトラ移動・留・リターン）。
+
+細かい刻みで planet_sidereal_longitudes を呼んで差分を取る代わりに、
+  1) 天体ごとの粗い刻み（STEP_DAYS）で (黄経, 速度) を評価し
+  2) 刻みの両端で速度の符号が変われば、速度 = 0 を Illinois 法（はさみうち）で解いて留を求めて区間を分割
+     （True Node は刻み内に留が 2 回入りうるので、|速度| の極小も調べる）。分割は "station" を
+     出力しないときも行う（区切りの通過を解く区間を単調に保つため）
+  3) 単調な各区間で越えた区切り（30° / 13°20′ / 指定黄経）ごとに、速度を使った Newton 法
+     （区間外に出たら二分法）で通過時刻を解く
+速度は swe.calc_ut(..., FLG_SPEED) が返す値をそのまま使う（1 回の反復 = calc_ut 1 回）。
+1 年・1 天体あたり数十〜数千回の呼び出しで済む。
+
+  init_ephemeris("", "Lahiri_ICRC")
+  for ev in scan(jd_start, jd_end, planets=("Ju", "Sa"), kinds=("ingress", "station")):
+      print(ev)
+
+  python -m calc.transit --start 2025-01-01 --end 2026-01-01 --planets Su,Mo,Ju --kinds ingress,nakshatra
+
+イベントは時刻順（全天体をマージ）に逐次生成するので、範囲の長さに関わらずメモリは一定。
+table（calc.ephe_table.EpheTable）を渡すと swisseph の代わりにテーブルを評価する。
+"""
+import argparse
+import heapq
+import json
+import math
+import sys
+from datetime import date
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import swisseph as swe
+
+from . import metrics
+from .base import NAK_LABELS_JH, NAK_SIZE, PLANETS, SIGNS
+from .ephemeris import BODY_IDS, SIDEREAL_SPEED_FLAG, jd_ut_from_local
+from .pipeline import DEFAULT_OPTS, init_ephemeris
+
+if TYPE_CHECKING:
+    from .ephe_table import EpheTable
+
+KINDS: Tuple[str, ...] = ("ingress", "nakshatra", "station", "return")
+
+# 刻み（日）：留から留までの最短間隔より十分短く（逆行期間：水星 ~20 日、True Node は数日周期で揺れる）
+STEP_DAYS: Dict[str, float] = {
+    "Su": 10.0, "Mo": 1.0, "Me": 2.0, "Ve": 4.0, "Ma": 4.0, "Ju": 8.0, "Sa": 8.0, "Ra": 1.0, "Ke": 1.0,
+}
+# 留が起きない天体（Mean Node は常に逆行）
+_NO_STATION = {"Su", "Mo"}
+# True Node の速度は 0 付近をかすめることがあり、留の対が 1 刻みに収まる（間隔は 0.02 日未満まで縮む）。
+# 刻みの両端で速度の符号が同じでも、間に |速度| の極小があればそこでの符号を調べる。
+# 加速度は速度の中心差分（swisseph の True Node の速度には 1e-5 °/日 程度の揺らぎがあるので幅を広めに取る）。
+_DIP_BODIES = {"Ra", "Ke"}
+_ACCEL_DT = 0.05
+# |加速度| の上限（1 刻みの中で速度 0 まで下がって戻れるかの足切り。実測の最大は ~0.06 °/日²）
+_ACCEL_MAX = 0.1
+
+TOL_DAYS = 1e-7      # 約 0.01 秒
+TOL_DEG = 1e-8
+MAX_ITER = 60
+
+_BODY = dict(BODY_IDS)
+
+PosFn = Callable[[float], Tuple[float, float]]
+
+
+class Event(NamedTuple):
+    jd: float        # UT
+    planet: str
+    kind: str        # "ingress" | "nakshatra" | "station" | "return"
+    value: str       # 入ったサイン / ナクシャトラ名 / "R"（逆行開始）・"D"（順行開始） / 目標黄経
+    retrograde: bool
+
+
+def _wrap180(x: float) -> float:
+    return (x + 180.0) % 360.0 - 180.0
+
+
+def position_fn(planet: str, node_type: str = "True", table: Optional["EpheTable"] = None) -> PosFn:
+    """t → (サイデリアル黄経, 速度)。Ke は Ra + 180°（速度は同じ）。"""
+    offset = 180.0 if planet == "Ke" else 0.0
+    if table is not None:
+        key = planet if planet in _BODY else ("Ra" if node_type == "True" else "Rm")
+        lon_speed = table.lon_speed
+
+        def pos_table(t: float) -> Tuple[float, float]:
+            lon, spd = lon_speed(key, t)
+            return (lon + offset) % 360.0, spd
+        return pos_table
+
+    body = _BODY.get(planet, swe.TRUE_NODE if node_type == "True" else swe.MEAN_NODE)
+    calc_ut = swe.calc_ut
+    flag = SIDEREAL_SPEED_FLAG
+
+    def pos_swe(t: float) -> Tuple[float, float]:
+        metrics.incr("swe_calls_total", fn="calc_ut")
+        xx = calc_ut(t, body, flag)[0]
+        return (xx[0] + offset) % 360.0, xx[3]
+    return pos_swe
+
+
+def solve_crossing(pos: PosFn, target: float, ta: float, tb: float, lon_a: Optional[float] = None) -> float:
+    """黄経が target を通過する時刻（[ta, tb] で単調と仮定）。速度による Newton + 二分法。lon_a は ta の黄経（既知なら）。"""
+    ga = _wrap180((pos(ta)[0] if lon_a is None else lon_a) - target)
+    t = ta + (tb - ta) * 0.5
+    for _ in range(MAX_ITER):
+        lon, v = pos(t)
+        g = _wrap180(lon - target)
+        if abs(g) < TOL_DEG:
+            return t
+        if (g < 0) == (ga < 0):
+            ta, ga = t, g
+        else:
+            tb = t
+        if tb - ta < TOL_DAYS:
+            break
+        tn = t - g / v if v else math.nan
+        t = tn if ta < tn < tb else ta + (tb - ta) * 0.5
+    return t
+
+
+def solve_station(pos: PosFn, ta: float, va: float, tb: float, vb: float) -> Tuple[float, float]:
+    """速度 = 0 の時刻と、その時点の黄経（Illinois 法）。"""
+    side = 0
+    lon = pos(ta)[0]
+    t = ta
+    for _ in range(MAX_ITER):
+        t = (ta * vb - tb * va) / (vb - va)
+        lon, v = pos(t)
+        if v == 0.0 or tb - ta < TOL_DAYS:
+            break
+        if (v < 0) == (va < 0):
+            ta, va = t, v
+            if side == -1:
+                vb *= 0.5
+            side = -1
+        else:
+            tb, vb = t, v
+            if side == 1:
+                va *= 0.5
+            side = 1
+    return t, lon
+
+
+def _speed_dip(pos: PosFn, ta: float, va: float, aa: float, tb: float, vb: float, ab: float) -> Optional[Tuple[float, float]]:
+    """
+    [ta, tb] で |速度| が減ってから増える（両端の加速度 aa, ab から判定）なら、速度の極値の (時刻, 速度)。
+    極値で速度の符号が変わっていれば、その両側に留が 1 回ずつある。
+    """
+    if va * aa >= 0.0 or vb * ab <= 0.0:
+        return None
+
+    def vel_acc(t: float) -> Tuple[float, float]:
+        # solve_station を加速度 = 0 の求解に流用するため (速度, 加速度) を (黄経, 速度) の位置に返す
+        return pos(t)[1], _accel(pos, t)
+
+    return solve_station(vel_acc, ta, aa, tb, ab)
+
+
+def _accel(pos: PosFn, t: float) -> float:
+    return (pos(t + _ACCEL_DT)[1] - pos(t - _ACCEL_DT)[1]) / (2.0 * _ACCEL_DT)
+
+
+def _grid_crossings(a: float, delta: float, step: float, offset: float) -> List[Tuple[float, int]]:
+    """a から a + delta（単調）の間で越える offset + k*step を (値 mod 360, k) の通過順で返す（端点 a は含まない）。"""
+    out = []
+    if delta > 0:
+        k = math.floor((a - offset) / step) + 1
+        while offset + k * step <= a + delta:
+            out.append(((offset + k * step) % 360.0, k))
+            k += 1
+    elif delta < 0:
+        k = math.ceil((a - offset) / step) - 1
+        while offset + k * step >= a + delta:
+            out.append(((offset + k * step) % 360.0, k))
+            k -= 1
+    return out
+
+
+def planet_events(
+    planet: str,
+    jd_start: float,
+    jd_end: float,
+    kinds: Iterable[str] = ("ingress", "nakshatra", "station"),
+    targets: Sequence[float] = (),
+    node_type: str = "True",
+    table: Optional["EpheTable"] = None,
+    step: Optional[float] = None,
+) -> Iterator[Event]:
+    """
+    1 天体の [jd_start, jd_end) のイベントを時刻順に生成する。
+    targets は "return" 用の黄経（出生時の位置など）。
+    """
+    ks = set(kinds)
+    bad = ks.difference(KINDS)
+    if bad:
+        raise ValueError(f"unknown event kinds: {', '.join(sorted(bad))}")
+    pos = position_fn(planet, node_type, table)
+    h = step or STEP_DAYS[planet]
+    # 留での分割は区切りの通過を解く区間を単調にするためにも要るので、"station" を出力しないときも行う
+    split = planet not in _NO_STATION and not (planet in ("Ra", "Ke") and node_type == "Mean")
+    dips = split and planet in _DIP_BODIES
+    emit_station = "station" in ks
+    grids: List[Tuple[str, float, float]] = []
+    if "ingress" in ks:
+        grids.append(("ingress", 30.0, 0.0))
+    if "nakshatra" in ks:
+        grids.append(("nakshatra", NAK_SIZE, 0.0))
+    if "return" in ks:
+        grids.extend(("return", 360.0, tl % 360.0) for tl in targets)
+
+    t, (lon, v) = jd_start, pos(jd_start)
+    acc: Optional[float] = None  # t での加速度（極小の判定が必要になったときだけ求める）
+    while t < jd_end:
+        tn = min(t + h, jd_end)
+        lon_n, v_n = pos(tn)
+        acc_n: Optional[float] = None
+        evs: List[Event] = []
+        # 留（区間の分割点）：(時刻, 黄経, 留の後の速度)
+        cuts: List[Tuple[float, float, float]] = []
+        if split and (v < 0) != (v_n < 0):
+            ts, lon_s = solve_station(pos, t, v, tn, v_n)
+            if t < ts <= tn:
+                cuts.append((ts, lon_s, v_n))
+        elif dips and abs(v) + abs(v_n) <= _ACCEL_MAX * (tn - t):
+            if acc is None:
+                acc = _accel(pos, t)
+            acc_n = _accel(pos, tn)
+            dip = _speed_dip(pos, t, v, acc, tn, v_n, acc_n)
+            if dip is not None and (dip[1] < 0) != (v < 0):
+                te, v_e = dip
+                for ta, va, tb, vb in ((t, v, te, v_e), (te, v_e, tn, v_n)):
+                    ts, lon_s = solve_station(pos, ta, va, tb, vb)
+                    if t < ts <= tn:
+                        cuts.append((ts, lon_s, vb))
+        pts = [(t, lon)]
+        for ts, lon_s, after in cuts:
+            if emit_station:
+                evs.append(Event(ts, planet, "station", "R" if after < 0 else "D", after < 0))
+            pts.append((ts, lon_s))
+        pts.append((tn, lon_n))
+        for (ta, la), (tb, lb) in zip(pts, pts[1:]):
+            delta = _wrap180(lb - la)
+            if delta == 0.0:
+                continue
+            back = delta < 0
+            for kind, gstep, goff in grids:
+                for target, k in _grid_crossings(la, delta, gstep, goff):
+                    tc = solve_crossing(pos, target, ta, tb, la)
+                    if kind == "ingress":
+                        value = SIGNS[(k - 1 if back else k) % 12]
+                    elif kind == "nakshatra":
+                        value = NAK_LABELS_JH[(k - 1 if back else k) % 27]
+                    else:
+                        value = f"{target:.6f}"
+                    evs.append(Event(tc, planet, kind, value, back))
+        evs.sort()
+        yield from evs
+        t, lon, v, acc = tn, lon_n, v_n, acc_n
+
+
+def scan(
+    jd_start: float,
+    jd_end: float,
+    planets: Sequence[str] = tuple(PLANETS),
+    kinds: Iterable[str] = ("ingress", "nakshatra", "station"),
+    targets: Optional[Dict[str, Sequence[float]]] = None,
+    node_type: str = "True",
+    table: Optional["EpheTable"] = None,
+) -> Iterator[Event]:
+    """全天体のイベントを時刻順にマージして逐次生成する。先に init_ephemeris(...) を済ませておくこと。"""
+    ks = tuple(kinds)
+    gens = [
+        planet_events(p, jd_start, jd_end, ks, (targets or {}).get(p, ()), node_type, table)
+        for p in planets
+    ]
+    return heapq.merge(*gens)
+
+
+# =======================================================
+# CLI
+# =======================================================
+def jd_to_iso(jd_ut: float) -> str:
+    """jd（UT）→ "YYYY-MM-DDTHH:MM:SSZ"（秒は四捨五入）"""
+    y, m, d, h = swe.revjul(jd_ut + 0.5 / 86400.0, swe.GREG_CAL)
+    sec = int(h * 3600.0)
+    return f"{y:04d}-{m:02d}-{d:02d}T{sec // 3600:02d}:{sec // 60 % 60:02d}:{sec % 60:02d}Z"
+
+
+def _parse_list(choices: Sequence[str]) -> Callable[[str], Tuple[str, ...]]:
+    def parse(text: str) -> Tuple[str, ...]:
+        names = tuple(v.strip() for v in text.split(",") if v.strip())
+        bad = [v for v in names if v not in choices]
+        if bad:
+            raise argparse.ArgumentTypeError(f"unknown: {', '.join(bad)}")
+        return names
+    return parse
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m calc.transit", description="トランジットのイベント探索（JSONL 出力）")
+    ap.add_argument("--start", required=True, type=date.fromisoformat, help="開始日（UT 0h、YYYY-MM-DD）")
+    ap.add_argument("--end", required=True, type=date.fromisoformat, help="終了日（UT 0h、含まない）")
+    ap.add_argument("--planets", type=_parse_list(PLANETS), default=tuple(PLANETS), help="天体（例：Su,Mo,Ju）")
+    ap.add_argument("--kinds", type=_parse_list(KINDS), default=("ingress", "nakshatra", "station"),
+                    help="イベント種別（ingress,nakshatra,station,return）")
+    ap.add_argument("--return", dest="returns", action="append", default=[], metavar="PLANET=LON",
+                    help="リターンの目標黄経（例：Sa=123.45、複数可）")
+    ap.add_argument("--node", choices=["True", "Mean"], default=DEFAULT_OPTS["node_type"], help="ノードの計算")
+    ap.add_argument("--ephe-path", default="", help="Swiss Ephemeris ファイルパス（空で内蔵）")
+    ap.add_argument("-o", "--output", default="-", help="出力 JSONL（省略または - で stdout）")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    targets: Dict[str, List[float]] = {}
+    for spec in args.returns:
+        p, _, val = spec.partition("=")
+        try:
+            lon = float(val)
+        except ValueError:
+            lon = math.nan
+        if p not in PLANETS or not math.isfinite(lon):
+            print(f"invalid --return: {spec}", file=sys.stderr)
+            return 2
+        targets.setdefault(p, []).append(lon)
+    kinds = args.kinds + (("return",) if targets and "return" not in args.kinds else ())
+
+    init_ephemeris(args.ephe_path, DEFAULT_OPTS["ayan_mode"])
+    s, e = args.start, args.end
+    jd0 = jd_ut_from_local(s.year, s.month, s.day, 0.0, 0.0)
+    jd1 = jd_ut_from_local(e.year, e.month, e.day, 0.0, 0.0)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for ev in scan(jd0, jd1, args.planets, kinds, targets, args.node):
+            row = {"time": jd_to_iso(ev.jd), "jd": round(ev.jd, 6), "planet": ev.planet, "kind": ev.kind, "value": ev.value}
+            if ev.retrograde:
+                row["retrograde"] = True
+            out.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+            out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,21 @@
 # calc/validators.py
+from typing import Any
+
+from .base import SIGNS
+
+_SIGN_SET = frozenset(SIGNS)
+META_KEYS = ("name", "birth", "timezone", "latitude", "longitude", "location",
+             "ayanamsa", "calculation_model", "node_type", "house_system")
+
+
+def is_prunable(v: Any) -> bool:
+    """True if prune_and_validate would drop this value (None/False/0/[]/{}; True is kept)."""
+    return v is not True and (v in (None, False, []) or v == {})
+
+
 def prune_and_validate(obj: dict) -> dict:
     # remove keys with falsy except boolean True, and enforce 2-dec precision already done
+    # (builders no longer emit such values; kept for callers passing hand-built trees)
     def _clean(x):
         if isinstance(x, dict):
             return {k:_clean(v) for k,v in x.items() if v is True or (v not in (None, False, []) and v!={})}
@@ -8,3 +23,45 @@ def prune_and_validate(obj: dict) -> dict:
             return [ _clean(v) for v in x if v is not None ]
         return x
     return _clean(obj)
+
+
+def validate_output(obj: dict) -> dict:
+    """
+    Schema check for an assembled chart (read-only, no copy). Raises ValueError with the path.
+    - no prunable values anywhere (builders must not emit them)
+    - meta has the expected keys
+    - every varga has Asc.sign and planets with a valid sign / house 1..12
+    Returns obj unchanged so it can be chained.
+    """
+    def _walk(x, path):
+        if isinstance(x, dict):
+            for k, v in x.items():
+                if is_prunable(v):
+                    raise ValueError(f"{path}.{k}: prunable value {v!r}")
+                _walk(v, f"{path}.{k}")
+        elif isinstance(x, list):
+            for i, v in enumerate(x):
+                if v is None:
+                    raise ValueError(f"{path}[{i}]: null in list")
+                _walk(v, f"{path}[{i}]")
+
+    _walk(obj, "$")
+
+    meta = obj.get("meta")
+    if not isinstance(meta, dict):
+        raise ValueError("$.meta: missing")
+    for k in META_KEYS:
+        if k not in meta:
+            raise ValueError(f"$.meta.{k}: missing")
+
+    for name, chart in obj.items():
+        if name == "meta":
+            continue
+        if chart.get("Asc", {}).get("sign") not in _SIGN_SET:
+            raise ValueError(f"$.{name}.Asc.sign: invalid")
+        for p, one in chart.get("planets", {}).items():
+            if one.get("sign") not in _SIGN_SET:
+                raise ValueError(f"$.{name}.planets.{p}.sign: invalid")
+            if not 1 <= one.get("house", 0) <= 12:
+                raise ValueError(f"$.{name}.planets.{p}.house: invalid")
+    return obj
@@ -1,36 +1,165 @@
 # calc/varga.py
-from typing import Tuple
+"""
+Divisional sign placement on integer sign indices (Ar=0 .. Pi=11).
+
+Every varga is described declaratively in VARGA_RULES and compiled at import
+into a flat (sign, part) -> sign lookup table, so placement is one index
+computation and one tuple lookup. The *_array variants apply the same tables
+to NumPy arrays of longitudes for batch runs. String labels (SIGNS) are only
+produced by the d*_sign wrappers and the builders at the output edge.
+"""
+from typing import Any, Dict, Iterable, Tuple
+import numpy as np
 from .base import SIGNS, SIGN_INDEX
 
+# 0 = movable, 1 = fixed, 2 = dual (Ar, Ta, Ge, Cn, ...)
+SIGN_QUALITY: Tuple[int, ...] = (0, 1, 2) * 4
+# 0 = odd (Ar, Ge, ...), 1 = even (Ta, Cn, ...)
+SIGN_PARITY: Tuple[int, ...] = (0, 1) * 6
+# 0 = fire, 1 = earth, 2 = air, 3 = water
+SIGN_ELEMENT: Tuple[int, ...] = (0, 1, 2, 3) * 3
+
+_BASIS = {
+    "sign": lambda si: 0,
+    "parity": lambda si: SIGN_PARITY[si],
+    "quality": lambda si: SIGN_QUALITY[si],
+    "element": lambda si: SIGN_ELEMENT[si],
+}
+
+# name -> rule
+#   parts : number of equal divisions of a sign
+#   start : (basis, offsets, relative)
+#           offsets are indexed by the basis class of the sign; relative=True counts
+#           from the sign itself, otherwise the offset is an absolute sign index.
+#   step  : signs advanced per part (default 1)
+#   table : explicit sign sequence per parity (odd, even) instead of start/step
+#   mul   : part = int(deg * mul) instead of int((deg / 30) * parts)
+VARGA_RULES: Dict[str, Dict[str, Any]] = {
+    "D1":  {"parts": 1,  "start": ("sign", (0,), True)},
+    # Hora (Parashara): odd signs Le then Cn, even signs Cn then Le
+    "D2":  {"parts": 2,  "table": ((4, 3), (3, 4))},
+    # Drekkana: 1st, 5th, 9th from the sign
+    "D3":  {"parts": 3,  "start": ("sign", (0,), True), "step": 4},
+    # Chaturthamsa: 1st, 4th, 7th, 10th from the sign
+    "D4":  {"parts": 4,  "start": ("sign", (0,), True), "step": 3},
+    # Saptamsa: odd from the sign, even from the 7th
+    "D7":  {"parts": 7,  "start": ("parity", (0, 6), True)},
+    # Navamsa: movable from the sign, fixed from the 9th, dual from the 5th
+    "D9":  {"parts": 9,  "start": ("quality", (0, 8, 4), True)},
+    # Dasamsa: odd from the sign, even from the 9th
+    "D10": {"parts": 10, "start": ("parity", (0, 8), True)},
+    "D12": {"parts": 12, "start": ("sign", (0,), True)},
+    # Shodasamsa: movable from Ar, fixed from Le, dual from Sg
+    "D16": {"parts": 16, "start": ("quality", (0, 4, 8), False)},
+    # Vimsamsa: movable from Ar, fixed from Sg, dual from Le
+    "D20": {"parts": 20, "start": ("quality", (0, 8, 4), False)},
+    # Chaturvimsamsa: odd from Le, even from Cn
+    "D24": {"parts": 24, "start": ("parity", (4, 3), False)},
+    # Nakshatramsa: fire from Ar, earth from Cn, air from Li, water from Cp
+    "D27": {"parts": 27, "start": ("element", (0, 3, 6, 9), False)},
+    # Trimsamsa (unequal): odd Ma 5 / Sa 5 / Ju 8 / Me 7 / Ve 5 -> Ar, Aq, Sg, Ge, Li
+    #                      even Ve 5 / Me 7 / Ju 8 / Sa 5 / Ma 5 -> Ta, Vi, Pi, Cp, Sc
+    "D30": {"parts": 30, "mul": 1.0, "table": (
+        (0,) * 5 + (10,) * 5 + (8,) * 8 + (2,) * 7 + (6,) * 5,
+        (1,) * 5 + (5,) * 7 + (11,) * 8 + (9,) * 5 + (7,) * 5,
+    )},
+    # Khavedamsa: odd from Ar, even from Li
+    "D40": {"parts": 40, "start": ("parity", (0, 6), False)},
+    # Akshavedamsa: movable from Ar, fixed from Le, dual from Sg
+    "D45": {"parts": 45, "start": ("quality", (0, 4, 8), False)},
+    # Shashtyamsa: classic JH-compatible formula: floor(deg*2) -> mod 12 -> +1
+    "D60": {"parts": 60, "mul": 2.0, "start": ("sign", (0,), True)},
+}
+
+def _compile(rule: Dict[str, Any]) -> Tuple[int, ...]:
+    # flat table indexed by si * parts + part
+    parts = rule["parts"]
+    if "table" in rule:
+        return tuple(rule["table"][SIGN_PARITY[si]][part] for si in range(12) for part in range(parts))
+    basis, offsets, relative = rule["start"]
+    step = rule.get("step", 1)
+    out = []
+    for si in range(12):
+        start = offsets[_BASIS[basis](si)] + (si if relative else 0)
+        out.extend((start + part * step) % 12 for part in range(parts))
+    return tuple(out)
+
+VARGA_LUT: Dict[str, Tuple[int, ...]] = {name: _compile(rule) for name, rule in VARGA_RULES.items()}
+VARGA_NAMES: Tuple[str, ...] = tuple(VARGA_RULES)
+
+D9_LUT = VARGA_LUT["D9"]
+D20_LUT = VARGA_LUT["D20"]
+D60_LUT = VARGA_LUT["D60"]
+
 def _movable_fixed_dual(sign: str) -> str:
-    i = SIGN_INDEX[sign]
-    if i in (0,3,6,9): return "movable"
-    if i in (1,4,7,10): return "fixed"
-    return "dual"
+    return ("movable", "fixed", "dual")[SIGN_QUALITY[SIGN_INDEX[sign]]]
 
-def d9_sign(sign: str, deg: float) -> str:
+def d9_index(si: int, deg: float) -> int:
     # 9 parts each 3°20' = 3 + 20/60
-    part = int((deg / 30.0) * 9)  # 0..8
-    mfd = _movable_fixed_dual(sign)
-    start = {
-        "movable": SIGN_INDEX[sign],
-        "fixed":   (SIGN_INDEX[sign] + 8) % 12,  # 9th from sign
-        "dual":    (SIGN_INDEX[sign] + 4) % 12,  # 5th from sign
-    }[mfd]
-    idx = (start + part) % 12
-    return SIGNS[idx]
+    return D9_LUT[si * 9 + int((deg / 30.0) * 9)]
 
-def d20_sign(sign: str, deg: float) -> str:
+def d20_index(si: int, deg: float) -> int:
     # 20 parts each 1°30'
-    part = int((deg / 30.0) * 20)  # 0..19
-    mfd = _movable_fixed_dual(sign)
-    start_base = {"movable":0, "fixed":8, "dual":4}[mfd]  # Ar=0,Sg=8,Le=4
-    idx = (start_base + part) % 12
-    return SIGNS[idx]
+    return D20_LUT[si * 20 + int((deg / 30.0) * 20)]
+
+def d60_index(si: int, deg: float) -> int:
+    return D60_LUT[si * 60 + int(deg * 2)]
+
+def d9_sign(sign: str, deg: float) -> str:
+    return SIGNS[d9_index(SIGN_INDEX[sign], deg)]
+
+def d20_sign(sign: str, deg: float) -> str:
+    return SIGNS[d20_index(SIGN_INDEX[sign], deg)]
 
 def d60_sign(sign: str, deg: float) -> str:
-    # classic JH-compatible formula: floor(deg*2) -> mod 12 -> +1
-    n = int(deg * 2)  # 0..59
-    shift = (n % 12) + 1
-    idx = (SIGN_INDEX[sign] + shift - 1) % 12
-    return SIGNS[idx]
+    return SIGNS[d60_index(SIGN_INDEX[sign], deg)]
+
+# ---- single pass over many vargas ----
+# (name, parts, mul or 0.0, lut) in VARGA_RULES order
+_PLAN = tuple((n, r["parts"], r.get("mul", 0.0), VARGA_LUT[n]) for n, r in VARGA_RULES.items())
+
+def varga_plan(names: Iterable[str]) -> Tuple[Tuple[str, int, float, Tuple[int, ...]], ...]:
+    """Select the compiled entries for names (kept in VARGA_RULES order)."""
+    wanted = set(names)
+    unknown = wanted.difference(VARGA_RULES)
+    if unknown:
+        raise ValueError(f"unknown varga: {', '.join(sorted(unknown))}")
+    return tuple(p for p in _PLAN if p[0] in wanted)
+
+def varga_indices(si: int, deg: float, plan) -> Tuple[int, ...]:
+    """Varga sign indices of one decomposed longitude for every entry of plan."""
+    f = deg / 30.0
+    return tuple(
+        lut[si * parts + (int(deg * mul) if mul else int(f * parts))]
+        for _name, parts, mul, lut in plan
+    )
+
+# ---- NumPy batch variants ----
+VARGA_LUT_NP: Dict[str, np.ndarray] = {n: np.array(t, dtype=np.int8) for n, t in VARGA_LUT.items()}
+
+def sign_deg_array(lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Array variant of deg_in_sign_index: (sign index int64, degree in sign)."""
+    lon = np.mod(np.asarray(lons, dtype=np.float64), 360.0)
+    si = np.floor_divide(lon, 30.0)
+    return si.astype(np.int64), lon - si * 30
+
+def varga_index_array(name: str, si: np.ndarray, deg: np.ndarray) -> np.ndarray:
+    rule = VARGA_RULES[name]
+    parts = rule["parts"]
+    mul = rule.get("mul")
+    part = (deg * mul) if mul else ((deg / 30.0) * parts)
+    return VARGA_LUT_NP[name][si * parts + part.astype(np.int64)]
+
+def varga_indices_array(lons: np.ndarray, names: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Decompose lons once and place them in every requested varga."""
+    si, deg = sign_deg_array(lons)
+    return {n: varga_index_array(n, si, deg) for n, _p, _m, _l in varga_plan(names)}
+
+def d9_index_array(si: np.ndarray, deg: np.ndarray) -> np.ndarray:
+    return varga_index_array("D9", si, deg)
+
+def d20_index_array(si: np.ndarray, deg: np.ndarray) -> np.ndarray:
+    return varga_index_array("D20", si, deg)
+
+def d60_index_array(si: np.ndarray, deg: np.ndarray) -> np.ndarray:
+    return varga_index_array("D60", si, deg)
@@ -0,0 +1,252 @@
+# calc/variants.py
+"""
+アヤナーンシャ × ノード種別の比較（1 回の天体計算から複数バリアントを導出）。
+
+setup_sidereal は swisseph のグローバル状態（サイデリアルモード）を書き換えるため、
+モードごとに generate_chart をやり直すと天体計算もモード数 × ノード種別ぶん繰り返すことになる。
+ここでは 1 つの Julian day について
+
+  1) トロピカルの惑星黄経・速度（7 天体 + True/Mean 両ノード）と Asc を 1 回だけ計算
+  2) 各モードのアヤナーンシャ（と変化率）だけをモードを切り替えて求める（1 モード 3 回の軽い呼び出し）
+  3) サイデリアル = トロピカル - アヤナーンシャ（速度はアヤナーンシャの変化率を差し引く）
+
+で任意個のバリアントの ChartCore を作り、分割図を組み立てて 1 つのドキュメントにまとめる。
+
+2) のモード切り替えは、このプロセスのサイデリアルモードには触れず、アヤナーンシャ専用の
+ワーカープロセス（ワーカー 1 つの ProcessPoolExecutor、初回に起動して使い回す）で行う。
+app.py のセッションはすべて同じプロセスのスレッドなので、ここでグローバルなモードを切り替えると
+他のセッションの compute_core / asc_sidereal が別のアヤナーンシャで計算され、共有キャッシュに
+誤ったチャートが残る。ワーカーは呼び出し側と同じ ephe パス（current_ephe_path）で初期化する。
+
+  {"meta": {name, birth, timezone, latitude, longitude, location, calculation_model, house_system},
+   "variants": [{"ayanamsa_mode": "Raman", "ayanamsa": "Raman -21:..", "node_type": "True",
+                 "D1": {...}, "D9": {...}}, ...]}
+
+swisseph の FLG_SIDEREAL 計算も（既定の投影では）同じ差し引きなので、結果は黄経で 1e-6° 程度まで一致する。
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.util import Finalize
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import swisseph as swe
+
+from . import metrics
+from .core import ChartCore
+from .ephemeris import (
+    AYANAMSA_MODES,
+    BODY_IDS,
+    TROPICAL_SPEED_FLAG,
+    asc_tropical,
+    ayanamsa_deg_array,
+    current_ephe_path,
+    jd_ut_from_local,
+    set_ephe_path,
+    setup_sidereal,
+)
+from .pipeline import (
+    DEFAULT_OPTS,
+    build_meta,
+    build_vargas,
+    deg_to_dms_str,
+    inject_karakamsa,
+    parse_record,
+)
+from .validators import validate_output
+
+DEFAULT_AYANAMSAS: Tuple[str, ...] = tuple(
+    m for m in ("Lahiri", "Lahiri_ICRC", "Raman", "KP", "Yukteshwar", "Fagan_Bradley") if m in AYANAMSA_MODES
+)
+DEFAULT_NODE_TYPES: Tuple[str, ...] = ("True", "Mean")
+NODE_BODIES: Dict[str, int] = {"True": swe.TRUE_NODE, "Mean": swe.MEAN_NODE}
+
+# アヤナーンシャの変化率を求める差分の半幅（日）
+_RATE_HALF_DAYS = 0.5
+
+Tropical = Tuple[float, Dict[str, Tuple[float, float]]]  # (asc, {"Su": (lon, speed), ..., "True": ..., "Mean": ...})
+
+
+def tropical_positions(jd_ut: float, lat: float, lon: float, node_types: Iterable[str] = DEFAULT_NODE_TYPES) -> Tropical:
+    """トロピカルの Asc と、惑星 + 指定ノード種別の (黄経, 速度)。"""
+    pos: Dict[str, Tuple[float, float]] = {}
+    nodes = tuple(node_types)
+    metrics.incr("swe_calls_total", len(BODY_IDS) + len(nodes), fn="calc_ut")
+    for key, body in BODY_IDS:
+        xx = swe.calc_ut(jd_ut, body, TROPICAL_SPEED_FLAG)[0]
+        pos[key] = (float(xx[0]), float(xx[3]))
+    for nt in nodes:
+        xx = swe.calc_ut(jd_ut, NODE_BODIES[nt], TROPICAL_SPEED_FLAG)[0]
+        pos[nt] = (float(xx[0]), float(xx[3]))
+    return asc_tropical(jd_ut, lat, lon), pos
+
+
+def _ayanamsa_worker_init(ephe_path: str) -> None:
+    set_ephe_path(ephe_path)
+
+
+def _ayanamsa_worker_run(jd: np.ndarray, modes: Tuple[str, ...]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """ワーカープロセス側：モードを順に切り替えて評価する（このプロセスは他の計算をしない）。"""
+    out: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    for mode in modes:
+        setup_sidereal(mode)
+        aya = ayanamsa_deg_array(jd)
+        rate = (ayanamsa_deg_array(jd + _RATE_HALF_DAYS) - ayanamsa_deg_array(jd - _RATE_HALF_DAYS)) / (
+            2.0 * _RATE_HALF_DAYS
+        )
+        out[mode] = (aya, rate)
+    return out
+
+
+# (ワーカープロセス, 初期化に使った ephe パス)
+_AYANAMSA_POOL: List[Any] = [None, ""]
+_AYANAMSA_POOL_LOCK = threading.Lock()
+
+
+def _ayanamsa_pool(ephe_path: str) -> ProcessPoolExecutor:
+    with _AYANAMSA_POOL_LOCK:
+        pool, path = _AYANAMSA_POOL
+        if pool is None or path != ephe_path:
+            if pool is not None:
+                pool.shutdown(wait=False)
+            pool = ProcessPoolExecutor(max_workers=1, initializer=_ayanamsa_worker_init, initargs=(ephe_path,))
+            _AYANAMSA_POOL[:] = [pool, ephe_path]
+            # calc.parallel のワーカー内で作った場合、終了時の子プロセスの join（と Queue の close）より先に止める
+            Finalize(pool, pool.shutdown, exitpriority=100)
+        return pool
+
+
+def _reset_ayanamsa_pool(pool: ProcessPoolExecutor) -> None:
+    with _AYANAMSA_POOL_LOCK:
+        if _AYANAMSA_POOL[0] is pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            _AYANAMSA_POOL[:] = [None, ""]
+
+
+def ayanamsa_offsets(jd_ut: Sequence[float], modes: Iterable[str]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    {mode: (アヤナーンシャ (N,), 変化率 deg/day (N,))}。
+    評価はアヤナーンシャ専用のワーカープロセスで行い（jd_ut は配列でまとめて 1 回の往復）、
+    このプロセスのサイデリアルモードは変えない。ワーカーが落ちていたら 1 回だけ作り直して再実行する。
+    """
+    jd = np.asarray(jd_ut, dtype=np.float64)
+    names = tuple(modes)
+    for mode in names:
+        if mode not in AYANAMSA_MODES:
+            raise ValueError(f"unknown ayanamsa: {mode}")
+    ephe_path = current_ephe_path()
+    pool = _ayanamsa_pool(ephe_path)
+    try:
+        return pool.submit(_ayanamsa_worker_run, jd, names).result()
+    except BrokenProcessPool:
+        _reset_ayanamsa_pool(pool)
+    return _ayanamsa_pool(ephe_path).submit(_ayanamsa_worker_run, jd, names).result()
+
+
+def derive_core(jd_ut: float, trop: Tropical, aya: float, rate: float, node_type: str) -> ChartCore:
+    """トロピカル位置からアヤナーンシャを差し引いて 1 バリアント分の ChartCore を作る。"""
+    asc_t, pos = trop
+    planets: Dict[str, Dict[str, float]] = {
+        key: {"lon": (pos[key][0] - aya) % 360.0, "speed": pos[key][1] - rate} for key, _ in BODY_IDS
+    }
+    ra_lon, ra_spd = pos[node_type]
+    ra = (ra_lon - aya) % 360.0
+    planets["Ra"] = {"lon": ra, "speed": ra_spd - rate}
+    planets["Ke"] = {"lon": (ra + 180.0) % 360.0, "speed": -(ra_spd - rate)}
+    return ChartCore.from_parts(jd_ut, (asc_t - aya) % 360.0, aya, planets, node_type)
+
+
+def _record_jd(r: Dict[str, Any]) -> float:
+    bd = r["date"]
+    return jd_ut_from_local(bd.year, bd.month, bd.day, r["h"] + r["m"] / 60.0 + r["s"] / 3600.0, r["tz"])
+
+
+def _document(
+    r: Dict[str, Any],
+    jd: float,
+    trop: Tropical,
+    offsets: Dict[str, Tuple[float, float]],
+    node_types: Sequence[str],
+    o: Dict[str, Any],
+) -> dict:
+    need = set(o["vargas"])
+    extra = tuple(sorted(need.difference(("D1", "D9", "D20", "D60"))))
+    meta = build_meta(
+        r["name"], r["date"], r["h"], r["m"], r["tz"], r["lat"], r["lon"], r["location"], 0.0, node_types[0],
+    )
+    del meta["ayanamsa"], meta["node_type"]
+    variants = []
+    for mode, (aya, rate) in offsets.items():
+        label = f"{AYANAMSA_MODES[mode][1]} {deg_to_dms_str(aya, always_sign_minus=True)}"
+        for nt in node_types:
+            core = derive_core(jd, trop, aya, rate, nt)
+            vargas = build_vargas(
+                core.asc, core.planets, o["ck_mode"], o["include_lordship"],
+                "D1" in need, "D9" in need, "D20" in need, "D60" in need, extra,
+                o["include_ashtakavarga"],
+                o["include_aspects"],
+            )
+            inject_karakamsa(vargas)
+            if o["validate"]:
+                validate_output(dict({"meta": dict(meta, ayanamsa=label, node_type=nt)}, **vargas))
+            one = {"ayanamsa_mode": mode, "ayanamsa": label, "node_type": nt}
+            one.update(vargas)
+            variants.append(one)
+    return {"meta": meta, "variants": variants}
+
+
+def generate_variants(
+    rec: Dict[str, Any],
+    opts: Optional[Dict[str, Any]] = None,
+    ayanamsas: Sequence[str] = DEFAULT_AYANAMSAS,
+    node_types: Sequence[str] = DEFAULT_NODE_TYPES,
+) -> dict:
+    """
+    1 レコード → 複数バリアントのドキュメント。opts は generate_chart と同じ
+    （node_type / ayan_mode は無視され、ayanamsas × node_types の全組み合わせを出す）。
+    先に init_ephemeris(...) を済ませておくこと。
+    """
+    return next(generate_variants_many([rec], opts, ayanamsas, node_types))
+
+
+def generate_variants_many(
+    records: Iterable[Dict[str, Any]],
+    opts: Optional[Dict[str, Any]] = None,
+    ayanamsas: Sequence[str] = DEFAULT_AYANAMSAS,
+    node_types: Sequence[str] = DEFAULT_NODE_TYPES,
+    chunk_size: int = 256,
+) -> Iterator[dict]:
+    """
+    generate_variants のデータセット版（入力を chunk_size 件ずつ消費し、1 件ずつ返す）。
+    アヤナーンシャはチャンク単位でまとめて評価するため、ワーカープロセスとの往復は
+    チャンクあたり 1 回で済む。不正なレコードは ValueError。
+    """
+    o = dict(DEFAULT_OPTS)
+    o.update(opts or {})
+    nodes = tuple(node_types)
+    bad = [nt for nt in nodes if nt not in NODE_BODIES]
+    if bad or not nodes:
+        raise ValueError(f"invalid node types: {', '.join(bad) or '(none)'}")
+    if not ayanamsas:
+        raise ValueError("no ayanamsa given")
+
+    chunk: List[Dict[str, Any]] = []
+    it = iter(records)
+    while True:
+        chunk.clear()
+        for rec in it:
+            chunk.append(parse_record(rec))
+            if len(chunk) >= chunk_size:
+                break
+        if not chunk:
+            return
+        with metrics.span("compute_core"):
+            jds = [_record_jd(r) for r in chunk]
+            trops = [tropical_positions(jd, r["lat"], r["lon"], nodes) for jd, r in zip(jds, chunk)]
+            offsets = ayanamsa_offsets(jds, ayanamsas)
+        for i, (r, jd, trop) in enumerate(zip(chunk, jds, trops)):
+            per = {m: (float(a[i]), float(d[i])) for m, (a, d) in offsets.items()}
+            with metrics.span("build_vargas"):
+                doc = _document(r, jd, trop, per, nodes, o)
+            yield doc